@@ -11,6 +11,8 @@ import struct
 
 from contextlib import contextmanager
 
+from . import instrumentation
+from . import measurements_parser
 from . import sensor
 from . import tcp
 from . import util
@@ -30,22 +32,33 @@ VehicleControl = carla_protocol.Control
 
 
 @contextmanager
-def make_carla_client(host, world_port, timeout=15):
+def make_carla_client(host, world_port, timeout=15, **kwargs):
     """Context manager for creating and connecting a CarlaClient."""
-    with util.make_connection(CarlaClient, host, world_port, timeout) as client:
+    with util.make_connection(CarlaClient, host, world_port, timeout, **kwargs) as client:
         yield client
 
 
 class CarlaClient(object):
-    """The CARLA client. Manages communications with the CARLA server."""
+    """
+    The CARLA client. Manages communications with the CARLA server.
 
-    def __init__(self, host, world_port, timeout=15):
+    With reuse_messages, read_data parses every frame into the same
+    Measurements message, only valid until the next read_data. With
+    agents_array, read_data returns MeasurementsWithAgents, the non-player
+    agents decoded into an array instead of one message each, see
+    measurements_parser.
+    """
+
+    def __init__(self, host, world_port, timeout=15, reuse_messages=False, agents_array=False):
         self._world_client = tcp.TCPClient(host, world_port, timeout)
         self._stream_client = tcp.TCPClient(host, world_port + 1, timeout)
         self._control_client = tcp.TCPClient(host, world_port + 2, timeout)
         self._current_settings = None
         self._is_episode_requested = False
         self._sensors = {}
+        self._measurements_parser = measurements_parser.MeasurementsParser(
+            reuse_messages, agents_array)
+        self._control = carla_protocol.Control()
 
     def connect(self, connection_attempts=10):
         """
@@ -117,14 +130,16 @@ class CarlaClient(object):
         started. Return a pair containing the protobuf object containing the
         measurements followed by the raw data of the sensors.
         """
-        # Read measurements.
-        data = self._stream_client.read()
-        if not data:
-            raise RuntimeError('failed to read data from server')
-        pb_message = carla_protocol.Measurements()
-        pb_message.ParseFromString(data)
-        # Read sensor data.
-        return pb_message, dict(x for x in self._read_sensor_data())
+        with instrumentation.span('client.read_data'):
+            # Read measurements.
+            data = self._stream_client.read()
+            if not data:
+                raise RuntimeError('failed to read data from server')
+            with instrumentation.span('client.parse'):
+                pb_message = self._measurements_parser.parse(data)
+            instrumentation.count('client.bytes_in', len(data))
+            # Read sensor data.
+            return pb_message, dict(x for x in self._read_sensor_data())
 
     def send_control(self, *args, **kwargs):
         """
@@ -136,13 +151,22 @@ class CarlaClient(object):
         if isinstance(args[0] if args else None, carla_protocol.Control):
             pb_message = args[0]
         else:
-            pb_message = carla_protocol.Control()
+            # Serialized right away, the same message serves every call.
+            pb_message = self._control
             pb_message.steer = kwargs.get('steer', 0.0)
             pb_message.throttle = kwargs.get('throttle', 0.0)
             pb_message.brake = kwargs.get('brake', 0.0)
             pb_message.hand_brake = kwargs.get('hand_brake', False)
             pb_message.reverse = kwargs.get('reverse', False)
-        self._control_client.write(pb_message.SerializeToString())
+        with instrumentation.span('client.send_control'):
+            self._control_client.write(pb_message.SerializeToString())
+
+    def get_timeout(self):
+        """The timeout of the operations with the server, in seconds."""
+        return self._stream_client.get_timeout()
+
+    def get_measurements_parser(self):
+        return self._measurements_parser
 
     def _request_new_episode(self, carla_settings):
         """
@@ -171,8 +195,11 @@ class CarlaClient(object):
         while True:
             data = self._stream_client.read()
             if not data:
-                raise StopIteration
-            yield self._parse_sensor_data(data)
+                return
+            instrumentation.count('client.bytes_in', len(data))
+            with instrumentation.span('client.parse_sensor'):
+                sensor_data = self._parse_sensor_data(data)
+            yield sensor_data
 
     def _parse_sensor_data(self, data):
         sensor_id = struct.unpack('<L', data[0:4])[0]
@@ -13,6 +13,7 @@ import time
 from carla.client import VehicleControl
 from carla.client import make_carla_client
 from carla.driving_benchmark.metrics import Metrics
+from carla.driving_benchmark.shortest_path_cache import shortest_path_query
 from carla.planner.planner import Planner
 from carla.settings import CarlaSettings
 from carla.tcp import TCPConnectionError
@@ -89,7 +90,16 @@ class DrivingBenchmark(object):
 
         logging.info('START')
 
-        for experiment in experiment_suite.get_experiments()[int(start_experiment):]:
+        experiments = experiment_suite.get_experiments()[int(start_experiment):]
+
+        # The start spots are the ones of the city whatever the conditions, the
+        # distances of the poses of every experiment are computed or loaded once.
+        if experiments:
+            experiment_suite.precompute_shortest_paths(
+                client.load_settings(experiments[0].conditions).player_start_spots,
+                self._planner)
+
+        for experiment in experiments:
 
             positions = client.load_settings(
                 experiment.conditions).player_start_spots
@@ -117,8 +127,17 @@ class DrivingBenchmark(object):
                             [positions[start_index].location.x, positions[start_index].location.y],
                             [positions[end_index].location.x, positions[end_index].location.y])
 
-                    time_out = experiment_suite.calculate_time_out(
-                        self._get_shortest_path(positions[start_index], positions[end_index]))
+                    shortest_path = experiment_suite.get_shortest_path_distance(
+                        positions[start_index], positions[end_index], start_index, end_index)
+                    if shortest_path is None:
+                        shortest_path = self._get_shortest_path(positions[start_index],
+                                                                positions[end_index])
+                    else:
+                        # Start the planner on the route of the episode, as
+                        # computing the distance does.
+                        self._planner.prime(*shortest_path_query(positions[start_index],
+                                                                 positions[end_index]))
+                    time_out = experiment_suite.calculate_time_out(shortest_path)
 
                     # running the agent
                     (result, reward_vec, control_vec, final_time, remaining_distance) = \
@@ -175,11 +194,7 @@ class DrivingBenchmark(object):
         """
 
         return self._planner.get_shortest_path_distance(
-            [
-                start_point.location.x, start_point.location.y, 0.22], [
-                start_point.orientation.x, start_point.orientation.y, 0.22], [
-                end_point.location.x, end_point.location.y, end_point.location.z], [
-                end_point.orientation.x, end_point.orientation.y, end_point.orientation.z])
+            *shortest_path_query(start_point, end_point))
 
     def _run_navigation_episode(
             self,
@@ -1,13 +1,19 @@
 # To be redefined on subclasses on how to calculate timeout for an episode
 import abc
 
+from carla.driving_benchmark.route_table import load_route_table
+from carla.driving_benchmark.shortest_path_cache import ShortestPathCache
+
 
 class ExperimentSuite(object):
 
-    def __init__(self, city_name):
+    def __init__(self, city_name, shortest_path_cache_file=None, route_table_file=None):
 
         self._city_name = city_name
         self._experiments = self.build_experiments()
+        self._shortest_path_cache = ShortestPathCache(city_name, shortest_path_cache_file)
+        self._route_table_file = route_table_file
+        self._route_table = None
 
     def calculate_time_out(self, path_distance):
         """
@@ -17,6 +23,43 @@ class ExperimentSuite(object):
         """
         return ((path_distance / 1000.0) / 10.0) * 3600.0 + 10.0
 
+    def precompute_shortest_paths(self, positions, planner=None, processes=1):
+        """
+        Compute the shortest path distance of every pose of the suite, so the
+        timeouts do not need a route computation per episode. Distances
+        already in the persistent cache are not computed again, and none is
+        computed if the route table of the city was built for these
+        positions.
+
+        Args:
+            positions: the player start spots of the city.
+            planner: planner used when computing serially.
+            processes: number of worker processes used for the computation.
+        """
+        route_table = load_route_table(self._city_name, self._route_table_file)
+        if route_table is not None and route_table.matches(positions):
+            self._route_table = route_table
+            return
+
+        pairs = []
+        for experiment in self._experiments:
+            for pose in experiment.poses:
+                pairs.append((positions[pose[0]], positions[pose[1]]))
+
+        self._shortest_path_cache.fill(pairs, planner, processes)
+
+    def get_shortest_path_distance(self, start_point, end_point,
+                                   start_index=None, end_index=None):
+        """
+        Returns the cached shortest path distance between two start spots,
+        None if it was not computed yet. The start spot indices are used to
+        look the distance up on the route table when it is loaded.
+        """
+        if self._route_table is not None and start_index is not None:
+            # As the planner, zero distance when there is no route.
+            return self._route_table.get_distance(start_index, end_index) or 0.0
+        return self._shortest_path_cache.get(start_point, end_point)
+
     def get_number_of_poses_task(self):
         """
             Get the number of poses a task have for this benchmark
@@ -0,0 +1,345 @@
+# Copyright (c) 2017 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+All-pairs route table between the player start spots of a city.
+
+For every (start, end) pair of spots the table stores the route distance,
+the commands of the route and its node path, computed exactly as the driving
+benchmark queries the planner. The table is built offline, saved next to the
+planner map files and answers distance and pose queries in O(1).
+"""
+
+from __future__ import print_function
+
+import argparse
+import collections
+import json
+import logging
+import multiprocessing
+import os
+import zipfile
+
+try:
+    import numpy as np
+except ImportError:
+    raise RuntimeError('cannot import numpy, make sure numpy package is installed')
+
+import carla.planner
+from carla.driving_benchmark.shortest_path_cache import shortest_path_query
+from carla.planner.map_bundle import get_source_hash
+from carla.planner.planner import Planner, UnroutableError, TURN_LEFT, TURN_RIGHT
+
+
+_Vector3D = collections.namedtuple('_Vector3D', 'x y z')
+_Transform = collections.namedtuple('_Transform', 'location orientation')
+
+
+def get_route_table_file(city_name):
+    return os.path.join(os.path.dirname(carla.planner.__file__),
+                        city_name + 'RouteTable.npz')
+
+
+def _positions_array(positions):
+    return np.array([[p.location.x, p.location.y, p.location.z,
+                      p.orientation.x, p.orientation.y, p.orientation.z]
+                     for p in positions], dtype=np.float64).reshape(-1, 6)
+
+
+def _array_positions(array):
+    return [_Transform(_Vector3D(*row[:3]), _Vector3D(*row[3:]))
+            for row in array.tolist()]
+
+
+def _compute_routes(planner, positions, start_index):
+    """ The distance, commands and path of the routes from one start spot """
+    city_track = planner.get_city_track()
+    routes = []
+    for end_point in positions:
+        source, source_ori, target, target_ori = shortest_path_query(
+            positions[start_index], end_point)
+        try:
+            plan = planner.find_route_plan(city_track.project_node(source), source_ori,
+                                           city_track.project_node(target), target_ori)
+            route, commands = plan.route, plan.commands
+        except UnroutableError as error:
+            if error.route is None:
+                routes.append((float('nan'), [], []))
+                continue
+            # The route ends at an intersection, it has no commands.
+            logging.debug('no commands for route %d -> %s', start_index, end_point)
+            route, commands = error.route, []
+        routes.append((planner.get_route_distance(route), commands, route))
+    return routes
+
+
+# The map hash of each city, read from its map bundle once per process.
+_map_hashes = {}
+
+
+def _get_map_hash(city_name):
+    if city_name not in _map_hashes:
+        _map_hashes[city_name] = get_source_hash(city_name)
+    return _map_hashes[city_name]
+
+
+# Planner and start spots of each worker process when building in parallel.
+_worker_state = None
+
+
+def _init_worker(city_name, positions):
+    global _worker_state
+    _worker_state = (Planner(city_name), positions)
+
+
+def _compute_worker_routes(start_index):
+    planner, positions = _worker_state
+    return _compute_routes(planner, positions, start_index)
+
+
+def build_route_table(city_name, positions, planner=None, processes=1):
+    """
+    Compute the routes between every pair of start spots of a city.
+
+    Args:
+        city_name: the planner city, Town01 or Town02.
+        positions: the player start spots, transforms as given by the scene.
+        planner: planner used when computing serially. A new one is
+            created if not given.
+        processes: number of worker processes used for the computation.
+    """
+    positions_array = _positions_array(positions)
+    positions = _array_positions(positions_array)
+    number_of_positions = len(positions)
+
+    logging.info('Computing %d routes for %s', number_of_positions ** 2, city_name)
+    if processes > 1:
+        pool = multiprocessing.Pool(processes, _init_worker, (city_name, positions))
+        try:
+            rows = pool.map(_compute_worker_routes, range(number_of_positions))
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        if planner is None:
+            planner = Planner(city_name)
+        rows = [_compute_routes(planner, positions, start_index)
+                for start_index in range(number_of_positions)]
+
+    routes = [route for row in rows for route in row]
+    command_offsets = np.cumsum([0] + [len(commands) for _, commands, _ in routes])
+    path_offsets = np.cumsum([0] + [len(path) for _, _, path in routes])
+    commands = np.array([command for _, route_commands, _ in routes
+                         for command in route_commands], dtype=np.int8)
+    paths = np.array([node for _, _, path in routes for node in path],
+                     dtype=np.int16).reshape(-1, 2)
+
+    return RouteTable(
+        city_name,
+        positions_array,
+        np.array([distance for distance, _, _ in routes]).reshape(
+            number_of_positions, number_of_positions),
+        commands,
+        command_offsets,
+        paths,
+        path_offsets,
+        _get_map_hash(city_name))
+
+
+class RouteTable(object):
+    """
+    Routes between every pair of start spots, indexed by the start spot
+    indices used on the experiment poses. The commands and paths of all the
+    routes are stored back to back, route i * N + j spanning
+    offsets[i * N + j]:offsets[i * N + j + 1].
+    """
+
+    def __init__(self, city_name, positions, distances, commands, command_offsets,
+                 paths, path_offsets, map_hash):
+        self._city_name = city_name
+        self._positions = positions
+        self._distances = distances
+        self._commands = commands
+        self._command_offsets = command_offsets
+        self._paths = paths
+        self._path_offsets = path_offsets
+        self._map_hash = map_hash
+
+        # Number of turns of every route, -1 if there is no route.
+        turns = (commands == int(TURN_LEFT)) | (commands == int(TURN_RIGHT))
+        turns = np.concatenate(([0], np.cumsum(turns)))
+        self._turns = (turns[command_offsets[1:]] - turns[command_offsets[:-1]]).reshape(
+            distances.shape)
+        self._turns[np.isnan(distances)] = -1
+
+    def __len__(self):
+        return len(self._positions)
+
+    def get_city_name(self):
+        return self._city_name
+
+    def get_positions(self):
+        return self._positions
+
+    def get_distances(self):
+        """ The distance matrix, NaN where there is no route """
+        return self._distances
+
+    def get_turns(self):
+        """ The number of turns matrix, -1 where there is no route """
+        return self._turns
+
+    def get_map_hash(self):
+        return self._map_hash
+
+    def matches(self, positions):
+        """ If the table was built for these start spots """
+        positions = _positions_array(positions)
+        return positions.shape == self._positions.shape and \
+            np.allclose(positions, self._positions)
+
+    def _route_index(self, start_index, end_index):
+        return start_index * len(self._positions) + end_index
+
+    def get_distance(self, start_index, end_index):
+        """
+        The route distance between two start spots, None if there is no route.
+        """
+        distance = self._distances[start_index, end_index]
+        if np.isnan(distance):
+            return None
+        return float(distance)
+
+    def get_commands(self, start_index, end_index):
+        """ The commands of the route between two start spots """
+        route_index = self._route_index(start_index, end_index)
+        return [float(command) for command in self._commands[
+            self._command_offsets[route_index]:self._command_offsets[route_index + 1]]]
+
+    def get_path(self, start_index, end_index):
+        """ The node path of the route between two start spots """
+        route_index = self._route_index(start_index, end_index)
+        return [tuple(node) for node in self._paths[
+            self._path_offsets[route_index]:self._path_offsets[route_index + 1]].tolist()]
+
+    def find_poses(self, min_distance=0.0, max_distance=float('inf'),
+                   min_turns=0, max_turns=None):
+        """
+        The [start, end] poses whose route satisfies the distance and
+        number of turns constraints, with the format of the experiment poses.
+        """
+        distances = np.where(np.isnan(self._distances), -1.0, self._distances)
+        mask = (distances >= min_distance) & (distances <= max_distance)
+        mask &= self._turns >= min_turns
+        if max_turns is not None:
+            mask &= self._turns <= max_turns
+        np.fill_diagonal(mask, False)
+        return np.argwhere(mask).tolist()
+
+    def save(self, table_file=None):
+        """ Write the table, next to the city map files by default """
+        if table_file is None:
+            table_file = get_route_table_file(self._city_name)
+        temporary_file = '%s.%d.tmp.npz' % (table_file[:-len('.npz')], os.getpid())
+        np.savez(temporary_file,
+                 city_name=np.array(self._city_name),
+                 positions=self._positions,
+                 distances=self._distances,
+                 commands=self._commands,
+                 command_offsets=self._command_offsets,
+                 paths=self._paths,
+                 path_offsets=self._path_offsets,
+                 map_hash=np.array(self._map_hash))
+        os.rename(temporary_file, table_file)
+
+
+def load_route_table(city_name, table_file=None):
+    """
+    Load the route table of a city, None if it is missing, unreadable or was
+    built from different map files.
+    """
+    if table_file is None:
+        table_file = get_route_table_file(city_name)
+    if not os.path.exists(table_file):
+        return None
+
+    try:
+        with np.load(table_file) as data:
+            if data['map_hash'].item() != _get_map_hash(city_name):
+                logging.warning('route table %s is out of date, ignoring it', table_file)
+                return None
+            return RouteTable(
+                str(data['city_name']),
+                data['positions'],
+                data['distances'],
+                data['commands'],
+                data['command_offsets'],
+                data['paths'],
+                data['path_offsets'],
+                data['map_hash'].item())
+    except (IOError, ValueError, KeyError, zipfile.BadZipFile) as error:
+        logging.warning('ignoring unreadable route table %s: %s', table_file, error)
+        return None
+
+
+def _server_positions(host, port, city_name):
+    from carla.client import make_carla_client
+    from carla.settings import CarlaSettings
+
+    with make_carla_client(host, port) as client:
+        scene = client.load_settings(CarlaSettings())
+        if scene.map_name != city_name:
+            raise RuntimeError('the server is running %s, not %s' % (scene.map_name, city_name))
+        return scene.player_start_spots
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__)
+    argparser.add_argument(
+        'city_name',
+        help='the planner city, Town01 or Town02')
+    argparser.add_argument(
+        '--host',
+        default='localhost',
+        help='IP of the host server running the city (default: localhost)')
+    argparser.add_argument(
+        '-p', '--port',
+        default=2000,
+        type=int,
+        help='TCP port to listen to (default: 2000)')
+    argparser.add_argument(
+        '--positions',
+        help='JSON file with the start spots as [x, y, z, ori_x, ori_y, ori_z] '
+             'lists, read instead of asking the server')
+    argparser.add_argument(
+        '-j', '--processes',
+        default=1,
+        type=int,
+        help='number of worker processes (default: 1)')
+    argparser.add_argument(
+        '-o', '--output',
+        help='route table file (default: next to the planner map files)')
+    args = argparser.parse_args()
+
+    logging.basicConfig(format='%(levelname)s: %(message)s', level=logging.INFO)
+
+    if args.positions:
+        with open(args.positions, 'r') as f:
+            positions = _array_positions(np.array(json.load(f), dtype=np.float64))
+    else:
+        positions = _server_positions(args.host, args.port, args.city_name)
+
+    table = build_route_table(args.city_name, positions, processes=args.processes)
+    table.save(args.output)
+    logging.info('wrote %s', args.output or get_route_table_file(args.city_name))
+
+
+if __name__ == '__main__':
+
+    try:
+        main()
+    except KeyboardInterrupt:
+        print('\nCancelled by user. Bye!')
@@ -0,0 +1,133 @@
+# Copyright (c) 2017 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""Persistent cache of the shortest path distances used for the timeouts."""
+
+import json
+import logging
+import multiprocessing
+import os
+
+import carla.planner
+from carla.planner.planner import Planner
+
+
+def shortest_path_query(start_point, end_point):
+    """
+    Build the planner query used to compute the shortest path between two
+    player start spots, exactly as the driving benchmark issues it.
+    """
+    return ((start_point.location.x, start_point.location.y, 0.22),
+            (start_point.orientation.x, start_point.orientation.y, 0.22),
+            (end_point.location.x, end_point.location.y, end_point.location.z),
+            (end_point.orientation.x, end_point.orientation.y, end_point.orientation.z))
+
+
+# Increase it when the planner computes different routes, the distances
+# cached by other versions are then ignored.
+CACHE_VERSION = 2
+
+_KEY_PREFIX = 'v%d|' % CACHE_VERSION
+
+
+def _query_key(query):
+    return _KEY_PREFIX + '|'.join(','.join('%.3f' % value for value in vector)
+                                  for vector in query)
+
+
+# Planner instance of each worker process when filling the cache in parallel.
+_worker_planner = None
+
+
+def _init_worker(city_name):
+    global _worker_planner
+    _worker_planner = Planner(city_name)
+
+
+def _compute_distance(query):
+    return _worker_planner.get_shortest_path_distance(*query)
+
+
+class ShortestPathCache(object):
+    """
+    Shortest path distances between pairs of start and end spots of a city,
+    keyed by their positions and orientations. The cache is stored next to
+    the planner map files so that every run after the first one can skip the
+    route computations.
+    """
+
+    def __init__(self, city_name, cache_file=None):
+        self._city_name = city_name
+        if cache_file is None:
+            cache_file = os.path.join(os.path.dirname(carla.planner.__file__),
+                                      city_name + 'ShortestPaths.json')
+        self._cache_file = cache_file
+        self._distances = {}
+
+        if os.path.exists(self._cache_file):
+            try:
+                with open(self._cache_file, 'r') as f:
+                    self._distances = dict(
+                        (key, distance) for key, distance in json.load(f).items()
+                        if key.startswith(_KEY_PREFIX))
+            except (ValueError, AttributeError) as error:
+                logging.warning('ignoring corrupted shortest path cache %s: %s',
+                                self._cache_file, error)
+
+    def get(self, start_point, end_point):
+        """
+        Return the cached distance between two spots, None if it is unknown.
+        """
+        return self._distances.get(_query_key(shortest_path_query(start_point, end_point)))
+
+    def fill(self, pairs, planner=None, processes=1):
+        """
+        Compute the distances for the (start, end) pairs missing in the cache
+        and store the updated cache on disk.
+
+        Args:
+            pairs: iterable of (start_point, end_point) transforms.
+            planner: planner used when computing serially. A new one is
+                created if not given.
+            processes: number of worker processes used for the computation.
+        """
+        queries = {}
+        for start_point, end_point in pairs:
+            query = shortest_path_query(start_point, end_point)
+            key = _query_key(query)
+            if key not in self._distances:
+                queries[key] = query
+
+        if not queries:
+            return
+
+        logging.info('Computing %d shortest paths for %s', len(queries), self._city_name)
+        keys = list(queries.keys())
+        if processes > 1:
+            pool = multiprocessing.Pool(processes, _init_worker, (self._city_name,))
+            try:
+                distances = pool.map(_compute_distance, [queries[key] for key in keys])
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            if planner is None:
+                planner = Planner(self._city_name)
+            distances = [planner.get_shortest_path_distance(*queries[key]) for key in keys]
+
+        self._distances.update(zip(keys, distances))
+        self.save()
+
+    def save(self):
+        """Write the cache to disk, the cache file is replaced atomically."""
+        temporary_file = self._cache_file + '.tmp'
+        try:
+            with open(temporary_file, 'w') as f:
+                json.dump(self._distances, f, sort_keys=True)
+            os.rename(temporary_file, self._cache_file)
+        except (IOError, OSError) as error:
+            logging.warning('cannot write shortest path cache %s: %s',
+                            self._cache_file, error)
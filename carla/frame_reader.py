@@ -0,0 +1,123 @@
+# Copyright (c) 2017 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""Latest-frame-wins reading of the frames of an asynchronous episode."""
+
+import logging
+import threading
+
+from . import instrumentation
+
+
+class LatestFrameReader(object):
+    """
+    Reads the frames of a started episode on a background thread, keeping
+    only the newest one. A client falling behind the server then always
+    gets the freshest frame instead of the oldest one queued on the stream
+    socket, and the frames it had no time for are counted as skipped.
+
+    In synchronous mode the server waits for the control of every frame and
+    no frame is skipped, the reader then only lets the frames of several
+    servers be read concurrently. The controls are still sent with the
+    client, from any thread.
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self._condition = threading.Condition()
+        self._frame = None
+        self._error = None
+        self._running = False
+        self._thread = None
+        self._read_frames = 0
+        self._skipped_frames = 0
+
+    def start(self):
+        """
+        Start reading, the episode must be started. Raises RuntimeError while
+        the thread of a previous start has not exited.
+        """
+        if self._client.get_measurements_parser().reuse_messages:
+            raise ValueError('cannot read the frames ahead of a client reusing its messages')
+        if self._thread is not None and self._thread.is_alive():
+            raise RuntimeError('frame reader thread is still running')
+        self._frame = None
+        self._error = None
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='carla-frame-reader')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, wait=True):
+        """
+        Stop reading. The reader thread ends once its current read returns,
+        which is at the next frame of the server, waited for if wait is set,
+        up to the client timeout. The reader cannot be started again until
+        that thread has exited.
+        """
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if not wait:
+            return
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(self._client.get_timeout())
+            if self._thread.is_alive():
+                logging.warning('frame reader thread did not exit in %s seconds',
+                                self._client.get_timeout())
+        # Kept while alive, start refuses to run a second thread on the client.
+        if self._thread is not None and not self._thread.is_alive():
+            self._thread = None
+
+    def is_running(self):
+        return self._running
+
+    def get_read_frames(self):
+        """The number of frames read from the server."""
+        return self._read_frames
+
+    def get_skipped_frames(self):
+        """The number of frames replaced by a newer one before being taken."""
+        return self._skipped_frames
+
+    def read_data(self, timeout=None):
+        """
+        Take the newest frame not taken yet, waiting for it if needed. Returns
+        the same pair as CarlaClient.read_data, or None on timeout. Raises the
+        error that stopped the reader thread, if any.
+        """
+        with self._condition:
+            while self._frame is None and self._error is None and self._running:
+                if not self._condition.wait(timeout) and timeout is not None:
+                    break
+            frame, self._frame = self._frame, None
+            if frame is None and self._error is not None:
+                raise self._error
+            if frame is None and not self._running:
+                raise RuntimeError('frame reader is not running')
+            return frame
+
+    def _run(self):
+        try:
+            while self._running:
+                frame = self._client.read_data()
+                with self._condition:
+                    if self._frame is not None:
+                        self._skipped_frames += 1
+                        instrumentation.count('reader.skipped_frames')
+                    self._frame = frame
+                    self._read_frames += 1
+                    self._condition.notify_all()
+        except Exception as error:
+            if self._running:
+                logging.debug('frame reader stopped: %s', error)
+            with self._condition:
+                self._error = error
+                self._condition.notify_all()
+        finally:
+            with self._condition:
+                self._running = False
+                self._condition.notify_all()
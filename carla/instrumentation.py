@@ -0,0 +1,286 @@
+# Copyright (c) 2017 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Timing instrumentation.
+
+Named spans time sections of code with a monotonic, high resolution timer
+and aggregate their durations in histograms, named counters accumulate
+values such as bytes received. Instrumentation is disabled by default, a
+span then costs a function call and a no-op context manager:
+
+    with instrumentation.span('tcp.read'):
+        data = ...
+    instrumentation.count('tcp.read.bytes', len(data))
+
+Call enable() to start recording, the recorded statistics can be logged
+periodically with a LogReporter or dumped with dump_json and dump_csv.
+"""
+
+import csv
+import json
+import logging
+import math
+import threading
+import time
+
+
+_timer = getattr(time, 'perf_counter', time.time)
+
+# Histogram buckets per power of two, the percentiles are exact within
+# 1 / (2 * _SUB_BUCKETS) of their value.
+_SUB_BUCKETS = 16
+
+
+class SpanStats(object):
+    """Durations of the spans of a name, in seconds."""
+
+    __slots__ = ('count', 'total', 'min', 'max', '_buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+        self._buckets = {}
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        mantissa, exponent = math.frexp(seconds)
+        bucket = exponent * _SUB_BUCKETS + int((mantissa - 0.5) * 2 * _SUB_BUCKETS)
+        self._buckets[bucket] = self._buckets.get(bucket, 0) + 1
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, percent):
+        """The duration below which percent of the spans are, estimated."""
+        if not self.count:
+            return 0.0
+        rank = percent / 100.0 * self.count
+        seen = 0
+        for bucket in sorted(self._buckets):
+            seen += self._buckets[bucket]
+            if seen >= rank:
+                exponent, sub_bucket = divmod(bucket, _SUB_BUCKETS)
+                middle = math.ldexp(0.5 + (sub_bucket + 0.5) / (2 * _SUB_BUCKETS), exponent)
+                return min(max(middle, self.min), self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.mean(),
+            'min': self.min if self.count else 0.0,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'max': self.max}
+
+
+class Recorder(object):
+    """The statistics of the spans and the counters, by name. Thread-safe."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spans = {}
+        self._counters = {}
+
+    def record(self, name, seconds):
+        with self._lock:
+            stats = self._spans.get(name)
+            if stats is None:
+                stats = self._spans[name] = SpanStats()
+            stats.add(seconds)
+
+    def count(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def get_span_stats(self, name):
+        """The statistics of the spans of a name, None if there is none."""
+        return self._spans.get(name)
+
+    def get_span_total(self, name):
+        """The total duration of the spans of a name, in seconds."""
+        stats = self._spans.get(name)
+        return stats.total if stats is not None else 0.0
+
+    def get_counter(self, name):
+        return self._counters.get(name, 0)
+
+    def snapshot(self):
+        """The statistics of every span and the counters, as a dict."""
+        with self._lock:
+            return {
+                'spans': dict((name, stats.to_dict()) for name, stats in self._spans.items()),
+                'counters': dict(self._counters)}
+
+    def reset(self):
+        with self._lock:
+            self._spans = {}
+            self._counters = {}
+
+
+class _Span(object):
+
+    __slots__ = ('_recorder', '_name', '_start')
+
+    def __init__(self, recorder, name):
+        self._recorder = recorder
+        self._name = name
+
+    def __enter__(self):
+        self._start = _timer()
+        return self
+
+    def __exit__(self, *args):
+        self._recorder.record(self._name, _timer() - self._start)
+
+
+class _NullSpan(object):
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+_recorder = None
+
+
+def enable(recorder=None):
+    """Start recording, on a new Recorder if none is given. Returns it."""
+    global _recorder
+    _recorder = recorder if recorder is not None else Recorder()
+    return _recorder
+
+
+def disable():
+    global _recorder
+    _recorder = None
+
+
+def is_enabled():
+    return _recorder is not None
+
+
+def get_recorder():
+    """The active Recorder, None if disabled."""
+    return _recorder
+
+
+def span(name):
+    """A context manager timing the code it wraps as a span called name."""
+    recorder = _recorder
+    if recorder is None:
+        return _NULL_SPAN
+    return _Span(recorder, name)
+
+
+def count(name, value=1):
+    """Add value to the counter called name."""
+    recorder = _recorder
+    if recorder is not None:
+        recorder.count(name, value)
+
+
+def format_summary(snapshot):
+    """One line per span and per counter of a snapshot, sorted by name."""
+    lines = []
+    for name, stats in sorted(snapshot['spans'].items()):
+        lines.append(
+            '%s: %d spans, total %.1f ms, mean %.1f us, p50 %.1f us, p99 %.1f us, max %.1f us' % (
+                name, stats['count'], 1e3 * stats['total'], 1e6 * stats['mean'],
+                1e6 * stats['p50'], 1e6 * stats['p99'], 1e6 * stats['max']))
+    for name, value in sorted(snapshot['counters'].items()):
+        lines.append('%s: %s' % (name, value))
+    return lines
+
+
+def dump_json(filename, recorder=None):
+    """Write the snapshot of a recorder, the active one by default."""
+    recorder = recorder or _recorder
+    with open(filename, 'w') as f:
+        json.dump(recorder.snapshot(), f, indent=2, sort_keys=True)
+
+
+def dump_csv(filename, recorder=None):
+    """
+    Write the span statistics of a recorder, the active one by default, one
+    row per span name with the durations in seconds, then one row per
+    counter with its value as count.
+    """
+    recorder = recorder or _recorder
+    snapshot = recorder.snapshot()
+    fields = ['count', 'total', 'mean', 'min', 'p50', 'p90', 'p99', 'max']
+    with open(filename, 'w') as f:
+        writer = csv.writer(f)
+        writer.writerow(['name'] + fields)
+        for name, stats in sorted(snapshot['spans'].items()):
+            writer.writerow([name] + [stats[field] for field in fields])
+        for name, value in sorted(snapshot['counters'].items()):
+            writer.writerow([name, value] + [''] * (len(fields) - 1))
+
+
+def dump(filename, recorder=None):
+    """Write CSV if filename ends with .csv, JSON otherwise."""
+    if filename.endswith('.csv'):
+        dump_csv(filename, recorder)
+    else:
+        dump_json(filename, recorder)
+
+
+class LogReporter(object):
+    """
+    Logs the summary of the spans of a recorder every interval seconds,
+    from a background thread. Every report covers the spans since the
+    previous one if reset is set, else since recording started.
+    """
+
+    def __init__(self, interval=10.0, recorder=None, reset=True, level=logging.INFO):
+        self._interval = interval
+        self._recorder = recorder
+        self._reset = reset
+        self._level = level
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='instrumentation-reporter')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def report(self):
+        recorder = self._recorder or _recorder
+        if recorder is None:
+            return
+        snapshot = recorder.snapshot()
+        if self._reset:
+            recorder.reset()
+        for line in format_summary(snapshot):
+            logging.log(self._level, line)
+
+    def _run(self):
+        while not self._stop_event.wait(self._interval):
+            self.report()
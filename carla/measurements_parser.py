@@ -0,0 +1,343 @@
+# Copyright (c) 2017 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Parsing of the measurements the server sends every frame.
+
+The speed of the protobuf parsing depends on the backend protobuf was
+built with: the C++ and upb ones parse in native code, the pure-Python one
+builds a Python object for every message and every field, which dominates
+the frame time with many non-player agents. A MeasurementsParser can then
+decode the non-player agents straight from the wire format into a NumPy
+array of AGENT_DTYPE, without an object per agent, and parse only the rest
+of the measurements with protobuf.
+
+agents_to_array gives the same array for measurements parsed by protobuf,
+so the agents of a frame can be filtered and transformed with vectorized
+operations whatever the parser:
+
+    agents = measurements_parser.agents_to_array(measurements)
+    vehicles = agents[agents['kind'] == measurements_parser.KIND_VEHICLE]
+    x, y = vehicles['location'][:, 0], vehicles['location'][:, 1]
+"""
+
+import logging
+import struct
+
+try:
+    from . import carla_server_pb2 as carla_protocol
+except ImportError:
+    raise RuntimeError('cannot import "carla_server_pb2.py", run the protobuf compiler to generate this file')
+
+try:
+    import numpy
+except ImportError:
+    raise RuntimeError('cannot import numpy, make sure numpy package is installed.')
+
+try:
+    from google.protobuf.internal import api_implementation
+except ImportError:
+    api_implementation = None
+
+
+# The kind of an agent, the field of the Agent message it has set.
+AGENT_KINDS = ['none', 'vehicle', 'pedestrian', 'traffic_light', 'speed_limit_sign']
+
+KIND_NONE = 0
+KIND_VEHICLE = 1
+KIND_PEDESTRIAN = 2
+KIND_TRAFFIC_LIGHT = 3
+KIND_SPEED_LIMIT_SIGN = 4
+
+_KIND_NUMBERS = dict((name, number) for number, name in enumerate(AGENT_KINDS))
+
+# The traffic_light_state of the agents other than traffic lights.
+NO_TRAFFIC_LIGHT_STATE = -1
+
+# The fields of an agent, location (x, y, z), rotation (pitch, yaw, roll),
+# the extent of the bounding box and the forward speed of the vehicles and
+# the pedestrians, and the TrafficLight.State of the traffic lights.
+AGENT_DTYPE = numpy.dtype([
+    ('id', numpy.uint32),
+    ('kind', numpy.uint8),
+    ('location', numpy.float32, (3,)),
+    ('rotation', numpy.float32, (3,)),
+    ('extent', numpy.float32, (3,)),
+    ('forward_speed', numpy.float32),
+    ('traffic_light_state', numpy.int8)])
+
+_NON_PLAYER_AGENTS = carla_protocol.Measurements.DESCRIPTOR.fields_by_name[
+    'non_player_agents'].number
+
+_unpack_float = struct.Struct('<f').unpack_from
+_unpack_fixed32 = struct.Struct('<L').unpack_from
+
+_warned_slow_backend = False
+
+
+def get_protobuf_backend():
+    """The protobuf backend in use: 'upb', 'cpp' or 'python'."""
+    if api_implementation is None:
+        return 'python'
+    return api_implementation.Type()
+
+
+def is_protobuf_accelerated():
+    """Whether protobuf parses in native code."""
+    return get_protobuf_backend() != 'python'
+
+
+def warn_if_slow_backend():
+    """Log once if protobuf runs on its slow pure-Python backend."""
+    global _warned_slow_backend
+    if not _warned_slow_backend and not is_protobuf_accelerated():
+        _warned_slow_backend = True
+        logging.warning(
+            'protobuf runs on its pure-Python backend, parsing the measurements is slow; '
+            'install a protobuf with the upb or C++ backend')
+
+
+class MeasurementsWithAgents(object):
+    """
+    The measurements of a frame parsed with the agents as an array: the
+    non-player agents are in agents, an array of AGENT_DTYPE, and
+    non_player_agents is empty. Every other field is the one of the
+    Measurements message.
+    """
+
+    __slots__ = ('message', 'agents')
+
+    def __init__(self, message, agents):
+        self.message = message
+        self.agents = agents
+
+    def __getattr__(self, name):
+        return getattr(self.message, name)
+
+
+class MeasurementsParser(object):
+    """
+    Parses the Measurements messages of the frames.
+
+    Args:
+        reuse_messages: parse every frame into the same message instead of
+            a new one. The measurements returned are then only valid until
+            the next frame is parsed.
+        agents_array: return MeasurementsWithAgents, decoding the
+            non-player agents into an array.
+    """
+
+    def __init__(self, reuse_messages=False, agents_array=False):
+        self.reuse_messages = reuse_messages
+        self.agents_array = agents_array
+        self._message = None
+        warn_if_slow_backend()
+
+    def parse(self, data):
+        """The measurements of a frame from their serialized message."""
+        if self.agents_array:
+            data, agents = split_agents(data)
+        message = self._get_message()
+        message.ParseFromString(data)
+        if self.agents_array:
+            return MeasurementsWithAgents(message, agents)
+        return message
+
+    def _get_message(self):
+        if not self.reuse_messages:
+            return carla_protocol.Measurements()
+        if self._message is None:
+            self._message = carla_protocol.Measurements()
+        return self._message
+
+
+def agents_to_array(measurements):
+    """
+    The non-player agents of measurements as an array of AGENT_DTYPE, in a
+    single pass over the messages of the agents. The array already decoded
+    for MeasurementsWithAgents.
+    """
+    if isinstance(measurements, MeasurementsWithAgents):
+        return measurements.agents
+    agents = measurements.non_player_agents
+    array = numpy.zeros(len(agents), dtype=AGENT_DTYPE)
+    array['traffic_light_state'] = NO_TRAFFIC_LIGHT_STATE
+    ids = array['id']
+    kinds = array['kind']
+    locations = array['location']
+    rotations = array['rotation']
+    extents = array['extent']
+    speeds = array['forward_speed']
+    states = array['traffic_light_state']
+    for index, agent in enumerate(agents):
+        ids[index] = agent.id
+        name = agent.WhichOneof('agent')
+        if name is None:
+            continue
+        kind = _KIND_NUMBERS[name]
+        kinds[index] = kind
+        message = getattr(agent, name)
+        transform = message.transform
+        location = transform.location
+        rotation = transform.rotation
+        locations[index] = (location.x, location.y, location.z)
+        rotations[index] = (rotation.pitch, rotation.yaw, rotation.roll)
+        if kind <= KIND_PEDESTRIAN:
+            extent = message.bounding_box.extent
+            extents[index] = (extent.x, extent.y, extent.z)
+            speeds[index] = message.forward_speed
+        elif kind == KIND_TRAFFIC_LIGHT:
+            states[index] = message.state
+    return array
+
+
+def count_agents(measurements):
+    """The number of non-player agents of measurements."""
+    if isinstance(measurements, MeasurementsWithAgents):
+        return len(measurements.agents)
+    return len(measurements.non_player_agents)
+
+
+def split_agents(data):
+    """
+    Split a serialized Measurements message into the message without its
+    non-player agents and the agents decoded into an array of AGENT_DTYPE.
+    """
+    buf = bytearray(data)
+    rest = []
+    agents = []
+    pos = 0
+    end = len(buf)
+    while pos < end:
+        start = pos
+        key, pos = _read_varint(buf, pos)
+        if key >> 3 == _NON_PLAYER_AGENTS and key & 7 == 2:
+            length, pos = _read_varint(buf, pos)
+            agents.append(_read_agent(buf, pos, pos + length))
+            pos += length
+        else:
+            pos = _skip_field(buf, pos, key & 7)
+            rest.append(data[start:pos])
+    return b''.join(rest), numpy.array(agents, dtype=AGENT_DTYPE)
+
+
+def _read_varint(buf, pos):
+    value = buf[pos]
+    pos += 1
+    if value < 0x80:
+        return value, pos
+    value &= 0x7f
+    shift = 7
+    while True:
+        byte = buf[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _skip_field(buf, pos, wire_type):
+    if wire_type == 0:
+        return _read_varint(buf, pos)[1]
+    if wire_type == 1:
+        return pos + 8
+    if wire_type == 2:
+        length, pos = _read_varint(buf, pos)
+        return pos + length
+    if wire_type == 5:
+        return pos + 4
+    raise ValueError('unsupported protobuf wire type %d' % wire_type)
+
+
+def _read_floats(buf, pos, end):
+    """The three float fields of a Vector3D or a Rotation3D message."""
+    values = [0.0, 0.0, 0.0]
+    while pos < end:
+        key, pos = _read_varint(buf, pos)
+        field = key >> 3
+        if key & 7 == 5 and 1 <= field <= 3:
+            values[field - 1] = _unpack_float(buf, pos)[0]
+            pos += 4
+        else:
+            pos = _skip_field(buf, pos, key & 7)
+    return values
+
+
+def _read_transform(buf, pos, end):
+    """The location and the rotation of a Transform message."""
+    location = rotation = (0.0, 0.0, 0.0)
+    while pos < end:
+        key, pos = _read_varint(buf, pos)
+        if key & 7 != 2:
+            pos = _skip_field(buf, pos, key & 7)
+            continue
+        length, pos = _read_varint(buf, pos)
+        field = key >> 3
+        if field == 1:
+            location = _read_floats(buf, pos, pos + length)
+        elif field == 3:
+            rotation = _read_floats(buf, pos, pos + length)
+        pos += length
+    return location, rotation
+
+
+def _read_extent(buf, pos, end):
+    """The extent of a BoundingBox message."""
+    extent = (0.0, 0.0, 0.0)
+    while pos < end:
+        key, pos = _read_varint(buf, pos)
+        if key == (2 << 3 | 2):
+            length, pos = _read_varint(buf, pos)
+            extent = _read_floats(buf, pos, pos + length)
+            pos += length
+        else:
+            pos = _skip_field(buf, pos, key & 7)
+    return extent
+
+
+def _read_agent(buf, pos, end):
+    """The AGENT_DTYPE record of an Agent message."""
+    agent_id = 0
+    kind = KIND_NONE
+    location = rotation = extent = (0.0, 0.0, 0.0)
+    forward_speed = 0.0
+    state = NO_TRAFFIC_LIGHT_STATE
+    while pos < end:
+        key, pos = _read_varint(buf, pos)
+        field = key >> 3
+        if field == 1 and key & 7 == 5:
+            agent_id = _unpack_fixed32(buf, pos)[0]
+            pos += 4
+        elif KIND_VEHICLE <= field - 1 <= KIND_SPEED_LIMIT_SIGN and key & 7 == 2:
+            # Vehicle, Pedestrian, TrafficLight and SpeedLimitSign all have
+            # their transform first, only the first two a bounding box and a
+            # forward speed, only TrafficLight a state.
+            kind = field - 1
+            if kind == KIND_TRAFFIC_LIGHT:
+                state = 0
+            length, pos = _read_varint(buf, pos)
+            kind_end = pos + length
+            while pos < kind_end:
+                key, pos = _read_varint(buf, pos)
+                if key == (1 << 3 | 2):
+                    length, pos = _read_varint(buf, pos)
+                    location, rotation = _read_transform(buf, pos, pos + length)
+                    pos += length
+                elif key == (4 << 3 | 2) and kind <= KIND_PEDESTRIAN:
+                    length, pos = _read_varint(buf, pos)
+                    extent = _read_extent(buf, pos, pos + length)
+                    pos += length
+                elif key == (3 << 3 | 5) and kind <= KIND_PEDESTRIAN:
+                    forward_speed = _unpack_float(buf, pos)[0]
+                    pos += 4
+                elif key == (2 << 3 | 0) and kind == KIND_TRAFFIC_LIGHT:
+                    state, pos = _read_varint(buf, pos)
+                else:
+                    pos = _skip_field(buf, pos, key & 7)
+        else:
+            pos = _skip_field(buf, pos, key & 7)
+    return agent_id, kind, location, rotation, extent, forward_speed, state
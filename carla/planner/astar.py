@@ -6,66 +6,116 @@
 
 import heapq
 
+import numpy as np
 
-class Cell(object):
-    def __init__(self, x, y, reachable):
-        """Initialize new cell.
 
-        @param reachable is cell reachable? not a wall?
-        @param x cell x coordinate
-        @param y cell y coordinate
-        @param g cost to move from the starting cell to this cell.
-        @param h estimation of the cost to move from this cell
-                 to the ending cell.
-        @param f f = g + h
-        """
-        self.reachable = reachable
-        self.x = x
-        self.y = y
-        self.parent = None
-        self.g = 0
-        self.h = 0
-        self.f = 0
+class _CellIndex(int):
+    """
+    Flat index of a cell on the open list. Two different cells with the same
+    f and g scores never compare as lower than each other, so ties are
+    resolved by the heap structure alone, as the original Cell based solver
+    did.
+    """
+    __slots__ = ()
 
     def __lt__(self, other):
-        return self.g < other.g
+        return False
 
 
 class AStar(object):
+    """
+    A* over a 4-connected grid. The grid is stored on flat arrays indexed by
+    x * height + y: a boolean wall grid, the g scores, the parent of every
+    visited cell and the closed flags. The free neighbours of every cell
+    are kept in CSR form, adj_indices[adj_indptr[cell]:adj_indptr[cell + 1]].
+    """
+
     def __init__(self):
-        # open list
+        # open list of (f, g, cell) tuples, stale entries are skipped on pop
         self.opened = []
-        heapq.heapify(self.opened)
-        # visited cells list
-        self.closed = set()
-        # grid cells
-        self.cells = []
         self.grid_height = None
         self.grid_width = None
+        self.walls = None
+        self.g = None
+        self.parent = None
+        self.closed = None
+        self.adj_indptr = None
+        self.adj_indices = None
         self.start = None
         self.end = None
+        # cells whose search state was written by the last solve
+        self._visited = []
 
-    def init_grid(self, width, height, walls, start, end):
+    def init_grid(self, width, height, walls, start=None, end=None):
         """Prepare grid cells, walls.
 
+        The grid can be reused for many searches, see set_endpoints and
+        solve.
+
         @param width grid's width.
         @param height grid's height.
-        @param walls list of wall x,y tuples.
+        @param walls set of wall x,y tuples or a width x height boolean array.
         @param start grid starting point x,y tuple.
         @param end grid ending point x,y tuple.
         """
         self.grid_height = height
         self.grid_width = width
-        for x in range(self.grid_width):
-            for y in range(self.grid_height):
-                if (x, y) in walls:
-                    reachable = False
-                else:
-                    reachable = True
-                self.cells.append(Cell(x, y, reachable))
+        self.walls = np.zeros(width * height, dtype=bool)
+        if isinstance(walls, np.ndarray):
+            self.walls[:] = walls.reshape(-1) != 0
+        elif walls:
+            walls = np.array(list(walls), dtype=np.int32)
+            self.walls[walls[:, 0] * height + walls[:, 1]] = True
+        self.g = np.zeros(width * height, dtype=np.int32)
+        self.parent = np.full(width * height, -1, dtype=np.int32)
+        self.closed = np.zeros(width * height, dtype=bool)
+        self._make_adjacency()
+        self._visited = []
+        if start is not None and end is not None:
+            self.set_endpoints(start, end)
+
+    def _make_adjacency(self):
+        """
+        Build the CSR lists of the cells adjacent to every cell that are not
+        walls, in the order of get_adjacent_cells.
+        """
+        width, height = self.grid_width, self.grid_height
+        cells = np.arange(width * height, dtype=np.int32)
+        x, y = np.divmod(cells, height)
+        adjacent = np.stack([
+            np.where(x < width - 1, cells + height, -1),
+            np.where(y > 0, cells - 1, -1),
+            np.where(x > 0, cells - height, -1),
+            np.where(y < height - 1, cells + 1, -1)], axis=1)
+        valid = adjacent >= 0
+        valid[valid] = ~self.walls[adjacent[valid]]
+
+        self.adj_indptr = np.zeros(width * height + 1, dtype=np.int32)
+        np.cumsum(valid.sum(axis=1), out=self.adj_indptr[1:])
+        # Row major, the cells keep their adjacency order.
+        self.adj_indices = adjacent[valid].astype(np.int32)
+
+    def set_endpoints(self, start, end):
+        """Set the starting and ending points of the next search.
+
+        @param start grid starting point x,y tuple.
+        @param end grid ending point x,y tuple.
+        """
         self.start = self.get_cell(*start)
         self.end = self.get_cell(*end)
 
+    def reset(self):
+        """Clear the search state of the previous solve.
+
+        Only the cells visited by that search are touched.
+        """
+        if self._visited:
+            visited = np.array(self._visited, dtype=np.int32)
+            self.parent[visited] = -1
+            self.closed[visited] = False
+            self._visited = []
+        del self.opened[:]
+
     def get_heuristic(self, cell):
         """Compute the heuristic value H for a cell.
 
@@ -73,16 +123,18 @@ class AStar(object):
 
         @returns heuristic value H
         """
-        return 10 * (abs(cell.x - self.end.x) + abs(cell.y - self.end.y))
+        x, y = divmod(cell, self.grid_height)
+        end_x, end_y = divmod(self.end, self.grid_height)
+        return 10 * (abs(x - end_x) + abs(y - end_y))
 
     def get_cell(self, x, y):
-        """Returns a cell from the cells list.
+        """Returns the flat index of a cell.
 
         @param x cell x coordinate
         @param y cell y coordinate
         @returns cell
         """
-        return self.cells[x * self.grid_height + y]
+        return x * self.grid_height + y
 
     def get_adjacent_cells(self, cell):
         """Returns adjacent cells to a cell.
@@ -92,65 +144,95 @@ class AStar(object):
         @param cell get adjacent cells for this cell
         @returns adjacent cells list.
         """
+        x, y = divmod(cell, self.grid_height)
         cells = []
-        if cell.x < self.grid_width - 1:
-            cells.append(self.get_cell(cell.x + 1, cell.y))
-        if cell.y > 0:
-            cells.append(self.get_cell(cell.x, cell.y - 1))
-        if cell.x > 0:
-            cells.append(self.get_cell(cell.x - 1, cell.y))
-        if cell.y < self.grid_height - 1:
-            cells.append(self.get_cell(cell.x, cell.y + 1))
+        if x < self.grid_width - 1:
+            cells.append(cell + self.grid_height)
+        if y > 0:
+            cells.append(cell - 1)
+        if x > 0:
+            cells.append(cell - self.grid_height)
+        if y < self.grid_height - 1:
+            cells.append(cell + 1)
         return cells
 
     def get_path(self):
+        parent = memoryview(self.parent)
         cell = self.end
-        path = [(cell.x, cell.y)]
-        while cell.parent is not self.start:
-            cell = cell.parent
-            path.append((cell.x, cell.y))
+        path = []
+        while cell != self.start:
+            path.append(divmod(cell, self.grid_height))
+            cell = parent[cell]
 
-        path.append((self.start.x, self.start.y))
+        path.append(divmod(self.start, self.grid_height))
         path.reverse()
         return path
 
-    def update_cell(self, adj, cell):
-        """Update adjacent cell.
-
-        @param adj adjacent cell to current cell
-        @param cell current cell being processed
-        """
-        adj.g = cell.g + 10
-        adj.h = self.get_heuristic(adj)
-        adj.parent = cell
-        adj.f = adj.h + adj.g
-
-    def solve(self):
+    def solve(self, overlay=None):
         """Solve maze, find path to ending cell.
 
+        @param overlay flat indices, see get_cell, of extra walls used only
+            for this search.
         @returns path or None if not found.
         """
+        self.reset()
+        overlay_cells = []
+        for cell in overlay or ():
+            if not self.walls[cell]:
+                self.walls[cell] = True
+                overlay_cells.append(cell)
+        try:
+            return self._search()
+        finally:
+            self.walls[overlay_cells] = False
+
+    def _search(self):
+        # Scalar accesses go through memoryviews of the arrays, much cheaper
+        # than indexing the NumPy arrays one element at a time.
+        walls = memoryview(self.walls)
+        closed = memoryview(self.closed)
+        parent = memoryview(self.parent)
+        g_score = memoryview(self.g)
+        adj_indptr = memoryview(self.adj_indptr)
+        adj_indices = memoryview(self.adj_indices)
+        visited = self._visited
+        opened = self.opened
+        height = self.grid_height
+        end = self.end
+        # The heuristic of get_heuristic is split by axis, the Manhattan
+        # distance of a column and of a row to the ending cell times 10,
+        # and added up for every cell pushed.
+        end_x, end_y = divmod(end, height)
+        heuristic_x = [10 * abs(x - end_x) for x in range(self.grid_width)]
+        heuristic_y = [10 * abs(y - end_y) for y in range(height)]
         # add starting cell to open heap queue
-        heapq.heappush(self.opened, (self.start.f, self.start))
-        while len(self.opened):
+        visited.append(self.start)
+        heapq.heappush(opened, (0, 0, _CellIndex(self.start)))
+        while opened:
             # pop cell from heap queue
-            _, cell = heapq.heappop(self.opened)
+            _, g, cell = heapq.heappop(opened)
+            # skip the entries left behind by a cell that was improved
+            if closed[cell]:
+                continue
             # add cell to closed list so we don't process it twice
-            self.closed.add(cell)
+            closed[cell] = True
             # if ending cell, return found path
-            if cell is self.end:
+            if cell == end:
                 return self.get_path()
-            # get adjacent cells for cell
-            adj_cells = self.get_adjacent_cells(cell)
-            for adj_cell in adj_cells:
-                if adj_cell.reachable and adj_cell not in self.closed:
-                    if (adj_cell.f, adj_cell) in self.opened:
-                        # if adj cell in open list, check if current path is
-                        # better than the one previously found
-                        # for this adj cell.
-                        if adj_cell.g > cell.g + 10:
-                            self.update_cell(adj_cell, cell)
-                    else:
-                        self.update_cell(adj_cell, cell)
-                        # add adj cell to open list
-                        heapq.heappush(self.opened, (adj_cell.f, adj_cell))
+            # adjacent cells, clockwise starting from the one on the right,
+            # the static walls are not on the lists, the overlay ones are
+            # on the wall grid.
+            adj_g = g + 10
+            for adj in adj_indices[adj_indptr[cell]:adj_indptr[cell + 1]]:
+                if walls[adj] or closed[adj]:
+                    continue
+                # if adj cell in open list, check if current path is
+                # better than the one previously found for this adj cell.
+                if parent[adj] < 0 or g_score[adj] > adj_g:
+                    if parent[adj] < 0:
+                        visited.append(adj)
+                    g_score[adj] = adj_g
+                    parent[adj] = cell
+                    heapq.heappush(opened, (adj_g + heuristic_x[adj // height]
+                                            + heuristic_y[adj % height],
+                                            adj_g, _CellIndex(adj)))
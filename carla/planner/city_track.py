@@ -4,15 +4,20 @@
 # This work is licensed under the terms of the MIT license.
 # For a copy, see <https://opensource.org/licenses/MIT>.
 
+import numpy as np
+
 from carla.planner.graph import sldist
 
 from carla.planner.astar import AStar
+from carla.planner.converter import WORLD
+from carla.planner.graph_router import GraphRouter
+from carla.planner.grid import is_offset_walled
 from carla.planner.map import CarlaMap
 
 
 class CityTrack(object):
 
-    def __init__(self, city_name):
+    def __init__(self, city_name, route_engine='grid'):
 
         # These values are fixed for every city.
         self._node_density = 50.0
@@ -20,7 +25,22 @@ class CityTrack(object):
 
         self._map = CarlaMap(city_name, self._pixel_density, self._node_density)
 
+        # The search grid is built once, the routes only lay the directional
+        # walls over the static ones.
         self._astar = AStar()
+        self._astar.init_grid(self._map.get_graph_resolution()[0],
+                              self._map.get_graph_resolution()[1],
+                              self._map.get_wall_map())
+
+        # Optionally, the routes between road cells are computed on the road
+        # graph, the grid search is kept for the other cells and for the
+        # routes the graph can not tell apart from other shortest ones.
+        if route_engine == 'graph':
+            self._router = GraphRouter(self._map.get_graph())
+        elif route_engine == 'grid':
+            self._router = None
+        else:
+            raise ValueError('unknown route engine %r' % route_engine)
 
         # Refers to the start position of the previous route computation
         self._previous_node = []
@@ -49,6 +69,19 @@ class CityTrack(object):
 
         return node
 
+    def project_node_array(self, positions):
+        """
+            Batched project_node, for a (N, 3) array of world positions
+        """
+
+        nodes = self._map.convert_to_node_array(positions, WORLD)
+
+        resolution = self._map.get_graph_resolution()
+        nodes[:, 0] = np.clip(nodes[:, 0], 0, resolution[0] - 1)
+        nodes[:, 1] = np.clip(nodes[:, 1], 0, resolution[1] - 1)
+
+        return self._map.search_on_grid_array(nodes)
+
     def get_intersection_nodes(self):
         return self._map.get_intersection_nodes()
 
@@ -77,30 +110,71 @@ class CityTrack(object):
         return self._closest_intersection_route_position(current_node,
                                                          self._route) > 4
 
+    def get_closest_intersection_distances(self, nodes):
+        """
+            Batched distance to the closest intersection, for a (N, 2)
+            array of nodes. It is compared to the same thresholds as
+            is_away_from_intersection and is_far_away_from_route_intersection.
+        """
+        return self._map.get_distance_closest_nodes(nodes)
+
+    def get_route_key(self, node_source, source_ori, node_target, target_ori):
+        """
+            A key identifying the route computed by compute_route, the
+            orientations are quantized into the directed walls they produce.
+        """
+        source_bucket, target_bucket = self._map.get_heading_buckets(source_ori, target_ori)
+        return node_source, source_bucket, node_target, target_bucket
+
+    def is_step_walled(self, source_bucket, node, next_node):
+        """
+            If the directed walls of a source heading bucket, see
+            get_route_key, block the step between two adjacent nodes.
+        """
+        return is_offset_walled(source_bucket, (next_node[0] - node[0],
+                                                next_node[1] - node[1]))
+
+    def set_route(self, node_source, route):
+        """
+            Set a previously computed route as the current one.
+        """
+        self._previous_node = node_source
+        self._route = route
+
     def compute_route(self, node_source, source_ori, node_target, target_ori):
 
         self._previous_node = node_source
+        self._route = self.find_route(node_source, source_ori, node_target, target_ori)
+
+        return self._route
+
+    def find_route(self, node_source, source_ori, node_target, target_ori):
+        """
+            The route compute_route computes, without making it the current
+            route, so it can be computed for other agents.
+        """
+
+        overlay = self._map.get_walls_directed_overlay(
+            node_source, source_ori, node_target, target_ori)
+
+        if (self._router is not None and self._router.is_on_road(node_source)
+                and self._router.is_on_road(node_target)):
+            route, ambiguous = self._router.solve(node_source, node_target, overlay)
 
-        a_star = AStar()
-        a_star.init_grid(self._map.get_graph_resolution()[0],
-                         self._map.get_graph_resolution()[1],
-                         self._map.get_walls_directed(node_source, source_ori,
-                                                      node_target, target_ori), node_source,
-                         node_target)
+            # The same corner case as below
+            if route is None:
+                route, ambiguous = self._router.solve(node_source, node_target)
 
-        route = a_star.solve()
+            if not ambiguous:
+                return route
+
+        self._astar.set_endpoints(node_source, node_target)
+        route = self._astar.solve(overlay)
 
         # JuSt a Corner Case
         # Clean this to avoid having to use this function
         if route is None:
-            a_star = AStar()
-            a_star.init_grid(self._map.get_graph_resolution()[0],
-                             self._map.get_graph_resolution()[1], self._map.get_walls(),
-                             node_source, node_target)
-
-            route = a_star.solve()
-
-        self._route = route
+            route = self._astar.solve()
 
         return route
 
@@ -109,29 +183,22 @@ class CityTrack(object):
 
         for node_iter in route:
 
-            if node_iter in self._map.get_intersection_nodes():
+            if self._map.is_intersection(node_iter):
                 distance.append(sldist(node_iter, pos))
 
         if not distance:
             return sldist(route[-1], pos)
-        return sorted(distance)[0]
+        return min(distance)
 
+    def is_intersection(self, node):
+        return self._map.is_intersection(node)
 
     def _closest_intersection_position(self, current_node):
 
-        distance_vector = []
-        for node_iterator in self._map.get_intersection_nodes():
-            distance_vector.append(sldist(node_iterator, current_node))
-
-        return sorted(distance_vector)[0]
-
+        return self._map.get_distance_closest_node(current_node)
 
     def _closest_intersection_route_position(self, current_node, route):
 
-        distance_vector = []
-        for _ in route:
-            for node_iterator in self._map.get_intersection_nodes():
-                distance_vector.append(sldist(node_iterator, current_node))
-
-        return sorted(distance_vector)[0]
-
+        # The closest intersection of the whole map, the same for any route
+        # node, it used to be rescanned once per node of the route.
+        return self._map.get_distance_closest_node(current_node)
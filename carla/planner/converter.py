@@ -16,31 +16,44 @@ WORLD = 1
 NODE = 2
 
 
+def read_converter_constants(city_file):
+    """
+    Reads the world offset, world rotation angles and map offset from the
+    header of a city file.
+    """
+    with open(city_file, 'r') as f:
+        # The offset of the world from the zero coordinates ( The
+        # coordinate we consider zero)
+        worldoffset = string_to_floats(f.readline())
+
+        angles = string_to_floats(f.readline())
+
+        # Ignore for now, these are offsets for map coordinates and scale
+        # (not used).
+        _ = f.readline()
+
+        # The offset of the map zero coordinate.
+        mapoffset = string_to_floats(f.readline())
+
+    return worldoffset, angles, mapoffset
+
+
 class Converter(object):
 
-    def __init__(self, city_file,  pixel_density, node_density):
+    def __init__(self, city_file,  pixel_density, node_density, constants=None):
 
         self._node_density = node_density
         self._pixel_density = pixel_density
-        with open(city_file, 'r') as f:
-            # The offset of the world from the zero coordinates ( The
-            # coordinate we consider zero)
-            self._worldoffset = string_to_floats(f.readline())
-
-            angles = string_to_floats(f.readline())
+        if constants is None:
+            constants = read_converter_constants(city_file)
 
-            # If there is an rotation between the world and map coordinates.
-            self._worldrotation = np.array([
-                [math.cos(math.radians(angles[2])), -math.sin(math.radians(angles[2])), 0.0],
-                [math.sin(math.radians(angles[2])), math.cos(math.radians(angles[2])), 0.0],
-                [0.0, 0.0, 1.0]])
+        self._worldoffset, angles, self._mapoffset = constants
 
-            # Ignore for now, these are offsets for map coordinates and scale
-            # (not used).
-            _ = f.readline()
-
-            # The offset of the map zero coordinate.
-            self._mapoffset = string_to_floats(f.readline())
+        # If there is an rotation between the world and map coordinates.
+        self._worldrotation = np.array([
+            [math.cos(math.radians(angles[2])), -math.sin(math.radians(angles[2])), 0.0],
+            [math.sin(math.radians(angles[2])), math.cos(math.radians(angles[2])), 0.0],
+            [0.0, 0.0, 1.0]])
 
     def convert_to_node(self, input_data):
         """
@@ -90,6 +103,72 @@ class Converter(object):
         else:
             raise ValueError('Invalid node to be converted')
 
+    def convert_to_node_array(self, input_data, input_type):
+        """
+        Batched convert_to_node.
+        :param input_data: (N, 2) pixel or (N, 3) world positions
+        :param input_type: PIXEL or WORLD
+        :return: (N, 2) integer array of nodes
+        """
+        input_data = np.asarray(input_data, dtype=np.float64)
+        if input_type == PIXEL:
+            return self._pixel_to_node_array(input_data)
+        elif input_type == WORLD:
+            return self._pixel_to_node_array(self._world_to_pixel_array(input_data))
+        else:
+            raise ValueError('Invalid node to be converted')
+
+    def convert_to_pixel_array(self, input_data, input_type):
+        """
+        Batched convert_to_pixel.
+        :param input_data: (N, 2) node or (N, 3) world positions
+        :param input_type: NODE or WORLD
+        :return: (N, 2) array of pixels
+        """
+        input_data = np.asarray(input_data, dtype=np.float64)
+        if input_type == NODE:
+            return self._node_to_pixel_array(input_data)
+        elif input_type == WORLD:
+            return self._world_to_pixel_array(input_data)
+        else:
+            raise ValueError('Invalid node to be converted')
+
+    def convert_to_world_array(self, input_data, input_type):
+        """
+        Batched convert_to_world.
+        :param input_data: (N, 2) pixel or node positions
+        :param input_type: PIXEL or NODE
+        :return: (N, 3) array of world positions
+        """
+        input_data = np.asarray(input_data, dtype=np.float64)
+        if input_type == NODE:
+            return self._pixel_to_world_array(self._node_to_pixel_array(input_data))
+        elif input_type == PIXEL:
+            return self._pixel_to_world_array(input_data)
+        else:
+            raise ValueError('Invalid node to be converted')
+
+    def _node_to_pixel_array(self, nodes):
+        return (nodes.reshape(-1, 2) + 2) * self._node_density
+
+    def _pixel_to_node_array(self, pixels):
+        return np.trunc(pixels.reshape(-1, 2) / self._node_density - 2).astype(np.int64)
+
+    def _pixel_to_world_array(self, pixels):
+        pixels = pixels.reshape(-1, 2)
+        world = np.empty((len(pixels), 3))
+        world[:, :2] = pixels * self._pixel_density + self._mapoffset[:2]
+        world[:, :2] -= self._worldoffset[:2]
+        world[:, 2] = 22
+        return world
+
+    def _world_to_pixel_array(self, world):
+        # All the positions are rotated on a single matrix multiply.
+        relative_location = world.reshape(-1, 3).dot(self._worldrotation)
+        relative_location += self._worldoffset
+        relative_location -= self._mapoffset
+        return np.floor(relative_location[:, :2] / float(self._pixel_density))
+
     def _node_to_pixel(self, node):
         """
         Conversion from node format (graph) to pixel (image)
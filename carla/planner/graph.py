@@ -4,7 +4,10 @@
 # This work is licensed under the terms of the MIT license.
 # For a copy, see <https://opensource.org/licenses/MIT>.
 
+import array
+import collections
 import math
+
 import numpy as np
 
 
@@ -27,18 +30,122 @@ def sldist3(c1, c2):
                      ** 2 + (c2[2] - c1[2]) ** 2)
 
 
+class NearestNodeIndex(object):
+    """
+    Answers the distance from a position to the closest node of a fixed
+    set. The distances from every cell of the graph resolution are
+    precomputed, so queries on graph nodes are a table lookup. Every unit
+    square between cells also keeps the few nodes that can be the closest
+    to one of its points, so the other positions on the map only compare
+    those. Positions out of the map are answered with a scan of the set.
+    """
+
+    def __init__(self, nodes, resolution):
+
+        self._nodes = np.array(sorted(nodes), dtype=np.float64).reshape(-1, 2)
+        self._resolution = resolution
+
+        cells = np.indices(resolution).reshape(2, -1).T
+        self._table = self._scan(cells).reshape(resolution)
+        self._candidates = self._make_candidates(cells)
+
+    def _make_candidates(self, cells):
+        """
+        The nodes that can be the closest to a point of the unit square of
+        each cell, as rows of indices on the nodes padded with the index of
+        a node at infinity.
+        """
+        # The node at infinity pads the rows.
+        padded_nodes = np.vstack([self._nodes, [np.inf, np.inf]])
+        if not len(self._nodes):
+            return padded_nodes, np.zeros((len(cells), 1), dtype=np.int32)
+
+        nodes = self._nodes[np.newaxis, :, :]
+        low = cells[:, np.newaxis, :].astype(np.float64)
+        high = low + 1.0
+        # Distances from every square to every node, to its closest point and
+        # to its farthest corner.
+        nearest = np.sqrt(((np.clip(nodes, low, high) - nodes) ** 2).sum(axis=2))
+        farthest = np.sqrt((np.maximum(np.abs(nodes - low), np.abs(nodes - high)) ** 2)
+                           .sum(axis=2))
+        # No point of the square is farther than bound from its closest node,
+        # the nodes nearer than bound to the square are the candidates.
+        bound = farthest.min(axis=1)
+        is_candidate = nearest <= bound[:, np.newaxis]
+
+        counts = is_candidate.sum(axis=1)
+        rows = np.full((len(cells), counts.max()), len(self._nodes), dtype=np.int32)
+        squares, node_indices = np.nonzero(is_candidate)
+        columns = np.arange(len(squares)) - np.repeat(np.cumsum(counts) - counts, counts)
+        rows[squares, columns] = node_indices
+        return padded_nodes, rows
+
+    def distance(self, pos):
+        """ Distance from a position to its closest node """
+        x, y = pos[0], pos[1]
+        if (x == int(x) and y == int(y) and 0 <= x < self._resolution[0]
+                and 0 <= y < self._resolution[1]):
+            return float(self._table[int(x), int(y)])
+
+        square_x, square_y = int(math.floor(x)), int(math.floor(y))
+        if 0 <= square_x < self._resolution[0] and 0 <= square_y < self._resolution[1]:
+            padded_nodes, rows = self._candidates
+            return min(math.hypot(x - node_x, y - node_y) for node_x, node_y in
+                       padded_nodes[rows[square_x * self._resolution[1] + square_y]].tolist())
+
+        return float(self._scan(np.array([[x, y]], dtype=np.float64))[0])
+
+    def distances(self, positions):
+        """ Distance from each of a (N, 2) array of positions to its closest node """
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        squares = np.floor(positions).astype(np.int64)
+        on_map = ((squares[:, 0] >= 0) & (squares[:, 0] < self._resolution[0])
+                  & (squares[:, 1] >= 0) & (squares[:, 1] < self._resolution[1]))
+        on_table = on_map & (positions == squares).all(axis=1)
+        on_squares = on_map & ~on_table
+
+        distances = np.empty(len(positions))
+        distances[on_table] = self._table[squares[on_table, 0], squares[on_table, 1]]
+
+        padded_nodes, rows = self._candidates
+        candidates = padded_nodes[rows[squares[on_squares, 0] * self._resolution[1]
+                                       + squares[on_squares, 1]]]
+        difference = positions[on_squares, np.newaxis, :] - candidates
+        distances[on_squares] = np.sqrt((difference ** 2).sum(axis=2)).min(axis=1)
+
+        distances[~on_map] = self._scan(positions[~on_map])
+        return distances
+
+    def _scan(self, positions):
+        if not len(self._nodes):
+            return np.full(len(positions), np.inf)
+        difference = positions[:, np.newaxis, :] - self._nodes[np.newaxis, :, :]
+        return np.sqrt((difference ** 2).sum(axis=2)).min(axis=1)
+
+
 class Graph(object):
     """
     A simple directed, weighted graph
+
+    Nodes are x, y tuples on the public methods. They are stored as flat
+    int32 node ids, x * height + y, so the resolution must be known before
+    adding any. The edges are stored as arrays of node ids and distances,
+    in the order they are added, and compiled into CSR form, see
+    get_adjacency.
     """
 
     def __init__(self, graph_file=None, node_density=50):
 
-        self._nodes = set()
+        self._resolution = None
         self._angles = {}
-        self._edges = {}
-        self._distances = {}
         self._node_density = node_density
+        # The ids of the nodes added, they may repeat.
+        self._node_ids = array.array('i')
+        self._edge_sources = array.array('i')
+        self._edge_targets = array.array('i')
+        self._edge_distances = array.array('d')
+        self._intersection_nodes = None
+        self._adjacency = None
 
         if graph_file is not None:
             with open(graph_file, 'r') as f:
@@ -54,23 +161,20 @@ class Graph(object):
                     from_node = string_to_node(from_node)
                     to_node = string_to_node(to_node)
 
-                    if from_node not in self._nodes:
-                        self.add_node(from_node)
-                    if to_node not in self._nodes:
-                        self.add_node(to_node)
-
-                    self._edges.setdefault(from_node, [])
-                    self._edges[from_node].append(to_node)
-                    self._distances[(from_node, to_node)] = float(d)
+                    self.add_node(from_node)
+                    self.add_node(to_node)
+                    self._add_edge(from_node, to_node, float(d))
 
     def add_node(self, value):
-        self._nodes.add(value)
+        self._node_ids.append(self.get_node_id(value))
+        self._intersection_nodes = None
+        self._adjacency = None
 
     def make_orientations(self, node, heading):
 
         import collections
         distance_dic = {}
-        for node_iter in self._nodes:
+        for node_iter in self.turn_nodes():
             if node_iter != node:
                 distance_dic[sldist(node, node_iter)] = node_iter
 
@@ -89,29 +193,113 @@ class Graph(object):
         self._add_edge(from_node, to_node, distance)
 
     def _add_edge(self, from_node, to_node, distance):
-        self._edges.setdefault(from_node, [])
-        self._edges[from_node].append(to_node)
-        self._distances[(from_node, to_node)] = distance
+        self._intersection_nodes = None
+        self._adjacency = None
+        self._edge_sources.append(self.get_node_id(from_node))
+        self._edge_targets.append(self.get_node_id(to_node))
+        self._edge_distances.append(distance)
+
+    def add_edges(self, edges, distances):
+        """
+        Add many edges and their nodes at once.
+        Args
+            edges: (N, 4) integer array with the from x, y and the to x, y
+                of each edge.
+            distances: the N distances of the edges.
+        """
+        edges = np.asarray(edges).reshape(-1, 4)
+        sources = (edges[:, 0] * self._resolution[1] + edges[:, 1]).astype(np.intc)
+        targets = (edges[:, 2] * self._resolution[1] + edges[:, 3]).astype(np.intc)
+        self._node_ids.frombytes(np.stack([sources, targets], axis=1).tobytes())
+        self._edge_sources.frombytes(sources.tobytes())
+        self._edge_targets.frombytes(targets.tobytes())
+        self._edge_distances.frombytes(np.asarray(distances, dtype=np.float64).tobytes())
+        self._intersection_nodes = None
+        self._adjacency = None
 
     def get_resolution(self):
         return self._resolution
+
+    def set_resolution(self, resolution):
+        self._resolution = resolution
+
+    def _get_edge_arrays(self):
+        """ The sources, targets and distances of the edges, in order """
+        return (np.frombuffer(self._edge_sources, dtype=np.intc),
+                np.frombuffer(self._edge_targets, dtype=np.intc),
+                np.frombuffer(self._edge_distances, dtype=np.float64))
+
     def get_edges(self):
-        return self._edges
+        """ The nodes each node has edges to, built from the edge arrays """
+        edges = {}
+        sources, targets, _ = self._get_edge_arrays()
+        for source, target in zip(sources.tolist(), targets.tolist()):
+            edges.setdefault(self.get_node(source), []).append(self.get_node(target))
+        return edges
+
+    def get_node_id(self, node):
+        """ The flat id of a node, x * height + y """
+        return node[0] * self._resolution[1] + node[1]
+
+    def get_node(self, node_id):
+        """ The x, y tuple of a flat node id """
+        return divmod(int(node_id), self._resolution[1])
+
+    def get_adjacency(self):
+        """
+        The graph in CSR form, compiled once until the graph changes.
+        Returns
+            node_ids: sorted int32 array with the flat ids of the N nodes.
+            indptr: int32 array of N + 1 offsets, the edges leaving
+                node_ids[i] are the entries indptr[i]:indptr[i + 1] of
+                indices and weights.
+            indices: int32 array with the position on node_ids of the node
+                each edge arrives to.
+            weights: float64 array with the distance of each edge.
+        """
+        if self._adjacency is None:
+            self._adjacency = self._make_adjacency()
+        return self._adjacency
+
+    def _make_adjacency(self):
+
+        node_ids = np.unique(np.frombuffer(self._node_ids, dtype=np.intc)).astype(np.int32)
+        sources, targets, distances = self._get_edge_arrays()
+
+        # Sort the edges by their origin, the order they were added in is
+        # kept for the edges leaving the same node.
+        order = np.argsort(sources, kind='mergesort')
+        source_indices = np.searchsorted(node_ids, sources[order])
+        indptr = np.zeros(len(node_ids) + 1, dtype=np.int32)
+        np.cumsum(np.bincount(source_indices, minlength=len(node_ids)), out=indptr[1:])
+        indices = np.searchsorted(node_ids, targets[order]).astype(np.int32)
+
+        return node_ids, indptr, indices, distances[order]
+
+    def get_distances(self):
+        """ The distance of every edge, keyed by its (from, to) nodes """
+        sources, targets, distances = self._get_edge_arrays()
+        return collections.OrderedDict(
+            ((self.get_node(source), self.get_node(target)), distance)
+            for source, target, distance in zip(sources.tolist(), targets.tolist(),
+                                                distances.tolist()))
 
     def intersection_nodes(self):
 
-        intersect_nodes = []
-        for node in self._nodes:
-            if len(self._edges[node]) > 2:
-                intersect_nodes.append(node)
+        # Computed once, until the graph changes.
+        if self._intersection_nodes is None:
+            node_ids, indptr, _, _ = self.get_adjacency()
+            self._intersection_nodes = [
+                self.get_node(node_id) for node_id in node_ids[np.diff(indptr) > 2]]
 
-        return intersect_nodes
+        return self._intersection_nodes
 
     # This contains also the non-intersection turns...
 
     def turn_nodes(self):
 
-        return self._nodes
+        node_ids, _, _, _ = self.get_adjacency()
+        return set(self.get_node(node_id) for node_id in node_ids.tolist())
 
     def plot_ori(self, c):
         from matplotlib import collections as mc
@@ -119,8 +307,9 @@ class Graph(object):
         import matplotlib.pyplot as plt
         line_len = 1
 
+        nodes = self.turn_nodes()
         lines = [[(p[0], p[1]), (p[0] + line_len * self._angles[p][0],
-                                 p[1] + line_len * self._angles[p][1])] for p in self._nodes]
+                                 p[1] + line_len * self._angles[p][1])] for p in nodes]
         lc = mc.LineCollection(lines, linewidth=2, color='green')
         _, ax = plt.subplots()
         ax.add_collection(lc)
@@ -128,14 +317,15 @@ class Graph(object):
         ax.autoscale()
         ax.margins(0.1)
 
-        xs = [p[0] for p in self._nodes]
-        ys = [p[1] for p in self._nodes]
+        xs = [p[0] for p in nodes]
+        ys = [p[1] for p in nodes]
 
         plt.scatter(xs, ys, color=c)
 
     def plot(self, c):
         import matplotlib.pyplot as plt
-        xs = [p[0] for p in self._nodes]
-        ys = [p[1] for p in self._nodes]
+        nodes = self.turn_nodes()
+        xs = [p[0] for p in nodes]
+        ys = [p[1] for p in nodes]
 
         plt.scatter(xs, ys, color=c)
@@ -0,0 +1,224 @@
+# Copyright (c) 2017 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Routing on the sparse road graph of a city, an alternative to the A* search
+over every road cell of the grid.
+"""
+
+import heapq
+
+import numpy as np
+
+
+def _length(from_node, to_node):
+    return abs(to_node[0] - from_node[0]) + abs(to_node[1] - from_node[1])
+
+
+def _get_cells(from_node, to_node):
+    """ The cells of a straight run, both ends included """
+    step_x = (to_node[0] > from_node[0]) - (to_node[0] < from_node[0])
+    step_y = (to_node[1] > from_node[1]) - (to_node[1] < from_node[1])
+    return [(from_node[0] + step_x * i, from_node[1] + step_y * i)
+            for i in range(_length(from_node, to_node) + 1)]
+
+
+class GraphRouter(object):
+    """
+    Shortest routes between two road cells, computed with Dijkstra on the
+    road graph instead of the grid. The roads of the grid are the straight
+    edges of the graph, so a route on the graph is expanded back into the
+    cells the grid search would return.
+
+    The source and target cells are spliced into the edges they lie on as
+    virtual nodes. The directed walls around them, given as the same flat
+    cell overlay the grid search takes, become restrictions on the edges
+    running through those cells.
+
+    Among several shortest routes the one the grid search returns is
+    chosen, when it can be told from the route lengths and the heuristic of
+    the grid search alone. Otherwise the route is flagged as ambiguous, see
+    solve.
+    """
+
+    def __init__(self, graph):
+
+        self._height = graph.get_resolution()[1]
+        node_ids, indptr, indices, _ = graph.get_adjacency()
+        self._nodes = [graph.get_node(node_id) for node_id in node_ids]
+
+        # The grid ignores the direction of the edges, every road is two
+        # ways and as long as its number of cells.
+        segments = set()
+        for from_index in range(len(node_ids)):
+            for to_index in indices[indptr[from_index]:indptr[from_index + 1]].tolist():
+                if from_index != to_index:
+                    segments.add((min(from_index, to_index), max(from_index, to_index)))
+        self._segments = sorted(segments)
+
+        self._adjacent = [[] for _ in self._nodes]
+        for segment_index, (from_index, to_index) in enumerate(self._segments):
+            length = _length(self._nodes[from_index], self._nodes[to_index])
+            self._adjacent[from_index].append((to_index, segment_index, length))
+            self._adjacent[to_index].append((from_index, segment_index, length))
+
+        # The node or the segment each cell belongs to, -1 if none.
+        resolution = graph.get_resolution()
+        self._cell_node = np.full(resolution, -1, dtype=np.int32)
+        self._cell_segment = np.full(resolution, -1, dtype=np.int32)
+        for segment_index, (from_index, to_index) in enumerate(self._segments):
+            for cell in _get_cells(self._nodes[from_index], self._nodes[to_index])[1:-1]:
+                self._cell_segment[cell] = segment_index
+        for node_index, node in enumerate(self._nodes):
+            self._cell_node[node] = node_index
+
+        self.expansions = 0
+
+    def is_on_road(self, node):
+        """ If a cell belongs to a node or an edge of the graph """
+        return self._cell_node[node] >= 0 or self._cell_segment[node] >= 0
+
+    def solve(self, source, target, overlay=None):
+        """
+        The shortest route between two road cells.
+        Args
+            source: source cell x,y tuple.
+            target: target cell x,y tuple.
+            overlay: flat cell ids, x * height + y, of extra walls.
+        Returns
+            the list of cells of the route, None if there is none, and if
+            the route is ambiguous: the grid search may return another
+            route of the same length.
+        """
+        if source == target:
+            return [source], False
+
+        vertices, edges = self._get_edges(source, target, overlay or ())
+        source_index = vertices.index(source)
+        target_index = vertices.index(target)
+
+        # Dijkstra, the graphs are a few dozen nodes.
+        distances = {source_index: 0}
+        closed = set()
+        opened = [(0, source_index)]
+        while opened:
+            distance, index = heapq.heappop(opened)
+            if index in closed:
+                continue
+            closed.add(index)
+            self.expansions += 1
+            if index == target_index:
+                path, ambiguous = self._backtrack(vertices, edges, distances, target_index)
+                return self._expand(path), ambiguous
+
+            for adj_index, length in edges[index]:
+                if adj_index in closed:
+                    continue
+                adj_distance = distance + length
+                if adj_index not in distances or adj_distance < distances[adj_index]:
+                    distances[adj_index] = adj_distance
+                    heapq.heappush(opened, (adj_distance, adj_index))
+
+        return None, False
+
+    def _backtrack(self, vertices, edges, distances, target_index):
+        """
+        Walk back the shortest route from the target. Among the shortest
+        routes, the one the grid search finds is followed: it reaches every
+        node from the neighbour cell closest, in Manhattan distance, to the
+        target. The choice is ambiguous when several neighbours are equally
+        close, the grid search then depends on the order of its open list.
+        """
+        target = vertices[target_index]
+        path = [target_index]
+        ambiguous = False
+        index = target_index
+        while distances[index] > 0:
+            node = vertices[index]
+            best = None
+            tied = False
+            # The edges go both ways but into the walls, that are never
+            # reached, so a vertex is reached from vertices it leaves to.
+            for adj_index, length in edges[index]:
+                if (adj_index not in distances
+                        or distances[adj_index] + length != distances[index]
+                        or (index, length) not in edges[adj_index]):
+                    continue
+                adj_node = vertices[adj_index]
+                previous = (node[0] + (adj_node[0] > node[0]) - (adj_node[0] < node[0]),
+                            node[1] + (adj_node[1] > node[1]) - (adj_node[1] < node[1]))
+                heuristic = _length(previous, target)
+                if best is None or heuristic < best[0]:
+                    best = (heuristic, adj_index)
+                    tied = False
+                elif heuristic == best[0]:
+                    tied = True
+            ambiguous = ambiguous or tied
+            index = best[1]
+            path.append(index)
+
+        path.reverse()
+        return [vertices[index] for index in path], ambiguous
+
+    def _get_edges(self, source, target, overlay):
+        """
+        The vertices of the graph with the source and target cells added,
+        splitting the segments they lie on, and the (vertex, length) lists
+        of the edges leaving each vertex that no wall of the overlay blocks.
+        """
+        vertices = list(self._nodes)
+        edges = [[] for _ in vertices]
+
+        # The virtual nodes of every split segment.
+        splits = {}
+        for cell in (source, target):
+            if self._cell_node[cell] < 0:
+                vertices.append(cell)
+                edges.append([])
+                splits.setdefault(int(self._cell_segment[cell]), []).append(len(vertices) - 1)
+
+        blocked_cells = set()
+        blocked_nodes = set()
+        blocked_segments = set()
+        for cell in overlay:
+            cell = divmod(cell, self._height)
+            blocked_cells.add(cell)
+            if self._cell_node[cell] >= 0:
+                blocked_nodes.add(int(self._cell_node[cell]))
+            elif self._cell_segment[cell] >= 0:
+                blocked_segments.add(int(self._cell_segment[cell]))
+
+        for from_index, node_adjacent in enumerate(self._adjacent):
+            for to_index, segment_index, length in node_adjacent:
+                if (segment_index not in splits and to_index not in blocked_nodes
+                        and segment_index not in blocked_segments):
+                    edges[from_index].append((to_index, length))
+
+        for segment_index, virtual_indices in splits.items():
+            from_index, to_index = self._segments[segment_index]
+            from_node = self._nodes[from_index]
+            chain = [from_index] + sorted(
+                virtual_indices, key=lambda index: _length(vertices[index], from_node)) \
+                + [to_index]
+            for index, next_index in zip(chain[:-1], chain[1:]):
+                cells = _get_cells(vertices[index], vertices[next_index])
+                length = len(cells) - 1
+                # The walls on a part of a segment block both ways, except
+                # on its ends, that only block the way into them.
+                if blocked_cells.isdisjoint(cells[1:-1]):
+                    if cells[-1] not in blocked_cells:
+                        edges[index].append((next_index, length))
+                    if cells[0] not in blocked_cells:
+                        edges[next_index].append((index, length))
+
+        return vertices, edges
+
+    def _expand(self, vertices):
+        """ The cells of a route given by its vertices """
+        route = [vertices[0]]
+        for from_node, to_node in zip(vertices[:-1], vertices[1:]):
+            route.extend(_get_cells(from_node, to_node)[1:])
+        return route
@@ -12,66 +12,139 @@ def angle_between(v1, v2):
     return np.arccos(np.dot(v1, v2) / np.linalg.norm(v1) / np.linalg.norm(v2))
 
 
+ADJACENT_OFFSETS = [[0, 1], [0, -1], [1, 0], [1, 1],
+                    [1, -1], [-1, 0], [-1, 1], [-1, -1]]
+
+_OFFSETS = np.array(ADJACENT_OFFSETS, dtype=np.float64)
+_OFFSET_NORMS = np.linalg.norm(_OFFSETS, axis=1)
+_OFFSET_BITS = [1 << i for i in range(len(ADJACENT_OFFSETS))]
+
+
+def _adjacent_angles(heading):
+    """ angle_between the heading and every adjacent offset, at once """
+    heading = np.array([heading[0], heading[1]])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.arccos(_OFFSETS.dot(heading) / np.linalg.norm(heading) / _OFFSET_NORMS)
+
+
+def _offsets_mask(selected):
+    mask = 0
+    for offset_bit, is_selected in zip(_OFFSET_BITS, selected):
+        if is_selected:
+            mask |= offset_bit
+    return mask
+
+
+def is_offset_walled(bucket, offset):
+    """ If a heading bucket walls off one of the adjacent offsets """
+    return bool(bucket & _OFFSET_BITS[ADJACENT_OFFSETS.index(list(offset))])
+
+
 class Grid(object):
 
-    def __init__(self, graph):
+    def __init__(self, graph, structure=None):
 
         self._graph = graph
-        self._structure = self._make_structure()
-        self._walls = self._make_walls()
+        if structure is None:
+            structure = self._make_structure()
+        # Ones are walls, zeros are the roads.
+        self._structure = structure
+        self._wall_map = self._make_walls()
+        # The walls as a set of tuples, built from the bitmap when requested.
+        self._walls = None
+
+        self._nearest_free = self._make_nearest_free()
+        self._adjacent_free = self._make_adjacent_free()
 
     def search_on_grid(self, x, y):
-        visit = [[0, 1], [0, -1], [1, 0], [1, 1],
-                 [1, -1], [-1, 0], [-1, 1], [-1, -1]]
-        c_x, c_y = x, y
-        scale = 1
-        while self._structure[c_x, c_y] != 0:
-            for offset in visit:
-                c_x, c_y = x + offset[0] * scale, y + offset[1] * scale
-
-                if c_x >= 0 and c_x < self._graph.get_resolution()[
-                    0] and c_y >= 0 and c_y < self._graph.get_resolution()[1]:
-                    if self._structure[c_x, c_y] == 0:
-                        break
-                else:
-                    c_x, c_y = x, y
-            scale += 1
-
-        return c_x, c_y
+        """
+        The free cell (road) the cell x, y is projected to, a lookup on the
+        table built once by _make_nearest_free.
+        """
+        c_x, c_y = self._nearest_free[x, y]
+        return int(c_x), int(c_y)
+
+    def search_on_grid_array(self, cells):
+        """
+        Batched search_on_grid for a (N, 2) integer array of cells.
+        """
+        cells = np.asarray(cells).reshape(-1, 2)
+        return self._nearest_free[cells[:, 0], cells[:, 1]]
+
+    def get_structure(self):
+        return self._structure
+
     def get_walls(self):
+        if self._walls is None:
+            self._walls = set(zip(*[axis.tolist() for axis in np.nonzero(self._wall_map)]))
         return self._walls
 
-    def get_wall_source(self, pos, pos_ori, target):
+    def get_wall_map(self):
+        """ The walls as a boolean bitmap of the grid resolution """
+        return self._wall_map
 
-        free_nodes = self._get_adjacent_free_nodes(pos)
-        # print self._walls
-        final_walls = copy.copy(self._walls)
-        # print final_walls
-        heading_start = np.array([pos_ori[0], pos_ori[1]])
-        for adj in free_nodes:
+    def get_cell_id(self, node):
+        """ The flat id of a node on the grid, x * height + y """
+        return node[0] * self._structure.shape[1] + node[1]
 
-            start_to_goal = np.array([adj[0] - pos[0], adj[1] - pos[1]])
-            angle = angle_between(heading_start, start_to_goal)
-            if (angle > 1.6 and adj != target):
-                final_walls.add((adj[0], adj[1]))
+    def get_cell_nodes(self, cell_ids):
+        """ The x, y tuples of a sequence of flat cell ids """
+        height = self._structure.shape[1]
+        return [divmod(cell_id, height) for cell_id in cell_ids]
 
-        return final_walls
+    def get_wall_source(self, pos, pos_ori, target):
 
-    def get_wall_target(self, pos, pos_ori, source):
+        final_walls = copy.copy(self.get_walls())
+        final_walls.update(self.get_cell_nodes(
+            self.get_wall_source_overlay(pos, pos_ori, target)))
 
-        free_nodes = self._get_adjacent_free_nodes(pos)
-        final_walls = copy.copy(self._walls)
-        heading_start = np.array([pos_ori[0], pos_ori[1]])
-        for adj in free_nodes:
+        return final_walls
 
-            start_to_goal = np.array([adj[0] - pos[0], adj[1] - pos[1]])
-            angle = angle_between(heading_start, start_to_goal)
+    def get_wall_target(self, pos, pos_ori, source):
 
-            if (angle < 1.0 and adj != source):
-                final_walls.add((adj[0], adj[1]))
+        final_walls = copy.copy(self.get_walls())
+        final_walls.update(self.get_cell_nodes(
+            self.get_wall_target_overlay(pos, pos_ori, source)))
 
         return final_walls
 
+    def get_wall_source_overlay(self, pos, pos_ori, target):
+        """
+        The flat cell ids of the walls added around the source to avoid
+        starting against its heading, without the static walls.
+        """
+        return self._get_overlay(pos, self.get_source_heading_bucket(pos_ori), target)
+
+    def get_wall_target_overlay(self, pos, pos_ori, source):
+        """
+        The flat cell ids of the walls added around the target to avoid
+        arriving against its heading, without the static walls.
+        """
+        return self._get_overlay(pos, self.get_target_heading_bucket(pos_ori), source)
+
+    def get_source_heading_bucket(self, pos_ori):
+        """
+        Quantize a source heading into the bitmask of the adjacent offsets
+        it walls off. Headings on the same bucket produce the same walls.
+        """
+        angles = _adjacent_angles(pos_ori)
+        return _offsets_mask(angles > 1.6)
+
+    def get_target_heading_bucket(self, pos_ori):
+        """
+        Quantize a target heading into the bitmask of the adjacent offsets
+        it walls off. Headings on the same bucket produce the same walls.
+        """
+        angles = _adjacent_angles(pos_ori)
+        return _offsets_mask(angles < 1.0)
+
+    def _get_overlay(self, pos, bucket, exclude):
+
+        exclude = self.get_cell_id(exclude)
+        return [adj for adj, offset_bit in zip(
+                    self._adjacent_free[self.get_cell_id(pos)].tolist(), _OFFSET_BITS)
+                if bucket & offset_bit and adj >= 0 and adj != exclude]
+
     def _draw_line(self, grid, xi, yi, xf, yf):
 
         if xf < xi:
@@ -84,10 +157,8 @@ class Grid(object):
             yi = yf
             yf = aux
 
-        for i in range(xi, xf + 1):
-
-            for j in range(yi, yf + 1):
-                grid[i, j] = 0.0
+        # Edges are axis aligned, the line is the rectangle between its ends.
+        grid[xi:xf + 1, yi:yf + 1] = 0.0
 
         return grid
 
@@ -100,36 +171,88 @@ class Grid(object):
 
             # draw a line
             for con in connections:
-                # print key[0],key[1],con[0],con[1]
                 structure = self._draw_line(
                     structure, key[0], key[1], con[0], con[1])
-                # print grid
         return structure
 
     def _make_walls(self):
-        walls = set()
 
-        for i in range(self._structure.shape[0]):
+        return self._structure != 0
+
+    def _make_nearest_free(self):
+        """
+        For every cell, the free cell it is projected to. Cells are searched
+        along the eight adjacent directions at growing distances, the first
+        free cell found in the order of ADJACENT_OFFSETS is taken. The cells
+        whose eight directions hit no free cell at all are projected to their
+        closest free cell.
+        """
+        width, height = self._structure.shape
+        free = self._structure == 0
+        xs, ys = np.indices((width, height))
+
+        nearest = np.stack([xs, ys], axis=2)
+        pending = ~free
+        for scale in range(1, max(width, height)):
+            if not pending.any():
+                break
+            for offset in ADJACENT_OFFSETS:
+                c_xs = xs + offset[0] * scale
+                c_ys = ys + offset[1] * scale
+                found = (pending & (c_xs >= 0) & (c_xs < width)
+                         & (c_ys >= 0) & (c_ys < height))
+                found[found] = free[c_xs[found], c_ys[found]]
+                nearest[found, 0] = c_xs[found]
+                nearest[found, 1] = c_ys[found]
+                pending &= ~found
+
+        if pending.any() and free.any():
+            free_cells = np.argwhere(free)
+            for cell in np.argwhere(pending):
+                squared_distances = ((free_cells - cell) ** 2).sum(axis=1)
+                nearest[cell[0], cell[1]] = free_cells[np.argmin(squared_distances)]
+
+        return nearest
+
+    def _make_adjacent_free(self):
+        """
+        The flat ids of the free cells adjacent to every cell, in the order
+        of ADJACENT_OFFSETS, -1 for the walls and the cells outside of the
+        grid. A (width * height, 8) array indexed by flat cell id.
+        """
+        width, height = self._structure.shape
+        xs, ys = np.indices((width, height))
+        adjacent_free = np.full((width, height, len(ADJACENT_OFFSETS)), -1, dtype=np.int32)
+        for index, offset in enumerate(ADJACENT_OFFSETS):
+            a_xs = xs + offset[0]
+            a_ys = ys + offset[1]
+            inside = (a_xs >= 0) & (a_xs < width) & (a_ys >= 0) & (a_ys < height)
+            inside[inside] = self._structure[a_xs[inside], a_ys[inside]] == 0.0
+            adjacent_free[inside, index] = a_xs[inside] * height + a_ys[inside]
+
+        return adjacent_free.reshape(width * height, len(ADJACENT_OFFSETS))
+
+    def _get_adjacent_nodes(self, pos):
+        """ The adjacent nodes, None for the ones outside of the grid """
+
+        adjacent = []
+        for offset in ADJACENT_OFFSETS:
+            node = (pos[0] + offset[0], pos[1] + offset[1])
 
-            for j in range(self._structure.shape[1]):
-                if self._structure[i, j] == 1.0:
-                    walls.add((i, j))
+            if (node[0] >= 0 and node[0] < self._graph.get_resolution()[0]
+                    and node[1] >= 0 and node[1] < self._graph.get_resolution()[1]):
+                adjacent.append(node)
+            else:
+                adjacent.append(None)
 
-        return walls
+        return adjacent
 
     def _get_adjacent_free_nodes(self, pos):
         """ Eight nodes in total """
-        visit = [[0, 1], [0, -1], [1, 0], [1, 1],
-                 [1, -1], [-1, 0], [-1, 1], [-1, -1]]
 
         adjacent = set()
-        for offset in visit:
-            node = (pos[0] + offset[0], pos[1] + offset[1])
-
-            if (node[0] >= 0 and node[0] < self._graph.get_resolution()[0]
-                    and node[1] >= 0 and node[1] < self._graph.get_resolution()[1]):
-
-                if self._structure[node[0], node[1]] == 0.0:
-                    adjacent.add(node)
+        for node in self._get_adjacent_nodes(pos):
+            if node is not None and self._structure[node[0], node[1]] == 0.0:
+                adjacent.add(node)
 
         return adjacent
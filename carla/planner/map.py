@@ -19,10 +19,10 @@ try:
 except ImportError:
     raise RuntimeError('cannot import PIL, make sure pillow package is installed')
 
-from carla.planner.graph import Graph
-from carla.planner.graph import sldist
+from carla.planner.graph import NearestNodeIndex
 from carla.planner.grid import Grid
 from carla.planner.converter import Converter
+from carla.planner import map_bundle
 
 
 def color_to_angle(color):
@@ -35,33 +35,53 @@ class CarlaMap(object):
         dir_path = os.path.dirname(__file__)
         city_file = os.path.join(dir_path, city + '.txt')
 
-        city_map_file = os.path.join(dir_path, city + '.png')
-        city_map_file_lanes = os.path.join(dir_path, city + 'Lanes.png')
-        city_map_file_center = os.path.join(dir_path, city + 'Central.png')
+        # Everything is read from the compiled bundle of the city, built from
+        # the city files the first time.
+        bundle = map_bundle.load_map_bundle(city)
 
         # The built graph. This is the exact same graph that unreal builds. This
         # is a generic structure used for many cases
-        self._graph = Graph(city_file, node_density)
+        self._graph = map_bundle.bundle_graph(bundle, node_density)
 
         self._pixel_density = pixel_density
-        self._grid = Grid(self._graph)
+        self._grid = Grid(self._graph, bundle['structure'])
+
+        self._intersection_nodes = set(self._graph.intersection_nodes())
+        self._intersection_index = NearestNodeIndex(self._intersection_nodes,
+                                                    self._graph.get_resolution())
         # The number of game units per pixel. For now this is fixed.
 
-        self._converter = Converter(city_file, pixel_density, node_density)
+        self._converter = Converter(city_file, pixel_density, node_density,
+                                    map_bundle.bundle_converter_constants(bundle))
+
+        # The images are uint8 views of the memory-mapped bundle, their pages
+        # are only read when used and shared by every process on the city.
+        self._bundle = bundle
+
+        # The planner only needs the lane orientations, the blue channel of the
+        # lanes image, stored contiguous on the bundle. The orientation of every
+        # channel value is precomputed.
+        self._lanes_orientation = bundle['lanes_orientation']
+        self._orientations = []
+        for color in range(256):
+            ori = color_to_angle(color)
+            self._orientations.append((-math.cos(ori), -math.sin(ori)))
+
+    @property
+    def map_image(self):
+        return self._bundle['map_image']
 
-        # Load the lanes image
-        self.map_image_lanes = Image.open(city_map_file_lanes)
-        self.map_image_lanes.load()
-        self.map_image_lanes = np.asarray(self.map_image_lanes, dtype="int32")
-        # Load the image
-        self.map_image = Image.open(city_map_file)
-        self.map_image.load()
-        self.map_image = np.asarray(self.map_image, dtype="int32")
+    @property
+    def map_image_lanes(self):
+        return self._bundle['map_image_lanes']
 
-        # Load the lanes image
-        self.map_image_center = Image.open(city_map_file_center)
-        self.map_image_center.load()
-        self.map_image_center = np.asarray(self.map_image_center, dtype="int32")
+    @property
+    def map_image_center(self):
+        return self._bundle['map_image_center']
+
+    def get_graph(self):
+
+        return self._graph
 
     def get_graph_resolution(self):
 
@@ -69,31 +89,28 @@ class CarlaMap(object):
 
     def get_map(self, height=None):
         if height is not None:
-            img = Image.fromarray(self.map_image.astype(np.uint8))
+            img = Image.fromarray(self.map_image)
 
             aspect_ratio = height / float(self.map_image.shape[0])
 
             img = img.resize((int(aspect_ratio * self.map_image.shape[1]), height), Image.ANTIALIAS)
             img.load()
             return np.asarray(img, dtype="int32")
-        return np.fliplr(self.map_image)
+        return np.fliplr(self.map_image).astype(np.int32)
 
     def get_map_lanes(self, size=None):
         if size is not None:
-            img = Image.fromarray(self.map_image_lanes.astype(np.uint8))
+            img = Image.fromarray(self.map_image_lanes)
             img = img.resize((size[1], size[0]), Image.ANTIALIAS)
             img.load()
             return np.fliplr(np.asarray(img, dtype="int32"))
-        return np.fliplr(self.map_image_lanes)
+        return np.fliplr(self.map_image_lanes).astype(np.int32)
 
     def get_lane_orientation(self, world):
         """Get the lane orientation of a certain world position."""
         pixel = self.convert_to_pixel(world)
 
-        ori = self.map_image_lanes[int(pixel[1]), int(pixel[0]), 2]
-        ori = color_to_angle(ori)
-
-        return (-math.cos(ori), -math.sin(ori))
+        return self._orientations[self._lanes_orientation[int(pixel[1]), int(pixel[0])]]
 
     def convert_to_node(self, input_data):
         """
@@ -119,6 +136,24 @@ class CarlaMap(object):
         """
         return self._converter.convert_to_world(input_data)
 
+    def convert_to_node_array(self, input_data, input_type):
+        """
+        Batched convert_to_node, the input type is PIXEL or WORLD.
+        """
+        return self._converter.convert_to_node_array(input_data, input_type)
+
+    def convert_to_pixel_array(self, input_data, input_type):
+        """
+        Batched convert_to_pixel, the input type is NODE or WORLD.
+        """
+        return self._converter.convert_to_pixel_array(input_data, input_type)
+
+    def convert_to_world_array(self, input_data, input_type):
+        """
+        Batched convert_to_world, the input type is PIXEL or NODE.
+        """
+        return self._converter.convert_to_world_array(input_data, input_type)
+
     def get_walls_directed(self, node_source, source_ori, node_target, target_ori):
         """
         This is the most hacky function. Instead of planning on two ways,
@@ -127,26 +162,55 @@ class CarlaMap(object):
 
         """
 
-        final_walls = self._grid.get_wall_source(node_source, source_ori, node_target)
+        return self._grid.get_walls().union(self._grid.get_cell_nodes(
+            self.get_walls_directed_overlay(node_source, source_ori, node_target, target_ori)))
+
+    def get_walls_directed_overlay(self, node_source, source_ori, node_target, target_ori):
+        """
+        The artificial walls of get_walls_directed alone, to be laid over
+        the static walls, as a list of flat cell ids. It may repeat cells.
+        """
+
+        return (self._grid.get_wall_source_overlay(node_source, source_ori, node_target)
+                + self._grid.get_wall_target_overlay(node_target, target_ori, node_source))
 
-        final_walls = final_walls.union(self._grid.get_wall_target(
-            node_target, target_ori, node_source))
-        return final_walls
+    def get_heading_buckets(self, source_ori, target_ori):
+        """
+        Quantized source and target orientations, two pairs of orientations
+        with the same buckets produce the same directed walls.
+        """
+        return (self._grid.get_source_heading_bucket(source_ori),
+                self._grid.get_target_heading_bucket(target_ori))
 
     def get_walls(self):
 
         return self._grid.get_walls()
 
+    def get_wall_map(self):
+
+        return self._grid.get_wall_map()
+
     def get_distance_closest_node(self, pos):
 
-        distance = []
-        for node_iter in self._graph.intersection_nodes():
-            distance.append(sldist(node_iter, pos))
+        return self._intersection_index.distance(pos)
 
-        return sorted(distance)[0]
+    def get_distance_closest_nodes(self, positions):
+        """
+        Batched get_distance_closest_node, for a (N, 2) array of positions.
+        """
+        return self._intersection_index.distances(positions)
 
     def get_intersection_nodes(self):
         return self._graph.intersection_nodes()
 
+    def is_intersection(self, node):
+        return node in self._intersection_nodes
+
     def search_on_grid(self,node):
         return self._grid.search_on_grid(node[0], node[1])
+
+    def search_on_grid_array(self, nodes):
+        """
+        Batched search_on_grid, for a (N, 2) integer array of nodes.
+        """
+        return self._grid.search_on_grid_array(nodes)
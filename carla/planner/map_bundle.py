@@ -0,0 +1,236 @@
+# Copyright (c) 2017 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Compiled city map bundles.
+
+A bundle is a single .npy file holding one record with everything the
+planner builds from the city assets: the graph edges, the grid wall bitmap,
+the intersections, the converter constants, the map images and the lane
+orientation channel. It is generated once from the assets, validated against
+their sizes and modification times and loaded memory-mapped, so the
+processes using the same city share its pages.
+
+The bundles are written next to the assets when that directory is writable,
+to the user cache directory otherwise.
+"""
+
+import hashlib
+import logging
+import os
+
+try:
+    import numpy as np
+except ImportError:
+    raise RuntimeError('cannot import numpy, make sure numpy package is installed')
+
+try:
+    from PIL import Image
+except ImportError:
+    raise RuntimeError('cannot import PIL, make sure pillow package is installed')
+
+from carla.planner.graph import Graph
+from carla.planner.grid import Grid
+from carla.planner.converter import read_converter_constants
+
+
+# Increase it when the content of the bundles changes.
+BUNDLE_VERSION = 3
+
+_DIR_PATH = os.path.dirname(__file__)
+
+
+def _source_files(city):
+    return [os.path.join(_DIR_PATH, city + suffix)
+            for suffix in ('.txt', '.png', 'Lanes.png', 'Central.png')]
+
+
+def get_cache_dir():
+    """ The user cache directory the bundles are written to """
+    cache_home = os.environ.get('XDG_CACHE_HOME') or \
+        os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'carla', 'planner')
+
+
+def _bundle_files(city):
+    """ The places of the bundle of a city, in lookup order """
+    name = city + 'Bundle.npy'
+    return [os.path.join(_DIR_PATH, name), os.path.join(get_cache_dir(), name)]
+
+
+def get_bundle_file(city):
+    """
+    The file the bundle of a city is written to, next to the assets if
+    their directory is writable, on the user cache directory otherwise.
+    """
+    bundle_file, cache_file = _bundle_files(city)
+    if os.access(_DIR_PATH, os.W_OK):
+        return bundle_file
+    return cache_file
+
+
+def source_hash(city):
+    """ Hash of the content of the city assets """
+    sha1 = hashlib.sha1()
+    for source_file in _source_files(city):
+        with open(source_file, 'rb') as f:
+            sha1.update(f.read())
+    return sha1.hexdigest().encode('ascii')
+
+
+def source_stamp(city):
+    """
+    Hash of the bundle version and the sizes and modification times of the
+    city assets, cheap enough to check on every load.
+    """
+    sha1 = hashlib.sha1(str(BUNDLE_VERSION).encode('ascii'))
+    for source_file in _source_files(city):
+        stat = os.stat(source_file)
+        sha1.update(('%s %d %r\n' % (os.path.basename(source_file), stat.st_size,
+                                      stat.st_mtime)).encode('ascii'))
+    return sha1.hexdigest().encode('ascii')
+
+
+def get_source_hash(city):
+    """
+    The content hash of the city assets, read from the bundle instead of
+    hashing the assets again.
+    """
+    return load_map_bundle(city)['source_hash'].item()
+
+
+def _load_image(image_file):
+    image = Image.open(image_file)
+    image.load()
+    return np.asarray(image, dtype=np.uint8)
+
+
+def build_map_bundle(city):
+    """
+    Build the bundle record of a city from its assets.
+    """
+    city_file, city_map_file, city_map_file_lanes, city_map_file_center = \
+        _source_files(city)
+
+    graph = Graph(city_file)
+    grid = Grid(graph)
+    world_offset, world_angles, map_offset = read_converter_constants(city_file)
+
+    # The edges, in the order of the city file.
+    edges = np.array([from_node + to_node for from_node, to_node in graph.get_distances()],
+                     dtype=np.int32).reshape(-1, 4)
+    distances = np.array(list(graph.get_distances().values()), dtype=np.float64)
+    intersections = np.array(sorted(graph.intersection_nodes()), dtype=np.int32).reshape(-1, 2)
+    structure = (grid.get_structure() != 0).astype(np.uint8)
+
+    map_image = _load_image(city_map_file)
+    map_image_lanes = _load_image(city_map_file_lanes)
+    map_image_center = _load_image(city_map_file_center)
+
+    # Fields sorted by alignment, the images at the end.
+    dtype = np.dtype([
+        ('world_offset', np.float64, (3,)),
+        ('world_angles', np.float64, (3,)),
+        ('map_offset', np.float64, (3,)),
+        ('distances', np.float64, distances.shape),
+        ('resolution', np.int32, (2,)),
+        ('edges', np.int32, edges.shape),
+        ('intersections', np.int32, intersections.shape),
+        ('source_hash', 'S40'),
+        ('source_stamp', 'S40'),
+        ('structure', np.uint8, structure.shape),
+        ('lanes_orientation', np.uint8, map_image_lanes.shape[:2]),
+        ('map_image', np.uint8, map_image.shape),
+        ('map_image_lanes', np.uint8, map_image_lanes.shape),
+        ('map_image_center', np.uint8, map_image_center.shape)])
+
+    bundle = np.zeros((), dtype=dtype)
+    bundle['world_offset'] = world_offset
+    bundle['world_angles'] = world_angles
+    bundle['map_offset'] = map_offset
+    bundle['distances'] = distances
+    bundle['resolution'] = graph.get_resolution()
+    bundle['edges'] = edges
+    bundle['intersections'] = intersections
+    bundle['source_hash'] = source_hash(city)
+    bundle['source_stamp'] = source_stamp(city)
+    bundle['structure'] = structure
+    # The blue channel of the lanes image encodes the lane orientation.
+    bundle['lanes_orientation'] = map_image_lanes[:, :, 2]
+    bundle['map_image'] = map_image
+    bundle['map_image_lanes'] = map_image_lanes
+    bundle['map_image_center'] = map_image_center
+    return bundle
+
+
+def save_map_bundle(city, bundle, bundle_file=None):
+    """
+    Write the bundle, see get_bundle_file, replacing it atomically. Returns
+    the file written.
+    """
+    if bundle_file is None:
+        bundle_file = get_bundle_file(city)
+    bundle_dir = os.path.dirname(bundle_file)
+    if not os.path.isdir(bundle_dir):
+        os.makedirs(bundle_dir)
+    temporary_file = '%s.%d.tmp.npy' % (bundle_file[:-len('.npy')], os.getpid())
+    np.save(temporary_file, bundle)
+    os.rename(temporary_file, bundle_file)
+    return bundle_file
+
+
+def load_map_bundle(city):
+    """
+    Returns the memory-mapped bundle of a city. The bundle is built and
+    saved first if it is missing or out of date with the assets, it is only
+    kept in memory if it can not be written.
+    """
+    stamp = source_stamp(city)
+    for bundle_file in _bundle_files(city):
+        if not os.path.exists(bundle_file):
+            continue
+        try:
+            bundle = np.load(bundle_file, mmap_mode='r')
+            # The bundles of other versions have other fields.
+            if 'source_stamp' in bundle.dtype.names and bundle['source_stamp'] == stamp:
+                return bundle
+            logging.info('map bundle %s is out of date, rebuilding it', bundle_file)
+        except (ValueError, IOError, KeyError) as error:
+            logging.warning('cannot read map bundle %s: %s', bundle_file, error)
+
+    bundle = build_map_bundle(city)
+    try:
+        bundle_file = save_map_bundle(city, bundle)
+    except (IOError, OSError) as error:
+        logging.warning('cannot write map bundle of %s: %s', city, error)
+        return bundle
+
+    return np.load(bundle_file, mmap_mode='r')
+
+
+def bundle_graph(bundle, node_density):
+    """ Rebuild the city Graph from a bundle """
+    graph = Graph(None, node_density)
+    graph.set_resolution(tuple(bundle['resolution'].tolist()))
+    graph.add_edges(bundle['edges'], bundle['distances'])
+
+    return graph
+
+
+def bundle_converter_constants(bundle):
+    """ The converter constants stored on a bundle """
+    return (tuple(bundle['world_offset'].tolist()),
+            tuple(bundle['world_angles'].tolist()),
+            tuple(bundle['map_offset'].tolist()))
+
+
+if __name__ == '__main__':
+
+    import sys
+
+    logging.basicConfig(format='%(levelname)s: %(message)s', level=logging.INFO)
+    for city_name in sys.argv[1:] or ['Town01', 'Town02']:
+        logging.info('wrote %s', save_map_bundle(city_name, build_map_bundle(city_name)))
@@ -0,0 +1,184 @@
+# Copyright (c) 2017 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Planner for many agents at once, for instance every non-player vehicle of a
+CARLA episode.
+"""
+
+import logging
+
+import numpy as np
+
+from carla.planner.planner import Planner, UnroutableError, REACH_GOAL, LANE_FOLLOW
+
+
+class MultiAgentPlanner(object):
+    """
+    Computes the next command of many agents per call. The route state of
+    every agent, its last route node and its position on its active route,
+    is kept on arrays indexed by agent slot, while the city map, the route
+    search grid and the route cache are shared by all of them. The routes
+    of the agents never become the current route of the shared planner, so
+    it still plans for its own agent.
+
+    Every agent gets the command the Planner would give it, except when the
+    Planner would raise for it, for instance when no route is found: the
+    agent then gets LANE_FOLLOW.
+    """
+
+    def __init__(self, city_name=None, planner=None, route_cache_size=1024,
+                 follow_route=False):
+        """
+        Args
+            city_name: the city of the agents.
+            planner: a planner to share its city map and route cache with,
+                instead of creating a new one for city_name.
+        """
+
+        if planner is None:
+            if city_name is None:
+                raise ValueError('either a city name or a planner is required')
+            planner = Planner(city_name, route_cache_size, follow_route)
+        self._planner = planner
+        self._city_track = planner.get_city_track()
+        self._follow_route = planner.is_following_route()
+
+        # Agent slots, by agent id.
+        self._slots = {}
+        self._free_slots = []
+        self._previous_nodes = np.full((0, 2), -1, dtype=np.int32)
+        self._plan_indices = np.zeros(0, dtype=np.int32)
+        self._plans = []
+
+    def __len__(self):
+        return len(self._slots)
+
+    def get_planner(self):
+        return self._planner
+
+    def get_route_cache(self):
+        return self._planner.get_route_cache()
+
+    def remove_agent(self, agent_id):
+        """ Forget the route state of an agent, its slot is reused """
+        slot = self._slots.pop(agent_id, None)
+        if slot is None:
+            return
+        self._reset_slot(slot)
+        self._free_slots.append(slot)
+
+    def clear(self):
+        for agent_id in list(self._slots):
+            self.remove_agent(agent_id)
+
+    def get_next_commands(self, agent_ids, sources, source_oris, targets, target_oris):
+        """
+        Computes the plans and returns the next command of each agent.
+        Args
+            agent_ids: sequence with the N ids of the agents.
+            sources: (N, 3) array of source positions.
+            source_oris: (N, 3) array of source orientations.
+            targets: (N, 3) array of target positions.
+            target_oris: (N, 3) array of target orientations.
+        Returns
+            an array with the N commands, as the Planner encodes them.
+        """
+
+        slots = np.array([self._get_slot(agent_id) for agent_id in agent_ids],
+                         dtype=np.int64)
+        source_oris = np.asarray(source_oris, dtype=np.float64).reshape(-1, 3)
+        target_oris = np.asarray(target_oris, dtype=np.float64).reshape(-1, 3)
+
+        track_sources = self._city_track.project_node_array(sources)
+        track_targets = self._city_track.project_node_array(targets)
+        intersection_distances = \
+            self._city_track.get_closest_intersection_distances(track_sources)
+
+        at_goal = (track_sources == track_targets).all(axis=1)
+        at_new_node = (track_sources != self._previous_nodes[slots]).any(axis=1)
+
+        # Only the agents reaching a new node away from an intersection
+        # update their route.
+        for agent in np.flatnonzero(~at_goal & at_new_node & (intersection_distances > 1)):
+            self._update_plan(slots[agent],
+                              tuple(track_sources[agent].tolist()),
+                              source_oris[agent],
+                              tuple(track_targets[agent].tolist()),
+                              target_oris[agent])
+
+        commands = np.full(len(slots), LANE_FOLLOW)
+        for agent in np.flatnonzero(~at_goal & (intersection_distances <= 4)):
+            plan = self._plans[slots[agent]]
+            if plan is not None:
+                command = plan.get_command(self._plan_indices[slots[agent]])
+                if command is not None:
+                    commands[agent] = command
+        commands[at_goal] = REACH_GOAL
+
+        return commands
+
+    def get_distances_to_next_intersection(self, agent_ids):
+        """
+        The route distance, in world units, from the last position of each
+        agent on its active route to its next intersection. NaN for the
+        agents without an active route.
+        """
+        distances = np.full(len(agent_ids), np.nan)
+        for agent, agent_id in enumerate(agent_ids):
+            slot = self._slots.get(agent_id)
+            if slot is not None and self._plans[slot] is not None:
+                distances[agent] = self._plans[slot].get_intersection_distance(
+                    self._plan_indices[slot])
+
+        return distances * self._city_track.get_pixel_density() \
+            * self._city_track.get_node_density()
+
+    def _get_slot(self, agent_id):
+        slot = self._slots.get(agent_id)
+        if slot is not None:
+            return slot
+
+        if not self._free_slots:
+            # Grow the arrays geometrically.
+            size = len(self._plans)
+            new_size = max(2 * size, 16)
+            self._previous_nodes = np.concatenate(
+                (self._previous_nodes, np.full((new_size - size, 2), -1, dtype=np.int32)))
+            self._plan_indices = np.concatenate(
+                (self._plan_indices, np.zeros(new_size - size, dtype=np.int32)))
+            self._plans.extend([None] * (new_size - size))
+            self._free_slots.extend(range(new_size - 1, size - 1, -1))
+
+        slot = self._free_slots.pop()
+        self._slots[agent_id] = slot
+        return slot
+
+    def _reset_slot(self, slot):
+        self._previous_nodes[slot] = -1
+        self._plan_indices[slot] = 0
+        self._plans[slot] = None
+
+    def _update_plan(self, slot, track_source, source_ori, track_target, target_ori):
+
+        self._previous_nodes[slot] = track_source
+        key = self._city_track.get_route_key(track_source, source_ori,
+                                             track_target, target_ori)
+
+        plan = self._plans[slot]
+        if self._follow_route and plan is not None:
+            index = plan.follow(self._city_track, track_source, key, self._plan_indices[slot])
+            if index is not None:
+                self._plan_indices[slot] = index
+                return
+
+        try:
+            self._plans[slot] = self._planner.find_route_plan(
+                track_source, source_ori, track_target, target_ori, key)
+        except UnroutableError as error:
+            logging.debug('no route from %s to %s: %s', track_source, track_target, error)
+            self._plans[slot] = None
+        self._plan_indices[slot] = 0
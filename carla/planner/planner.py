@@ -39,13 +39,162 @@ def signal(v1, v2):
     return np.cross(v1, v2) / np.linalg.norm(v1) / np.linalg.norm(v2)
 
 
+class UnroutableError(RuntimeError):
+    """
+    Raised when the planner finds no route between two nodes, or finds one
+    but can not encode its commands, route is then the route found.
+    """
+
+    def __init__(self, message, route=None):
+        super(UnroutableError, self).__init__(message)
+        self.route = route
+
+
+class RouteCache(object):
+    """
+    A bounded LRU cache of the routes computed by the planner, counting the
+    hits and misses.
+    """
+
+    def __init__(self, max_size=1024):
+
+        self._max_size = max_size
+        self._entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """ Returns the cached value for a key, None on a miss """
+        if key not in self._entries:
+            self.misses += 1
+            return None
+
+        # Move the entry to the most recently used end.
+        value = self._entries.pop(key)
+        self._entries[key] = value
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._entries.pop(key, None)
+        self._entries[key] = value
+        if len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+class RoutePlan(object):
+    """
+    A route with its commands, indexed to follow it node by node. For every
+    route position it keeps the command of the next intersection ahead and
+    the route distance, in nodes, to that intersection.
+    """
+
+    def __init__(self, route, commands, is_intersection, target_key=None):
+
+        self.route = route
+        self.commands = commands
+        self.target_key = target_key
+        self._positions = {node: index for index, node in enumerate(route)}
+
+        # Filled backwards, from the end of the route.
+        self._next_command = [len(commands)] * len(route)
+        self._intersection_distance = [0.0] * len(route)
+        command_index = len(commands)
+        distance = 0.0
+        for index in range(len(route) - 1, -1, -1):
+            if index < len(route) - 1:
+                distance += sldist(route[index], route[index + 1])
+            if is_intersection(route[index]):
+                command_index -= 1
+                distance = 0.0
+            self._next_command[index] = command_index
+            self._intersection_distance[index] = distance
+
+    def __len__(self):
+        return len(self.route)
+
+    def get_position(self, node):
+        """ The index of a node on the route, None if it is not on it """
+        return self._positions.get(node)
+
+    def get_command(self, index):
+        """ The command of the next intersection, None after the last one """
+        command_index = self._next_command[index]
+        if command_index < len(self.commands):
+            return self.commands[command_index]
+        return None
+
+    def follow(self, city_track, node, key, index):
+        """
+        The new position of an agent at index on the route that moved to
+        node, if it still follows the route: it is ahead on it, heading
+        along it, and the route still leads to the target of key, see
+        CityTrack.get_route_key. None otherwise.
+        """
+        if self.target_key != key[2:]:
+            return None
+
+        node_index = self._positions.get(node)
+        if node_index is None or node_index < index or node_index == len(self.route) - 1:
+            return None
+
+        # The agent must be heading along the route, with its way back
+        # walled off as the route search would do.
+        route = self.route
+        if (city_track.is_step_walled(key[1], route[node_index], route[node_index + 1])
+                or not city_track.is_step_walled(key[1], route[node_index + 1],
+                                                 route[node_index])):
+            return None
+
+        return node_index
+
+    def get_intersection_distance(self, index):
+        """
+        The route distance, in nodes, to the next intersection, or to the
+        end of the route after the last one.
+        """
+        return self._intersection_distance[index]
+
+
 class Planner(object):
 
-    def __init__(self, city_name):
+    def __init__(self, city_name, route_cache_size=1024, follow_route=False,
+                 route_engine='grid'):
+
+        # route_engine is 'grid', the A* search over the road cells, or
+        # 'graph', Dijkstra on the road graph.
+        self._city_track = city_track.CityTrack(city_name, route_engine)
+
+        # Keep the active route while the agent follows it, instead of
+        # computing a route again on every new node. Off by default: a route
+        # followed from a detour forced by the start heading is kept, while
+        # computing again may find a shorter way with other commands.
+        self._follow_route = follow_route
 
-        self._city_track = city_track.CityTrack(city_name)
+        # The active route and the position of the agent on it.
+        self._plan = None
+        self._plan_index = 0
 
-        self._commands = []
+        # Route plans, keyed by the projected nodes and the quantized
+        # orientations.
+        self._route_cache = RouteCache(route_cache_size)
+
+    def get_route_cache(self):
+        return self._route_cache
+
+    def get_city_track(self):
+        return self._city_track
+
+    def is_following_route(self):
+        return self._follow_route
 
     def get_next_command(self, source, source_ori, target, target_ori):
         """
@@ -70,32 +219,118 @@ class Planner(object):
         if (self._city_track.is_at_new_node(track_source)
                 and self._city_track.is_away_from_intersection(track_source)):
 
-            route = self._city_track.compute_route(track_source, source_ori,
-                                                   track_target, target_ori)
-            if route is None:
-                raise RuntimeError('Impossible to find route')
+            key = self._city_track.get_route_key(track_source, source_ori,
+                                                 track_target, target_ori)
+            # Move along the active route while the agent follows it, the
+            # route is only computed again when the agent leaves it or the
+            # target changes.
+            if not self._advance_plan(track_source, key):
+                self._plan = self.get_route_plan(track_source, source_ori,
+                                                 track_target, target_ori, key)
+                self._plan_index = 0
+
+        if self._city_track.is_far_away_from_route_intersection(
+                track_source):
+            return LANE_FOLLOW
+
+        # If there is computed commands
+        if self._plan is not None:
+            command = self._plan.get_command(self._plan_index)
+            if command is not None:
+                return command
+        return LANE_FOLLOW
+
+    def get_distance_to_next_intersection(self):
+        """
+        The route distance, in world units, from the last position of the
+        agent on the active route to its next intersection. None if there is
+        no active route.
+        """
+        if self._plan is None:
+            return None
 
-            self._commands = self._route_to_commands(route)
+        return self._plan.get_intersection_distance(self._plan_index) \
+            * self._city_track.get_pixel_density() * self._city_track.get_node_density()
 
-            if self._city_track.is_far_away_from_route_intersection(
-                    track_source):
-                return LANE_FOLLOW
-            else:
-                if self._commands:
-                    return self._commands[0]
-                else:
-                    return LANE_FOLLOW
-        else:
-
-            if self._city_track.is_far_away_from_route_intersection(
-                    track_source):
-                return LANE_FOLLOW
-
-            # If there is computed commands
-            if self._commands:
-                return self._commands[0]
-            else:
-                return LANE_FOLLOW
+    def _advance_plan(self, track_source, key):
+        """
+        Move the position on the active route to the agent node, if the
+        agent still follows it.
+        """
+        if not self._follow_route or self._plan is None:
+            return False
+
+        index = self._plan.follow(self._city_track, track_source, key, self._plan_index)
+        if index is None:
+            return False
+
+        self._plan_index = index
+        self._city_track.set_route(track_source, self._plan.route)
+        return True
+
+    def get_route_plan(self, track_source, source_ori, track_target, target_ori, key=None):
+        """
+        Computes the route between two projected nodes and its commands, and
+        makes it the current route of the city track. The routes already
+        computed are served from the route cache.
+        """
+
+        if key is None:
+            key = self._city_track.get_route_key(track_source, source_ori,
+                                                 track_target, target_ori)
+        plan = self._route_cache.get(key)
+        if plan is not None:
+            self._city_track.set_route(track_source, plan.route)
+            return plan
+
+        route = self._city_track.compute_route(track_source, source_ori,
+                                               track_target, target_ori)
+        return self._make_route_plan(route, key)
+
+    def find_route_plan(self, track_source, source_ori, track_target, target_ori, key=None):
+        """
+        The plan get_route_plan returns, leaving the current route of the
+        city track alone, for the routes of other agents.
+        """
+
+        if key is None:
+            key = self._city_track.get_route_key(track_source, source_ori,
+                                                 track_target, target_ori)
+        plan = self._route_cache.get(key)
+        if plan is not None:
+            return plan
+
+        route = self._city_track.find_route(track_source, source_ori,
+                                            track_target, target_ori)
+        return self._make_route_plan(route, key)
+
+    def _make_route_plan(self, route, key):
+
+        if route is None:
+            raise UnroutableError('Impossible to find route')
+
+        plan = RoutePlan(route, self._route_to_commands(route),
+                         self._city_track.is_intersection, key[2:])
+        self._route_cache.put(key, plan)
+        return plan
+
+    def prime(self, source, source_ori, target, target_ori):
+        """
+        Make the route between two positions the current route of the city
+        track, as get_shortest_path_distance does, before an episode starts
+        at source: the first command of the episode then does not depend on
+        the routes computed before. The route comes from the route cache
+        when it is there.
+        """
+
+        track_source = self._city_track.project_node(source)
+        track_target = self._city_track.project_node(target)
+
+        try:
+            self.get_route_plan(track_source, source_ori, track_target, target_ori)
+        except UnroutableError:
+            # The city track is left as compute_route left it.
+            pass
 
     def get_shortest_path_distance(
             self,
@@ -104,18 +339,37 @@ class Planner(object):
             target,
             target_ori):
 
-        distance = 0
         track_source = self._city_track.project_node(source)
         track_target = self._city_track.project_node(target)
 
-        current_pos = track_source
-
         route = self._city_track.compute_route(track_source, source_ori,
                                                track_target, target_ori)
         # No Route, distance is zero
         if route is None:
             return 0.0
 
+        return self.get_route_distance(route)
+
+    def get_route(self, source, source_ori, target, target_ori):
+        """
+        Computes the full route between two positions.
+        Returns
+            the route as a list of nodes, None if there is no route.
+        """
+
+        track_source = self._city_track.project_node(source)
+        track_target = self._city_track.project_node(target)
+
+        return self._city_track.compute_route(track_source, source_ori,
+                                              track_target, target_ori)
+
+    def get_route_distance(self, route):
+        """
+        The length of a route in world units.
+        """
+
+        distance = 0
+        current_pos = route[0]
         for node_iter in route:
             distance += sldist(node_iter, current_pos)
             current_pos = node_iter
@@ -147,10 +401,15 @@ class Planner(object):
         :return: list of commands encoded from 0-5
         """
 
+        # There is no command to take at an intersection ending the route.
+        if route and self._city_track.is_intersection(route[-1]):
+            raise UnroutableError('Impossible to encode the commands of a route'
+                                  + ' ending at an intersection', route)
+
         commands_list = []
 
         for i in range(0, len(route)):
-            if route[i] not in self._city_track.get_intersection_nodes():
+            if not self._city_track.is_intersection(route[i]):
                 continue
 
             current = route[i]
@@ -11,6 +11,9 @@ import socket
 import struct
 import time
 
+from . import instrumentation
+
+
 class TCPConnectionError(Exception):
     pass
 
@@ -47,6 +50,10 @@ class TCPClient(object):
                 time.sleep(1)
         self._reraise_exception_as_tcp_error('failed to connect', error)
 
+    def get_timeout(self):
+        """The timeout of the socket operations, in seconds."""
+        return self._timeout
+
     def disconnect(self):
         """Disconnect any active connection."""
         if self._socket is not None:
@@ -64,17 +71,21 @@ class TCPClient(object):
             raise TCPConnectionError(self._logprefix + 'not connected')
         header = struct.pack('<L', len(message))
         try:
-            self._socket.sendall(header + message)
+            with instrumentation.span('tcp.write'):
+                self._socket.sendall(header + message)
         except socket.error as exception:
             self._reraise_exception_as_tcp_error('failed to write data', exception)
+        instrumentation.count('tcp.write.bytes', len(message) + 4)
 
     def read(self):
         """Read a message from the server."""
-        header = self._read_n(4)
-        if not header:
-            raise TCPConnectionError(self._logprefix + 'connection closed')
-        length = struct.unpack('<L', header)[0]
-        data = self._read_n(length)
+        with instrumentation.span('tcp.read'):
+            header = self._read_n(4)
+            if not header:
+                raise TCPConnectionError(self._logprefix + 'connection closed')
+            length = struct.unpack('<L', header)[0]
+            data = self._read_n(length)
+        instrumentation.count('tcp.read.bytes', length + 4)
         return data
 
     def _read_n(self, length):
@@ -10,6 +10,8 @@ import logging
 import random
 import time
 
+from carla import instrumentation
+from carla import measurements_parser
 from carla.client import make_carla_client
 from carla.sensor import Camera
 from carla.settings import CarlaSettings
@@ -21,19 +23,15 @@ import os
 import random
 import sys
 
-if 'SUMO_HOME' in os.environ:
-    tools = os.path.join(os.environ['SUMO_HOME'], 'tools')
-    sys.path.append(tools)
-else:
-    sys.exit("please declare environment variable 'SUMO_HOME'")
-import traci
+from tools.carla_session import CarlaSession, make_session_settings, parse_server
+from tools.sumo_backend import BACKENDS, get_sumo_backend
 from tools.utils import start_sumo, running
 
 # Interface dependencies
 import json
 import math
+import numpy as np
 from collections import namedtuple
-import tools.CarlaGame as CG
 import subprocess
 import signal
 
@@ -47,6 +45,12 @@ vehicle_tot = 5
 spawned_tot = 0
 id_list = []
 
+# The SUMO backend, the traci module unless another one is chosen.
+traci = None
+
+# The MoveFilter skipping the moves of the vehicles that did not move, if any.
+move_filter = None
+
 
 def read_parameters(map_name):
     x_multiplier = 1
@@ -79,67 +83,272 @@ def read_parameters(map_name):
     return Parameters(x_multiplier, x_correction, y_multiplier, y_correction, angle_correction)
 
 
-def start_simulation(map_name, connect_to_instance, sumo_port):
+def start_simulation(map_name, connect_to_instance, sumo_port, step_length=None,
+                     namespaces=('',)):
     if connect_to_instance:
         traci.init(port=sumo_port)
     else:
-        start_sumo('./maps/' + map_name + '/' + map_name + '.sumo.cfg', False)
+        start_sumo('./maps/' + map_name + '/' + map_name + '.sumo.cfg', False, backend=traci,
+                   step_length=step_length)
     print('SUMO started')
 
     user_vehicle_length = 4.67999982834
     user_vehicle_width = 1.879999995
-    add_vehicle("p0", user_vehicle_length, user_vehicle_width, 0, 0, 25)
-    traci.gui.trackVehicle("View #0", "p0")
+    for namespace in namespaces:    # One player per CARLA server
+        add_vehicle(namespace + "p0", user_vehicle_length, user_vehicle_width, 0, 0, 25)
+    traci.gui.trackVehicle("View #0", namespaces[0] + "p0")
     traci.gui.setZoom("View #0", 1000)
 
 
-def run(game, params):
+class SumoClock(object):
+    """
+    Maps the game time of the CARLA frames to SUMO times, for the lockstep
+    mode. The first frame is mapped to the current SUMO time and every
+    other one to the SUMO step closest to its game time, so the two clocks
+    never drift apart whatever the length of the frames.
+    """
+
+    def __init__(self, step_length=None):
+        # The step length of the running SUMO if not given.
+        self._step_length = step_length
+        self._carla_start = None
+        self._sumo_start = None
+        self._sumo_time = None
+
+    def get_step_length(self):
+        return self._step_length
+
+    def get_sumo_time(self, game_timestamp):
+        """The SUMO time of a frame, game_timestamp in milliseconds."""
+        if self._carla_start is None:
+            if self._step_length is None:
+                self._step_length = traci.simulation.getDeltaT()
+            self._carla_start = game_timestamp
+            self._sumo_start = traci.simulation.getTime()
+            self._sumo_time = self._sumo_start
+        elapsed = (game_timestamp - self._carla_start) / 1000.0
+        return self._sumo_start + round(elapsed / self._step_length) * self._step_length
+
+    def step(self, game_timestamp):
+        """
+        Run SUMO up to the time of a frame, in as many SUMO steps as fit in
+        the frame, with a single TraCI command. Nothing is run when the
+        frame is shorter than a SUMO step.
+        """
+        sumo_time = self.get_sumo_time(game_timestamp)
+        if sumo_time <= self._sumo_time:
+            return
+        self._sumo_time = sumo_time
+        with instrumentation.span('traci.simulationStep'):
+            traci.simulationStep(sumo_time)
+
+
+class MoveFilter(object):
+    """
+    Remembers the last pose sent to SUMO for every vehicle and tells which
+    moves can be skipped: the ones moving a vehicle by less than the
+    distance and the angle tolerances. A vehicle is moved anyway every
+    refresh_interval frames so the small moves skipped never add up to a
+    drift.
+
+    A vehicle whose moves start being skipped is pinned with a speed of 0,
+    so SUMO does not drive it away meanwhile, and given back to the
+    car-following model with a speed of -1 once it moves again: one speed
+    command per stop and per start instead of one move per frame.
+    """
+
+    def __init__(self, distance_tolerance, angle_tolerance=0.5, refresh_interval=10):
+        self._distance_tolerance = distance_tolerance
+        self._angle_tolerance = angle_tolerance
+        self._refresh_interval = refresh_interval
+        self._poses = {}
+        self._pinned = set()
+        # The vehicles checked since the last next_frame.
+        self._frame_vids = set()
+        self._frame = 0
+        self._skipped_moves = 0
+        self._sent_moves = 0
+
+    def get_skipped_moves(self):
+        return self._skipped_moves
+
+    def get_sent_moves(self):
+        return self._sent_moves
+
+    def next_frame(self):
+        """
+        Start a new frame, forgetting the vehicles the last frame did not
+        have, so the ones gone from CARLA are not kept for ever.
+        """
+        for vid in set(self._poses) - self._frame_vids:
+            del self._poses[vid]
+        self._pinned &= self._frame_vids
+        self._frame_vids = set()
+        self._frame += 1
+
+    def is_pinned(self, vid):
+        return vid in self._pinned
+
+    def check_move(self, vid, position):
+        """
+        Whether to send a move of vehicle vid to position, recorded if so,
+        and the speed to set first: 0 to pin the vehicle, -1 to unpin it,
+        None to leave it as it is.
+        """
+        self._frame_vids.add(vid)
+        speed = None
+        pose = self._poses.get(vid)
+        if pose is not None:
+            x, y, yaw, frame = pose
+            angle = abs((position.rotation_yaw - yaw + 180.0) % 360.0 - 180.0)
+            still = (angle <= self._angle_tolerance and
+                     math.hypot(position.location_x - x, position.location_y - y) <=
+                     self._distance_tolerance)
+            if still and self._frame - frame < self._refresh_interval:
+                self._skipped_moves += 1
+                instrumentation.count('interface.moves_skipped')
+                if vid not in self._pinned:
+                    self._pinned.add(vid)
+                    speed = 0.0
+                return False, speed
+            # A refresh of a vehicle still standing keeps it pinned.
+            if not still and vid in self._pinned:
+                self._pinned.discard(vid)
+                speed = -1.0
+        self._poses[vid] = (
+            position.location_x, position.location_y, position.rotation_yaw, self._frame)
+        self._sent_moves += 1
+        return True, speed
+
+
+def get_namespace(server_index):
+    """
+    The prefix of the SUMO vehicle ids of the agents of a CARLA server, none
+    for the first one.
+    """
+    return 's%d.' % server_index if server_index else ''
+
+
+def run(game, params, sumo_clock=None, sessions=()):
     step = 0
     demo_mode = True
     while running(demo_mode, step, 100):
         step += 1
 
-        # Read the data produced by the server this frame.
-        measurements = game.execution_step()
+        with instrumentation.span('interface.step'):
+            # Read the data produced by the server this frame.
+            measurements = game.execution_step()
+
+            # And the newest data of the other servers, if any.
+            frames = [('', measurements)]
+            frames.extend((session.get_namespace(), session.read_measurements())
+                          for session in sessions)
 
-        # Print some of the measurements.
-        print_measurements(measurements)
+            # Print some of the measurements.
+            print_measurements(measurements)
 
-        # Get the vehicles' position
-        my_m = measurements.player_measurements.transform
-        my_x = measurements.player_measurements.bounding_box.extent.x
-        pos = Position(
-            my_m.location.x,
-            my_m.location.y,
-            my_m.rotation.yaw)
-        pos = getAdjustedPosition(pos, params, my_x)    # Correct the position
-        moveVehicle("p0", pos)
+            with instrumentation.span('interface.sync'):
+                sync_frames(frames, params, sumo_clock)
 
-        for agent in measurements.non_player_agents:    # Do the same for the other agents
-            a_id = str(agent.id)  # unique id of the agent
+            # In lockstep, CARLA waits for this control to run the next frame.
+            if sumo_clock is not None:
+                game.send_control()
+                for session in sessions:
+                    session.send_control()
 
-            if agent.HasField('vehicle'):
-                non_p_m = agent.vehicle.transform
-                non_p_x = agent.vehicle.bounding_box.extent.x
-                pos = Position(
-                    non_p_m.location.x,
-                    non_p_m.location.y,
-                    non_p_m.rotation.yaw)
-                pos = getAdjustedPosition(pos, params, non_p_x)
 
-                # Check if the vehicle is spawned in SUMO
-                if (not checkVehicleSpawned(a_id)):
-                    global spawned_tot
-                    global id_list
-                    id_list.append(a_id)
-                    spawned_tot += 1
+def sync_measurements(measurements, params, sumo_clock=None):
+    """
+    Move the SUMO vehicles to the positions of the CARLA agents and step
+    SUMO, one step or up to the time of the frame given a SumoClock.
+    """
+    sync_frames([('', measurements)], params, sumo_clock)
 
-                    non_p_y = agent.vehicle.bounding_box.extent.y
-                    add_vehicle(a_id, non_p_x*2, non_p_y*2, 0, 0, 25)    # Spawn the vehicle in SUMO
 
-                moveVehicle(a_id, pos)
+def sync_frames(frames, params, sumo_clock=None):
+    """
+    Move the SUMO vehicles of the frames of several CARLA servers, given as
+    (namespace, measurements) pairs, then step SUMO once for all of them, up
+    to the time of the first frame given a SumoClock.
+    """
+    if move_filter is not None:
+        move_filter.next_frame()
 
-        traci.simulationStep()
+    for namespace, measurements in frames:
+        move_vehicles(measurements, params, namespace)
+
+    if sumo_clock is not None:
+        sumo_clock.step(frames[0][1].game_timestamp)
+    else:
+        with instrumentation.span('traci.simulationStep'):
+            traci.simulationStep()
+
+
+def move_vehicles(measurements, params, namespace=''):
+    """
+    Move the SUMO vehicles of the player and the agents of a frame, spawning
+    the missing ones. Their SUMO ids are their CARLA ids after namespace.
+    """
+    # Get the vehicles' position
+    my_m = measurements.player_measurements.transform
+    my_x = measurements.player_measurements.bounding_box.extent.x
+    pos = Position(
+        my_m.location.x,
+        my_m.location.y,
+        my_m.rotation.yaw)
+    pos = getAdjustedPosition(pos, params, my_x)    # Correct the position
+    moveVehicle(namespace + "p0", pos)
+
+    # The agents decoded into an array are moved all at once.
+    if isinstance(measurements, measurements_parser.MeasurementsWithAgents):
+        move_agent_array(measurements.agents, params, namespace)
+        return
+
+    for agent in measurements.non_player_agents:    # Do the same for the other agents
+        a_id = namespace + str(agent.id)  # unique id of the agent
+
+        if agent.HasField('vehicle'):
+            non_p_m = agent.vehicle.transform
+            non_p_x = agent.vehicle.bounding_box.extent.x
+            pos = Position(
+                non_p_m.location.x,
+                non_p_m.location.y,
+                non_p_m.rotation.yaw)
+            pos = getAdjustedPosition(pos, params, non_p_x)
+
+            non_p_y = agent.vehicle.bounding_box.extent.y
+            spawnVehicle(a_id, non_p_x*2, non_p_y*2)
+            moveVehicle(a_id, pos)
+
+
+def move_agent_array(agents, params, namespace=''):
+    """
+    The moves of move_vehicles for the agents of an array of
+    measurements_parser.AGENT_DTYPE, with vectorized position corrections.
+    """
+    vehicles = agents[agents['kind'] == measurements_parser.KIND_VEHICLE]
+    extents = vehicles['extent'].astype(np.float64)
+    xs, ys, yaws = getAdjustedPositions(
+        vehicles['location'][:, 0], vehicles['location'][:, 1], vehicles['rotation'][:, 1],
+        params, extents[:, 0])
+
+    for agent_id, extent, x, y, yaw in zip(
+            vehicles['id'].tolist(), extents.tolist(), xs.tolist(), ys.tolist(), yaws.tolist()):
+        a_id = namespace + str(agent_id)  # unique id of the agent
+        spawnVehicle(a_id, extent[0]*2, extent[1]*2)
+        moveVehicle(a_id, Position(x, y, yaw))
+
+
+def spawnVehicle(v_id, length, width):
+    """Spawn the SUMO vehicle of an agent, unless it already is."""
+    # Check if the vehicle is spawned in SUMO
+    if (not checkVehicleSpawned(v_id)):
+        global spawned_tot
+        global id_list
+        id_list.append(v_id)
+        spawned_tot += 1
+
+        add_vehicle(v_id, length, width, 0, 0, 25)    # Spawn the vehicle in SUMO
 
 
 def checkVehicleSpawned(v_id):
@@ -158,38 +367,59 @@ def checkVehicleSpawned(v_id):
 
 
 def add_vehicle(vid, length, width, position, lane, speed, vtype="vtypeauto"):
-    traci.vehicle.add(vid, "platoon_route", pos=position, speed=speed, lane=lane, typeID=vtype)
-    traci.vehicle.setColor(vid, (random.uniform(0, 255),
-                                 random.uniform(0, 255),
-                                 random.uniform(0, 255), 255))
-    traci.vehicle.setLength(vid, length)
-    traci.vehicle.setWidth(vid, width)
+    with instrumentation.span('traci.add_vehicle'):
+        traci.vehicle.add(vid, "platoon_route", pos=position, speed=speed, lane=lane, typeID=vtype)
+        traci.vehicle.setColor(vid, (random.uniform(0, 255),
+                                     random.uniform(0, 255),
+                                     random.uniform(0, 255), 255))
+        traci.vehicle.setLength(vid, length)
+        traci.vehicle.setWidth(vid, width)
 
 
 def getAdjustedPosition(position, params, car_dimen):
-    yaw = position.rotation_yaw + params.angle_correction
-    radians = yaw / 180 * math.pi
-    # in Carla the agent's position is the center of the car,
-    # while in Sumo it's the front bumper. The last element of the addition is to correct this difference.
-    pos_x = params.x_multiplier * position.location_x + params.x_correction + math.sin(radians)*car_dimen
-    pos_y = params.y_multiplier * position.location_y + params.y_correction + math.cos(radians)*car_dimen
-    return Position(pos_x, pos_y, yaw)
+    with instrumentation.span('interface.transform'):
+        yaw = position.rotation_yaw + params.angle_correction
+        radians = yaw / 180 * math.pi
+        # in Carla the agent's position is the center of the car,
+        # while in Sumo it's the front bumper. The last element of the addition is to correct this difference.
+        pos_x = params.x_multiplier * position.location_x + params.x_correction + math.sin(radians)*car_dimen
+        pos_y = params.y_multiplier * position.location_y + params.y_correction + math.cos(radians)*car_dimen
+        return Position(pos_x, pos_y, yaw)
+
+
+def getAdjustedPositions(locations_x, locations_y, yaws, params, car_dimens):
+    """getAdjustedPosition of arrays of positions, as arrays of x, y and yaw."""
+    with instrumentation.span('interface.transform'):
+        yaws = np.asarray(yaws, dtype=np.float64) + params.angle_correction
+        radians = yaws / 180 * math.pi
+        pos_x = params.x_multiplier * np.asarray(locations_x, dtype=np.float64) + \
+            params.x_correction + np.sin(radians)*car_dimens
+        pos_y = params.y_multiplier * np.asarray(locations_y, dtype=np.float64) + \
+            params.y_correction + np.cos(radians)*car_dimens
+        return pos_x, pos_y, yaws
 
 
 def moveVehicle(vID, position):
-    traci.vehicle.moveToXY(
-        vehID=vID,
-        edgeID="",
-        lane=0,
-        x=position.location_x,
-        y=position.location_y,
-        angle=position.rotation_yaw,
-        keepRoute=2)
+    if move_filter is not None:
+        move, speed = move_filter.check_move(vID, position)
+        if speed is not None:
+            with instrumentation.span('traci.setSpeed'):
+                traci.vehicle.setSpeed(vID, speed)
+        if not move:
+            return
+    with instrumentation.span('traci.moveToXY'):
+        traci.vehicle.moveToXY(
+            vehID=vID,
+            edgeID="",
+            lane=0,
+            x=position.location_x,
+            y=position.location_y,
+            angle=position.rotation_yaw,
+            keepRoute=2)
 
 
 def print_measurements(measurements):
-    non_player_measurements = measurements.non_player_agents
-    number_of_agents = len(non_player_measurements)
+    number_of_agents = measurements_parser.count_agents(measurements)
 
     player_measurements = measurements.player_measurements
     message = 'Vehicle at ({pos_x:.1f}, {pos_y:.1f}), '
@@ -262,29 +492,113 @@ def main():
         '--sumo-port',
         default="8813",
         help='If --sumo-running is set, this will be the port on which the script will try to connect. Default is 8813')
+    argparser.add_argument(
+        '--sumo-backend',
+        choices=BACKENDS,
+        default='traci',
+        help='The SUMO backend: traci drives SUMO, fake is an in-process stand-in that only counts the commands. Default is traci')
+    argparser.add_argument(
+        '--sumo-latency',
+        default=0.0,
+        type=float,
+        help='With the fake SUMO backend, seconds each TraCI command takes. Default is 0')
+    argparser.add_argument(
+        '--latest-frame',
+        action='store_true',
+        help='Read the CARLA frames on a background thread and only sync SUMO with the newest one, skipping the frames SUMO has no time for')
+    argparser.add_argument(
+        '--lockstep',
+        action='store_true',
+        help='Run CARLA in synchronous mode and SUMO in lockstep with it: every frame runs SUMO up to the game time of the frame, then lets CARLA run the next one')
+    argparser.add_argument(
+        '--sumo-step-length',
+        type=float,
+        help='Length of the SUMO steps in seconds, with --lockstep a frame runs as many as fit in it. Default is the one of the SUMO configuration')
+    argparser.add_argument(
+        '--carla-fps',
+        type=int,
+        help='Run CARLA with this fixed frame rate, so every frame lasts as many SUMO steps')
+    argparser.add_argument(
+        '--extra-servers',
+        metavar='HOST:PORT',
+        nargs='+',
+        default=[],
+        help='Other CARLA servers feeding the same SUMO, already running. Their players drive on autopilot and the SUMO ids of their vehicles are prefixed with s1., s2., ...')
+    argparser.add_argument(
+        '--agents-array',
+        action='store_true',
+        help='Decode the CARLA agents straight into an array instead of one protobuf message each, faster with many agents')
+    argparser.add_argument(
+        '--move-tolerance',
+        type=float,
+        help='Do not move in SUMO the vehicles that moved less than this many meters, and turned less than --angle-tolerance, since their last move, they are stopped in SUMO meanwhile. By default every vehicle is moved every frame')
+    argparser.add_argument(
+        '--angle-tolerance',
+        default=0.5,
+        type=float,
+        help='With --move-tolerance, degrees a vehicle must turn to be moved. Default is 0.5')
+    argparser.add_argument(
+        '--move-refresh',
+        default=10,
+        type=int,
+        help='With --move-tolerance, frames after which a vehicle is moved anyway. Default is 10')
+    argparser.add_argument(
+        '--profile-interval',
+        type=float,
+        help='Time the stages of the bridge and log their statistics every this many seconds')
+    argparser.add_argument(
+        '--profile-output',
+        help='Time the stages of the bridge and write their statistics to this file on exit, CSV if it ends with .csv, JSON otherwise')
     args = argparser.parse_args()
+    if args.lockstep and args.latest_frame:
+        argparser.error('--latest-frame is for the asynchronous mode, it cannot be used with --lockstep')
 
-    # Open CARLA
-    CARLA_PATH = os.environ['CARLA_PATH']
-    print("CARLA_PATH is", CARLA_PATH)
+    global traci
+    traci = get_sumo_backend(args.sumo_backend, latency=args.sumo_latency)
 
+    global move_filter
+    if args.move_tolerance is not None:
+        move_filter = MoveFilter(args.move_tolerance, args.angle_tolerance, args.move_refresh)
+
+    # Every server spawns as many vehicles in SUMO.
+    global vehicle_tot
+    server_vehicle_tot = vehicle_tot
+    vehicle_tot = server_vehicle_tot * (1 + len(args.extra_servers))
+
+    # Open CARLA
     if args.carla_shell != "Nocarla":
+        CARLA_PATH = os.environ['CARLA_PATH']
+        print("CARLA_PATH is", CARLA_PATH)
+
         if args.carla_shell == "Yes":
             cmd_line = ['gnome-terminal', '-x', CARLA_PATH + '/CarlaUE4.sh', '/Game/Maps/' + args.map_name,
                         '-windowed', '-ResX=800' '-ResY=600', '-carla-settings=tools/CarlaSettings.ini']
         else:
             cmd_line = [CARLA_PATH + '/CarlaUE4.sh', '/Game/Maps/' + args.map_name,
                         '-windowed', '-ResX=800' '-ResY=600', '-carla-settings=tools/CarlaSettings.ini']
+        if args.carla_fps:
+            cmd_line.extend(['-benchmark', '-fps=%d' % args.carla_fps])
 
         carla_process = subprocess.Popen(
             cmd_line, stdout=subprocess.PIPE, preexec_fn=os.setsid)
 
+    # The game needs pygame, it is only imported to play.
+    import tools.CarlaGame as CG
+
     log_level = logging.DEBUG if args.debug else logging.INFO
     logging.basicConfig(format='%(levelname)s: %(message)s', level=log_level)
     logging.info('listening to server %s:%s', args.host, args.port)
 
+    reporter = None
+    if args.profile_interval or args.profile_output:
+        instrumentation.enable()
+        if args.profile_interval:
+            reporter = instrumentation.LogReporter(args.profile_interval)
+            reporter.start()
+
     carla_connected = False
     traci_connected = False
+    sessions = []
     try:
         while not carla_connected:
             try:
@@ -293,10 +607,11 @@ def main():
                 # context manager, it creates a CARLA client object and starts the
                 # connection. It will throw an exception if something goes wrong. The
                 # context manager makes sure the connection is always cleaned up on exit.
-                with make_carla_client(args.host, args.port) as client:
+                with make_carla_client(args.host, args.port,
+                                       agents_array=args.agents_array) as client:
                     print('CarlaClient connected')
 
-                    game = CG.CarlaGame(client, args, vehicle_tot)
+                    game = CG.CarlaGame(client, args, server_vehicle_tot)
 
                     params = read_parameters(args.map_name)
 
@@ -304,12 +619,23 @@ def main():
 
                     carla_connected = True
 
+                    for index, server in enumerate(args.extra_servers):
+                        host, port = parse_server(server)
+                        session = CarlaSession(host, port, get_namespace(index + 1),
+                                               make_session_settings(args, server_vehicle_tot),
+                                               agents_array=args.agents_array)
+                        session.start()
+                        sessions.append(session)
+
                     start_simulation(
-                        args.map_name, args.sumo_running, int(args.sumo_port))
+                        args.map_name, args.sumo_running, int(args.sumo_port),
+                        args.sumo_step_length,
+                        [get_namespace(index) for index in range(1 + len(sessions))])
 
                     traci_connected = True
 
-                    run(game, params)
+                    sumo_clock = SumoClock(args.sumo_step_length) if args.lockstep else None
+                    run(game, params, sumo_clock, sessions)
 
                     print('Run ended')
 
@@ -319,19 +645,41 @@ def main():
     except KeyboardInterrupt:
         print('\nCancelled by user. Bye!')
     finally:
+        if reporter is not None:
+            reporter.stop()
+        if args.profile_output:
+            instrumentation.dump(args.profile_output)
+
         if carla_connected:
             print('Closing connections')
+            if args.latest_frame:
+                print('Skipped frames:', game.get_skipped_frames())
+            if move_filter is not None:
+                print('Skipped moves:', move_filter.get_skipped_moves())
             try:
                 game.finish()
             except Exception as error:
                 logging.error(error)
 
+            for session in sessions:
+                if not args.lockstep:
+                    print('Skipped frames of %s*:' % session.get_namespace(),
+                          session.get_skipped_frames())
+                try:
+                    session.stop()
+                except Exception as error:
+                    logging.error(error)
+
             if traci_connected:
                 try:
                     traci.close()
                 except Exception as error:
                     logging.error(error)
 
+            if args.sumo_backend == 'fake':
+                for command, count in sorted(traci.get_command_counts().items()):
+                    print('%s: %d' % (command, count))
+
             # Chiudi CARLA
             if args.carla_shell == "Default":
                 os.killpg(os.getpgid(carla_process.pid), signal.SIGINT)
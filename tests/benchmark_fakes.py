@@ -0,0 +1,93 @@
+"""Stand-ins for the CARLA client and the agent of the driving benchmark."""
+
+import collections
+
+from carla import carla_server_pb2 as carla_protocol
+from carla.client import VehicleControl
+from carla.driving_benchmark.experiment import Experiment
+from carla.driving_benchmark.experiment_suites.experiment_suite import ExperimentSuite
+from carla.planner.map import CarlaMap
+from carla.settings import CarlaSettings
+
+
+Vector3D = collections.namedtuple('Vector3D', 'x y z')
+Transform = collections.namedtuple('Transform', 'location orientation')
+Scene = collections.namedtuple('Scene', 'player_start_spots')
+
+
+def road_positions(city_name):
+    """ A start spot on every road node, heading along its first edge """
+    carla_map = CarlaMap(city_name, 0.1643, 50.0)
+    positions = []
+    for from_node, to_node in sorted(carla_map.get_graph().get_distances()):
+        location = carla_map.convert_to_world(from_node)
+        heading = carla_map.convert_to_world(to_node)
+        orientation = (heading[0] - location[0], heading[1] - location[1])
+        norm = (orientation[0] ** 2 + orientation[1] ** 2) ** 0.5 or 1.0
+        positions.append(Transform(Vector3D(location[0], location[1], 0.22),
+                                   Vector3D(orientation[0] / norm, orientation[1] / norm, 0.0)))
+    return positions
+
+
+class FakeClient(object):
+    """
+    Serves the start spots and, every frame, a measurement of the player
+    standing still at its start spot, frame_time_ms apart.
+    """
+
+    def __init__(self, positions, frame_time_ms=10 ** 6):
+        self._positions = positions
+        self._frame_time_ms = frame_time_ms
+        self._start = None
+        self._timestamp = 0
+
+    def load_settings(self, carla_settings):
+        return Scene(self._positions)
+
+    def start_episode(self, player_start_index):
+        self._start = self._positions[player_start_index]
+
+    def read_data(self):
+        measurements = carla_protocol.Measurements()
+        self._timestamp += self._frame_time_ms
+        measurements.game_timestamp = self._timestamp
+        transform = measurements.player_measurements.transform
+        transform.location.x, transform.location.y, transform.location.z = self._start.location
+        transform.orientation.x, transform.orientation.y, transform.orientation.z = \
+            self._start.orientation
+        return measurements, {}
+
+    def send_control(self, *args, **kwargs):
+        pass
+
+
+class RecordingAgent(object):
+    """ Stands still and records the directions it is given """
+
+    def __init__(self):
+        self.directions = []
+
+    def run_step(self, measurements, sensor_data, directions, target):
+        self.directions.append(directions)
+        return VehicleControl()
+
+
+class PoseSuite(ExperimentSuite):
+    """ A single experiment of the given poses """
+
+    def __init__(self, city_name, poses, **kwargs):
+        self._poses = poses
+        super(PoseSuite, self).__init__(city_name, **kwargs)
+
+    def build_experiments(self):
+        experiment = Experiment()
+        experiment.set(Conditions=CarlaSettings(), Poses=self._poses, Task=0)
+        return [experiment]
+
+    @property
+    def train_weathers(self):
+        return [1]
+
+    @property
+    def test_weathers(self):
+        return []
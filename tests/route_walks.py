@@ -0,0 +1,40 @@
+import random
+
+from carla.planner.map import CarlaMap
+from carla.planner.planner import Planner
+
+
+def route_walks(city_name, count, seed):
+    """
+    Walks of an agent along the routes between random road nodes, as lists
+    of (position, orientation) world poses on the route nodes and halfway
+    between them, with the world target of each walk. The targets are away
+    from the intersections, the routes ending at one have no commands.
+    """
+    carla_map = CarlaMap(city_name, 0.1643, 50.0)
+    planner = Planner(city_name)
+    city_track = planner.get_city_track()
+    nodes = sorted(set(node for edge in carla_map.get_graph().get_distances()
+                       for node in edge))
+    rng = random.Random(seed)
+    walks = []
+    while len(walks) < count:
+        source, target = rng.choice(nodes), rng.choice(nodes)
+        if carla_map.is_intersection(target):
+            continue
+        route = city_track.compute_route(carla_map.search_on_grid(source), (1, 0, 0),
+                                         carla_map.search_on_grid(target), (1, 0, 0))
+        if route is None or len(route) < 3:
+            continue
+
+        poses = []
+        for node, next_node in zip(route[:-1], route[1:]):
+            world = carla_map.convert_to_world(list(node))
+            next_world = carla_map.convert_to_world(list(next_node))
+            orientation = (next_world[0] - world[0], next_world[1] - world[1], 0.0)
+            for fraction in (0.0, 0.5):
+                poses.append(((world[0] + (next_world[0] - world[0]) * fraction,
+                               world[1] + (next_world[1] - world[1]) * fraction, 22.0),
+                              orientation))
+        walks.append((poses, tuple(carla_map.convert_to_world(list(route[-1])))))
+    return walks
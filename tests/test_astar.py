@@ -0,0 +1,177 @@
+import heapq
+import random
+import unittest
+
+import numpy as np
+
+from carla.planner.astar import AStar
+from carla.planner.city_track import CityTrack
+from carla.planner.map import CarlaMap
+
+
+class _Cell(object):
+    def __init__(self, x, y, reachable):
+        self.reachable = reachable
+        self.x = x
+        self.y = y
+        self.parent = None
+        self.g = 0
+        self.h = 0
+        self.f = 0
+
+    def __lt__(self, other):
+        return self.g < other.g
+
+
+class _ReferenceAStar(object):
+    """ The Cell based solver the grid solver replaced, unchanged """
+
+    def __init__(self):
+        self.opened = []
+        heapq.heapify(self.opened)
+        self.closed = set()
+        self.cells = []
+        self.grid_height = None
+        self.grid_width = None
+        self.start = None
+        self.end = None
+
+    def init_grid(self, width, height, walls, start, end):
+        self.grid_height = height
+        self.grid_width = width
+        for x in range(self.grid_width):
+            for y in range(self.grid_height):
+                if (x, y) in walls:
+                    reachable = False
+                else:
+                    reachable = True
+                self.cells.append(_Cell(x, y, reachable))
+        self.start = self.get_cell(*start)
+        self.end = self.get_cell(*end)
+
+    def get_heuristic(self, cell):
+        return 10 * (abs(cell.x - self.end.x) + abs(cell.y - self.end.y))
+
+    def get_cell(self, x, y):
+        return self.cells[x * self.grid_height + y]
+
+    def get_adjacent_cells(self, cell):
+        cells = []
+        if cell.x < self.grid_width - 1:
+            cells.append(self.get_cell(cell.x + 1, cell.y))
+        if cell.y > 0:
+            cells.append(self.get_cell(cell.x, cell.y - 1))
+        if cell.x > 0:
+            cells.append(self.get_cell(cell.x - 1, cell.y))
+        if cell.y < self.grid_height - 1:
+            cells.append(self.get_cell(cell.x, cell.y + 1))
+        return cells
+
+    def get_path(self):
+        cell = self.end
+        path = [(cell.x, cell.y)]
+        while cell.parent is not self.start:
+            cell = cell.parent
+            path.append((cell.x, cell.y))
+
+        path.append((self.start.x, self.start.y))
+        path.reverse()
+        return path
+
+    def update_cell(self, adj, cell):
+        adj.g = cell.g + 10
+        adj.h = self.get_heuristic(adj)
+        adj.parent = cell
+        adj.f = adj.h + adj.g
+
+    def solve(self):
+        heapq.heappush(self.opened, (self.start.f, self.start))
+        while len(self.opened):
+            _, cell = heapq.heappop(self.opened)
+            self.closed.add(cell)
+            if cell is self.end:
+                return self.get_path()
+            adj_cells = self.get_adjacent_cells(cell)
+            for adj_cell in adj_cells:
+                if adj_cell.reachable and adj_cell not in self.closed:
+                    if (adj_cell.f, adj_cell) in self.opened:
+                        if adj_cell.g > cell.g + 10:
+                            self.update_cell(adj_cell, cell)
+                    else:
+                        self.update_cell(adj_cell, cell)
+                        heapq.heappush(self.opened, (adj_cell.f, adj_cell))
+
+
+def _reference_solve(width, height, walls, start, end):
+    a_star = _ReferenceAStar()
+    a_star.init_grid(width, height, walls, start, end)
+    return a_star.solve()
+
+
+# The axis orientations the planner queries are made with.
+_ORIENTATIONS = [(1.0, 0.0, 0.0), (0.0, 1.0, 0.0), (-1.0, 0.0, 0.0), (0.0, -1.0, 0.0)]
+
+
+class TestAStar(unittest.TestCase):
+
+    def _check_city(self, city_name, pairs, seed):
+        city_track = CityTrack(city_name)
+        carla_map = CarlaMap(city_name, 0.1643, 50.0)
+        width, height = carla_map.get_graph_resolution()
+        nodes = sorted(set(node for edge in carla_map.get_graph().get_distances()
+                           for node in edge))
+        rng = random.Random(seed)
+        for _ in range(pairs):
+            source, target = rng.sample(nodes, 2)
+            source_ori, target_ori = rng.choice(_ORIENTATIONS), rng.choice(_ORIENTATIONS)
+
+            expected = _reference_solve(
+                width, height,
+                carla_map.get_walls_directed(source, source_ori, target, target_ori),
+                source, target)
+            # The corner case of the city track, without the directed walls.
+            if expected is None:
+                expected = _reference_solve(width, height, carla_map.get_walls(),
+                                            source, target)
+
+            route = city_track.find_route(source, source_ori, target, target_ori)
+            self.assertEqual(route, expected, (source, source_ori, target, target_ori))
+
+    def test_town01_routes(self):
+        self._check_city('Town01', 60, 1)
+
+    def test_town02_routes(self):
+        self._check_city('Town02', 60, 2)
+
+    def test_random_grids(self):
+        rng = random.Random(3)
+        a_star = AStar()
+        for _ in range(50):
+            width, height = rng.randint(2, 20), rng.randint(2, 20)
+            cells = [(x, y) for x in range(width) for y in range(height)]
+            start, end = rng.sample(cells, 2)
+            walls = set(cell for cell in cells
+                        if cell not in (start, end) and rng.random() < 0.3)
+
+            # The same solver for every grid, the search state is reset.
+            a_star.init_grid(width, height, walls, start, end)
+            self.assertEqual(a_star.solve(), _reference_solve(width, height, walls, start, end))
+
+            wall_map = np.zeros((width, height), dtype=bool)
+            for x, y in walls:
+                wall_map[x, y] = True
+            a_star.init_grid(width, height, wall_map, start, end)
+            self.assertEqual(a_star.solve(), _reference_solve(width, height, walls, start, end))
+
+    def test_source_is_target(self):
+        # The Cell based solver walked off the start cell and raised.
+        with self.assertRaises(AttributeError):
+            _reference_solve(5, 5, set(), (2, 3), (2, 3))
+
+        a_star = AStar()
+        a_star.init_grid(5, 5, set(), (2, 3), (2, 3))
+        self.assertEqual(a_star.solve(), [(2, 3)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from carla.driving_benchmark.driving_benchmark import DrivingBenchmark
+from carla.driving_benchmark.metrics import Metrics
+from carla.driving_benchmark.route_table import build_route_table
+from carla.driving_benchmark.shortest_path_cache import shortest_path_query
+from carla.planner.planner import Planner
+
+from tests.benchmark_fakes import FakeClient, PoseSuite, RecordingAgent, road_positions
+
+
+def _directions_query(start_point, end_point):
+    return ((start_point.location.x, start_point.location.y, 0.22),
+            (start_point.orientation.x, start_point.orientation.y, start_point.orientation.z),
+            (end_point.location.x, end_point.location.y, 0.22),
+            (end_point.orientation.x, end_point.orientation.y, end_point.orientation.z))
+
+
+class TestDrivingBenchmark(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+        self._cwd = os.getcwd()
+        # The benchmark writes its results in the working directory.
+        os.chdir(self._directory)
+        self.positions = road_positions('Town01')
+        # The start spot is next to an intersection: a planner without a
+        # route for it raises on the first command.
+        self.pose = [0, 11]
+
+    def tearDown(self):
+        os.chdir(self._cwd)
+        shutil.rmtree(self._directory)
+
+    def _expected_directions(self):
+        planner = Planner('Town01')
+        start_point, end_point = [self.positions[index] for index in self.pose]
+        planner.get_shortest_path_distance(*shortest_path_query(start_point, end_point))
+        return planner.get_next_command(*_directions_query(start_point, end_point))
+
+    def _run_episode(self, suite):
+        agent = RecordingAgent()
+        benchmark = DrivingBenchmark('Town01', 'warm_cache')
+        # Only the episodes are under test, not the metrics of their logs.
+        with mock.patch.object(Metrics, 'compute', return_value={}):
+            benchmark.benchmark_agent(suite, agent, FakeClient(self.positions))
+        return agent.directions
+
+    def test_fresh_planner_needs_a_route(self):
+        start_point, end_point = [self.positions[index] for index in self.pose]
+        with self.assertRaises(RuntimeError):
+            Planner('Town01').get_next_command(*_directions_query(start_point, end_point))
+
+    def test_episode_on_warm_shortest_path_cache(self):
+        cache_file = os.path.join(self._directory, 'cache.json')
+        suite = PoseSuite('Town01', [self.pose], shortest_path_cache_file=cache_file)
+        suite.precompute_shortest_paths(self.positions)
+        self.assertTrue(os.path.exists(cache_file))
+
+        suite = PoseSuite('Town01', [self.pose], shortest_path_cache_file=cache_file)
+        directions = self._run_episode(suite)
+        self.assertTrue(directions)
+        self.assertEqual(directions[0], self._expected_directions())
+
+    def test_episode_on_warm_route_table(self):
+        table_file = os.path.join(self._directory, 'table.npz')
+        build_route_table('Town01', self.positions).save(table_file)
+
+        cache_file = os.path.join(self._directory, 'cache.json')
+        suite = PoseSuite('Town01', [self.pose], shortest_path_cache_file=cache_file,
+                          route_table_file=table_file)
+        directions = self._run_episode(suite)
+        # The distances came from the table, none was computed for the cache.
+        self.assertFalse(os.path.exists(cache_file))
+        self.assertTrue(directions)
+        self.assertEqual(directions[0], self._expected_directions())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import collections
+import threading
+import unittest
+
+from carla.frame_reader import LatestFrameReader
+
+
+_Parser = collections.namedtuple('Parser', 'reuse_messages')
+
+
+class _BlockingClient(object):
+    """ Serves a frame every time release is called """
+
+    def __init__(self, timeout=0.05):
+        self._timeout = timeout
+        self._frames = threading.Semaphore(0)
+        self._frame = 0
+
+    def get_timeout(self):
+        return self._timeout
+
+    def get_measurements_parser(self):
+        return _Parser(False)
+
+    def release(self):
+        self._frames.release()
+
+    def read_data(self):
+        self._frames.acquire()
+        self._frame += 1
+        return self._frame, {}
+
+
+class TestLatestFrameReader(unittest.TestCase):
+
+    def test_reads_the_frames(self):
+        client = _BlockingClient()
+        reader = LatestFrameReader(client)
+        reader.start()
+        client.release()
+        self.assertEqual(reader.read_data(1.0), (1, {}))
+        reader.stop(wait=False)
+        client.release()
+        reader.stop()
+        self.assertFalse(reader.is_running())
+
+    def test_cannot_restart_before_the_thread_exits(self):
+        client = _BlockingClient()
+        reader = LatestFrameReader(client)
+        reader.start()
+
+        # The read does not return within the timeout, the thread is kept.
+        reader.stop()
+        thread = reader._thread
+        self.assertTrue(thread.is_alive())
+        with self.assertRaises(RuntimeError):
+            reader.start()
+
+        # Once the read returns, the thread exits and the reader restarts.
+        client.release()
+        thread.join(1.0)
+        self.assertFalse(thread.is_alive())
+        reader.stop()
+        self.assertIsNone(reader._thread)
+        reader.start()
+        client.release()
+        self.assertEqual(reader.read_data(1.0), (2, {}))
+        reader.stop(wait=False)
+        client.release()
+        reader.stop()
+
+    def test_cannot_start_twice(self):
+        client = _BlockingClient()
+        reader = LatestFrameReader(client)
+        reader.start()
+        with self.assertRaises(RuntimeError):
+            reader.start()
+        reader.stop(wait=False)
+        client.release()
+        reader.stop()
+        self.assertIsNone(reader._thread)
+
+
+if __name__ == '__main__':
+    unittest.main()
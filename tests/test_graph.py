@@ -0,0 +1,102 @@
+import math
+import unittest
+
+import numpy as np
+
+from carla.planner import map_bundle
+from carla.planner.graph import Graph, NearestNodeIndex
+
+
+def _closest_distance(nodes, position):
+    return min(math.hypot(position[0] - x, position[1] - y) for x, y in nodes)
+
+
+class TestNearestNodeIndex(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.resolution = (49, 41)
+        self.nodes = set(map(tuple, rng.randint(0, 41, size=(300, 2)).tolist()))
+        self.index = NearestNodeIndex(self.nodes, self.resolution)
+
+        # Positions on the cells, between them and out of the map.
+        positions = rng.uniform(-10.0, 60.0, size=(2000, 2))
+        positions[:500] = np.floor(positions[:500])
+        self.positions = positions
+
+    def test_distance(self):
+        for position in self.positions:
+            self.assertAlmostEqual(self.index.distance(position),
+                                   _closest_distance(self.nodes, position))
+
+    def test_distances(self):
+        expected = [_closest_distance(self.nodes, position) for position in self.positions]
+        np.testing.assert_allclose(self.index.distances(self.positions), expected)
+
+    def test_squares_keep_few_candidates(self):
+        _, rows = self.index._candidates
+        self.assertLess(rows.shape[1], len(self.nodes) // 10)
+
+    def test_empty_set(self):
+        index = NearestNodeIndex([], self.resolution)
+        self.assertEqual(index.distance((1.5, 2.0)), float('inf'))
+        self.assertTrue(np.isinf(index.distances(self.positions)).all())
+
+
+class TestGraph(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(1)
+        self.resolution = (30, 20)
+        nodes = np.stack([rng.randint(0, 30, 60), rng.randint(0, 20, 60)], axis=1)
+        pairs = rng.randint(0, 60, size=(150, 2))
+        self.edges = np.concatenate([nodes[pairs[:, 0]], nodes[pairs[:, 1]]], axis=1)
+        self.distances = rng.uniform(1.0, 10.0, 150)
+
+    def _one_by_one(self):
+        graph = Graph()
+        graph.set_resolution(self.resolution)
+        for edge, distance in zip(self.edges.tolist(), self.distances.tolist()):
+            graph.add_node((edge[0], edge[1]))
+            graph.add_node((edge[2], edge[3]))
+            graph.add_edge((edge[0], edge[1]), (edge[2], edge[3]), distance)
+        return graph
+
+    def test_edges_and_distances(self):
+        graph = self._one_by_one()
+        edges = {}
+        for edge in self.edges.tolist():
+            edges.setdefault((edge[0], edge[1]), []).append((edge[2], edge[3]))
+        self.assertEqual(graph.get_edges(), edges)
+
+        distances = dict((((edge[0], edge[1]), (edge[2], edge[3])), distance)
+                         for edge, distance in zip(self.edges.tolist(),
+                                                   self.distances.tolist()))
+        self.assertEqual(dict(graph.get_distances()), distances)
+        self.assertEqual(graph.turn_nodes(),
+                         set(map(tuple, self.edges.reshape(-1, 2).tolist())))
+
+    def test_bulk_add_is_adding_one_by_one(self):
+        graph = Graph()
+        graph.set_resolution(self.resolution)
+        graph.add_edges(self.edges, self.distances)
+        expected = self._one_by_one()
+
+        self.assertEqual(graph.get_edges(), expected.get_edges())
+        self.assertEqual(graph.get_distances(), expected.get_distances())
+        for array, expected_array in zip(graph.get_adjacency(), expected.get_adjacency()):
+            np.testing.assert_array_equal(array, expected_array)
+        self.assertEqual(graph.get_adjacency()[0].dtype, np.int32)
+
+    def test_bundle_graph_is_the_city_file_graph(self):
+        graph = map_bundle.bundle_graph(map_bundle.load_map_bundle('Town02'), 50)
+        city_graph = Graph(map_bundle._source_files('Town02')[0])
+
+        self.assertEqual(graph.get_resolution(), city_graph.get_resolution())
+        self.assertEqual(graph.get_distances(), city_graph.get_distances())
+        self.assertEqual(graph.turn_nodes(), city_graph.turn_nodes())
+        self.assertEqual(graph.intersection_nodes(), city_graph.intersection_nodes())
+
+
+if __name__ == '__main__':
+    unittest.main()
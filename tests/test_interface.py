@@ -0,0 +1,208 @@
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+import numpy as np
+
+import interface
+from carla import measurements_parser
+from tools.sumo_backend import get_sumo_backend
+
+from tests.test_measurements_parser import make_measurements
+
+
+class _FakeTraCITestCase(unittest.TestCase):
+    """ Runs the interface on a started FakeTraCI """
+
+    step_length = 1.0
+
+    def setUp(self):
+        self.traci = get_sumo_backend('fake', record=True, step_length=self.step_length)
+        self.traci.start(['sumo'])
+        self._traci, interface.traci = interface.traci, self.traci
+
+    def tearDown(self):
+        interface.traci = self._traci
+
+
+class TestSumoClock(_FakeTraCITestCase):
+
+    step_length = 0.01
+
+    def test_frames_run_the_steps_of_their_time(self):
+        clock = interface.SumoClock()
+        # The first frame, then 45 frames of 1/15 s, on the milliseconds of
+        # the game time.
+        clock.step(1000)
+        for frame in range(1, 46):
+            clock.step(1000 + int(round(frame * 1000 / 15.0)))
+
+        self.assertEqual(clock.get_step_length(), 0.01)
+        self.assertEqual(self.traci.get_simulation_steps(), 300)
+        self.assertEqual(self.traci.get_command_counts()['simulationStep'], 45)
+        self.assertAlmostEqual(self.traci.simulation.getTime(), 3.0)
+
+    def test_frame_shorter_than_a_step_runs_none(self):
+        clock = interface.SumoClock()
+        clock.step(1000)
+        clock.step(1004)
+        self.assertEqual(self.traci.get_simulation_steps(), 0)
+        self.assertNotIn('simulationStep', self.traci.get_command_counts())
+
+        # The time of the frames skipped is not lost.
+        clock.step(1008)
+        self.assertEqual(self.traci.get_simulation_steps(), 1)
+
+
+class TestMoveFilter(_FakeTraCITestCase):
+
+    def setUp(self):
+        super(TestMoveFilter, self).setUp()
+        self._move_filter = interface.move_filter
+        interface.move_filter = interface.MoveFilter(0.1, angle_tolerance=0.5,
+                                                     refresh_interval=3)
+        for vid in ('a', 'b'):
+            self.traci.vehicle.add(vid, 'platoon_route')
+
+    def tearDown(self):
+        interface.move_filter = self._move_filter
+        super(TestMoveFilter, self).tearDown()
+
+    def _frame(self, poses):
+        """ Move the vehicles of a frame, returns the commands it sent """
+        self.traci.reset_counters()
+        interface.move_filter.next_frame()
+        for vid, pose in sorted(poses.items()):
+            interface.moveVehicle(vid, interface.Position(*pose))
+        return self.traci.get_commands()
+
+    def test_skips_the_moves_of_still_vehicles(self):
+        self.assertEqual(self._frame({'a': (1.0, 2.0, 90.0)}), ['vehicle.moveToXY'])
+        # Within the tolerances the move is skipped, the vehicle is pinned.
+        self.assertEqual(self._frame({'a': (1.05, 2.0, 90.3)}), ['vehicle.setSpeed'])
+        self.assertEqual(self.traci.vehicle.getSpeed('a'), 0.0)
+        self.assertEqual(self._frame({'a': (1.0, 2.05, 89.8)}), [])
+        self.assertTrue(interface.move_filter.is_pinned('a'))
+        self.assertEqual(self.traci.vehicle.getPosition('a'), (1.0, 2.0))
+        self.assertEqual(interface.move_filter.get_skipped_moves(), 2)
+
+    def test_refreshes_still_vehicles(self):
+        commands = [self._frame({'a': (1.0, 2.0, 90.0)}) for _ in range(7)]
+        # Moved every refresh_interval frames, kept pinned meanwhile.
+        self.assertEqual(commands, [['vehicle.moveToXY'], ['vehicle.setSpeed'], [],
+                                    ['vehicle.moveToXY'], [], [], ['vehicle.moveToXY']])
+        self.assertEqual(self.traci.vehicle.getSpeed('a'), 0.0)
+        self.assertEqual(interface.move_filter.get_sent_moves(), 3)
+
+    def test_unpins_vehicles_moving_again(self):
+        self._frame({'a': (1.0, 2.0, 90.0)})
+        self._frame({'a': (1.0, 2.0, 90.0)})
+        self.assertEqual(self.traci.vehicle.getSpeed('a'), 0.0)
+
+        # A move out of the distance or the angle tolerance.
+        self.assertEqual(self._frame({'a': (1.5, 2.0, 90.0)}),
+                         ['vehicle.setSpeed', 'vehicle.moveToXY'])
+        self.assertEqual(self.traci.vehicle.getSpeed('a'), -1.0)
+        self.assertFalse(interface.move_filter.is_pinned('a'))
+        self.assertEqual(self.traci.vehicle.getPosition('a'), (1.5, 2.0))
+
+        self._frame({'a': (1.5, 2.0, 90.0)})
+        self.assertEqual(self._frame({'a': (1.5, 2.0, 95.0)}),
+                         ['vehicle.setSpeed', 'vehicle.moveToXY'])
+        self.assertEqual(self.traci.vehicle.getSpeed('a'), -1.0)
+
+    def test_forgets_vehicles_missing_from_a_frame(self):
+        move_filter = interface.move_filter
+        self._frame({'a': (1.0, 2.0, 90.0), 'b': (5.0, 5.0, 0.0)})
+        self._frame({'a': (1.0, 2.0, 90.0), 'b': (5.0, 5.0, 0.0)})
+        self.assertTrue(move_filter.is_pinned('b'))
+
+        self._frame({'a': (1.0, 2.0, 90.0)})
+        self._frame({'a': (1.0, 2.0, 90.0)})
+        self.assertEqual(sorted(move_filter._poses), ['a'])
+        self.assertFalse(move_filter.is_pinned('b'))
+        self.assertTrue(move_filter.is_pinned('a'))
+
+        # Back in a frame, it is moved as a new vehicle.
+        self.assertEqual(self._frame({'b': (5.0, 5.0, 0.0)}), ['vehicle.moveToXY'])
+        self._frame({'b': (5.0, 5.0, 0.0)})
+        self.assertEqual(sorted(move_filter._poses), ['b'])
+        self.assertEqual(move_filter._pinned, set(['b']))
+
+
+class TestMoveVehicles(_FakeTraCITestCase):
+
+    params = interface.Parameters(1.2, 103.5, -0.9, 201.25, 90.0)
+
+    def setUp(self):
+        super(TestMoveVehicles, self).setUp()
+        self._spawned = interface.vehicle_tot, interface.spawned_tot, interface.id_list
+        self._move_filter, interface.move_filter = interface.move_filter, None
+
+    def tearDown(self):
+        interface.vehicle_tot, interface.spawned_tot, interface.id_list = self._spawned
+        interface.move_filter = self._move_filter
+        super(TestMoveVehicles, self).tearDown()
+
+    def _move(self, measurements):
+        """ The SUMO vehicles and the commands of move_vehicles on a new SUMO """
+        self.traci.load([])
+        self.traci.reset_counters()
+        interface.vehicle_tot, interface.spawned_tot, interface.id_list = 10 ** 6, 0, []
+        interface.add_vehicle('s1.p0', 4.7, 1.9, 0, 0, 25)
+        interface.move_vehicles(measurements, self.params, 's1.')
+        vehicles = dict((vid, dict(vehicle, color=None))
+                        for vid, vehicle in self.traci._vehicles.items())
+        return vehicles, self.traci.get_commands()
+
+    def test_adjusted_positions_are_the_adjusted_position(self):
+        rng = np.random.RandomState(0)
+        xs, ys = rng.uniform(-500.0, 500.0, (2, 200)).astype(np.float32)
+        yaws = rng.uniform(-180.0, 180.0, 200).astype(np.float32)
+        extents = rng.uniform(0.1, 3.0, 200).astype(np.float32).astype(np.float64)
+
+        adjusted = interface.getAdjustedPositions(xs, ys, yaws, self.params, extents)
+        for index in range(200):
+            position = interface.getAdjustedPosition(
+                interface.Position(float(xs[index]), float(ys[index]), float(yaws[index])),
+                self.params, float(extents[index]))
+            self.assertEqual(tuple(array[index] for array in adjusted), position)
+
+    def test_agents_array_moves_the_vehicles_bit_for_bit(self):
+        for seed in range(3):
+            data = make_measurements(seed).SerializeToString()
+            measurements = measurements_parser.MeasurementsParser().parse(data)
+            parser = measurements_parser.MeasurementsParser(agents_array=True)
+            with_agents = parser.parse(data)
+            self.assertIsInstance(with_agents, measurements_parser.MeasurementsWithAgents)
+
+            vehicles, commands = self._move(measurements)
+            self.assertEqual(len(vehicles), 1 + sum(agent.HasField('vehicle') for agent in
+                                                    measurements.non_player_agents))
+            self.assertEqual(self._move(with_agents), (vehicles, commands))
+
+    def test_plain_measurements_are_not_converted(self):
+        measurements = make_measurements(0, count=2)
+
+        def agents_to_array(measurements):
+            raise AssertionError('agents converted into an array')
+
+        with mock.patch.object(measurements_parser, 'agents_to_array', agents_to_array):
+            vehicles, _ = self._move(measurements)
+        self.assertEqual(len(vehicles), 4)
+
+    def test_vehicle_already_spawned_is_only_moved(self):
+        measurements = make_measurements(0, count=1)
+        _, commands = self._move(measurements)
+        self.assertEqual(commands.count('vehicle.add'), 3)
+
+        self.traci.reset_counters()
+        interface.move_vehicles(measurements, self.params, 's1.')
+        self.assertEqual(self.traci.get_commands(), ['vehicle.moveToXY'] * 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from carla.planner import map_bundle
+
+
+class TestMapBundle(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+        # A copy of the assets of a city, with the user cache next to it.
+        self.assets_dir = os.path.join(self._directory, 'planner')
+        os.mkdir(self.assets_dir)
+        for source_file in map_bundle._source_files('Town02'):
+            shutil.copy(source_file, self.assets_dir)
+        self.cache_dir = os.path.join(self._directory, 'cache')
+
+        patches = [mock.patch.object(map_bundle, '_DIR_PATH', self.assets_dir),
+                   mock.patch.dict(os.environ, {'XDG_CACHE_HOME': self.cache_dir})]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def _load(self):
+        """ Load the bundle, counting the builds """
+        with mock.patch.object(map_bundle, 'build_map_bundle',
+                               side_effect=map_bundle.build_map_bundle) as build:
+            bundle = map_bundle.load_map_bundle('Town02')
+        return bundle, build.call_count
+
+    def test_fresh_bundle_is_not_hashed(self):
+        _, builds = self._load()
+        self.assertEqual(builds, 1)
+        self.assertTrue(os.path.exists(os.path.join(self.assets_dir, 'Town02Bundle.npy')))
+
+        with mock.patch.object(map_bundle, 'source_hash', side_effect=AssertionError):
+            bundle, builds = self._load()
+        self.assertEqual(builds, 0)
+        self.assertEqual(bundle['source_hash'], map_bundle.source_hash('Town02'))
+
+    def test_modified_assets_rebuild(self):
+        self._load()
+        city_file = os.path.join(self.assets_dir, 'Town02.txt')
+        stat = os.stat(city_file)
+        os.utime(city_file, (stat.st_atime, stat.st_mtime + 10))
+        _, builds = self._load()
+        self.assertEqual(builds, 1)
+
+    def test_read_only_assets_use_the_user_cache(self):
+        with mock.patch.object(map_bundle.os, 'access', return_value=False):
+            _, builds = self._load()
+            self.assertEqual(builds, 1)
+            self.assertFalse(os.path.exists(os.path.join(self.assets_dir, 'Town02Bundle.npy')))
+            self.assertTrue(os.path.exists(
+                os.path.join(map_bundle.get_cache_dir(), 'Town02Bundle.npy')))
+
+            _, builds = self._load()
+            self.assertEqual(builds, 0)
+
+    def test_unwritable_bundle_stays_in_memory(self):
+        # The cache directory can not be created under a file.
+        with open(self.cache_dir, 'w'):
+            pass
+        with mock.patch.object(map_bundle.os, 'access', return_value=False):
+            bundle, builds = self._load()
+        self.assertEqual(builds, 1)
+        self.assertEqual(bundle['source_stamp'], map_bundle.source_stamp('Town02'))
+
+
+if __name__ == '__main__':
+    unittest.main()
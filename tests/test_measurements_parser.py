@@ -0,0 +1,154 @@
+import random
+import unittest
+
+import numpy as np
+
+from carla import carla_server_pb2 as carla_protocol
+from carla import measurements_parser
+
+
+def _set_transform(transform, rng):
+    location, rotation = transform.location, transform.rotation
+    location.x, location.y, location.z = [rng.uniform(-500.0, 500.0) for _ in range(3)]
+    rotation.pitch, rotation.yaw, rotation.roll = [rng.uniform(-180.0, 180.0) for _ in range(3)]
+
+
+def _set_box(message, rng):
+    _set_transform(message.transform, rng)
+    extent = message.bounding_box.extent
+    extent.x, extent.y, extent.z = [rng.uniform(0.1, 3.0) for _ in range(3)]
+    _set_transform(message.bounding_box.transform, rng)
+    message.forward_speed = rng.uniform(0.0, 30.0)
+
+
+def make_measurements(seed, count=20):
+    """
+    Measurements with agents of every kind, with random fields, a traffic
+    light with the default state, agents with no kind or with a kind and no
+    field set.
+    """
+    rng = random.Random(seed)
+    measurements = carla_protocol.Measurements()
+    measurements.frame_number = 7
+    measurements.game_timestamp = 12345
+    measurements.player_measurements.forward_speed = 4.5
+    _set_transform(measurements.player_measurements.transform, rng)
+
+    agent_id = 1000
+    for _ in range(count):
+        for kind in measurements_parser.AGENT_KINDS:
+            agent = measurements.non_player_agents.add()
+            agent_id += rng.randint(1, 2 ** 20)
+            agent.id = agent_id
+            if kind == 'vehicle':
+                _set_box(agent.vehicle, rng)
+            elif kind == 'pedestrian':
+                _set_box(agent.pedestrian, rng)
+            elif kind == 'traffic_light':
+                _set_transform(agent.traffic_light.transform, rng)
+                agent.traffic_light.state = rng.choice([1, 2])
+            elif kind == 'speed_limit_sign':
+                _set_transform(agent.speed_limit_sign.transform, rng)
+                agent.speed_limit_sign.speed_limit = rng.uniform(10.0, 30.0)
+
+    # The state GREEN is the default, not on the wire.
+    agent = measurements.non_player_agents.add()
+    agent.id = 1
+    _set_transform(agent.traffic_light.transform, rng)
+    for name in ('vehicle', 'traffic_light', 'speed_limit_sign'):
+        agent = measurements.non_player_agents.add()
+        agent.id = 2
+        getattr(agent, name).SetInParent()
+    measurements.non_player_agents.add().id = 3
+    return measurements
+
+
+class TestMeasurementsParser(unittest.TestCase):
+
+    def assertAgentsEqual(self, agents, expected):
+        self.assertEqual(agents.dtype, measurements_parser.AGENT_DTYPE)
+        for name in agents.dtype.names:
+            self.assertEqual(agents[name].tolist(), expected[name].tolist(), name)
+        self.assertEqual(agents.tobytes(), expected.tobytes())
+
+    def test_agents_to_array(self):
+        measurements = make_measurements(2)
+        agents = measurements_parser.agents_to_array(measurements)
+        self.assertEqual(len(agents), len(measurements.non_player_agents))
+        for record, agent in zip(agents, measurements.non_player_agents):
+            name = agent.WhichOneof('agent')
+            self.assertEqual(record['id'], agent.id)
+            self.assertEqual(measurements_parser.AGENT_KINDS[record['kind']], name or 'none')
+            if name is None:
+                continue
+            message = getattr(agent, name)
+            location, rotation = message.transform.location, message.transform.rotation
+            np.testing.assert_array_equal(
+                record['location'],
+                np.float32([location.x, location.y, location.z]))
+            np.testing.assert_array_equal(
+                record['rotation'],
+                np.float32([rotation.pitch, rotation.yaw, rotation.roll]))
+            if name in ('vehicle', 'pedestrian'):
+                extent = message.bounding_box.extent
+                np.testing.assert_array_equal(
+                    record['extent'], np.float32([extent.x, extent.y, extent.z]))
+                self.assertEqual(record['forward_speed'], np.float32(message.forward_speed))
+            else:
+                self.assertFalse(record['extent'].any())
+            state = message.state if name == 'traffic_light' else -1
+            self.assertEqual(record['traffic_light_state'], state)
+
+        # Nothing to convert for measurements parsed with the agents array.
+        parsed = measurements_parser.MeasurementsWithAgents(measurements, agents)
+        self.assertIs(measurements_parser.agents_to_array(parsed), agents)
+
+    def test_split_agents_is_agents_to_array(self):
+        for seed in range(5):
+            measurements = make_measurements(seed)
+            rest, agents = measurements_parser.split_agents(
+                measurements.SerializeToString())
+            expected = measurements_parser.agents_to_array(measurements)
+            self.assertAgentsEqual(agents, expected)
+            self.assertEqual(sorted(set(agents['kind'].tolist())),
+                             list(range(len(measurements_parser.AGENT_KINDS))))
+
+            # The rest is the message without its agents.
+            message = carla_protocol.Measurements()
+            message.ParseFromString(rest)
+            del measurements.non_player_agents[:]
+            self.assertEqual(message, measurements)
+
+    def test_default_and_missing_fields(self):
+        measurements = make_measurements(0)
+        _, split = measurements_parser.split_agents(measurements.SerializeToString())
+        for agents in (measurements_parser.agents_to_array(measurements), split):
+            # The GREEN traffic light, the agents of a kind with no field set
+            # and the agent with no kind.
+            agents = agents[-5:]
+            self.assertEqual(agents['id'].tolist(), [1, 2, 2, 2, 3])
+            self.assertEqual(agents['kind'].tolist(), [
+                measurements_parser.KIND_TRAFFIC_LIGHT, measurements_parser.KIND_VEHICLE,
+                measurements_parser.KIND_TRAFFIC_LIGHT,
+                measurements_parser.KIND_SPEED_LIMIT_SIGN, measurements_parser.KIND_NONE])
+            self.assertEqual(agents['traffic_light_state'].tolist(), [0, -1, 0, -1, -1])
+            self.assertFalse(agents[1:]['location'].any())
+            self.assertFalse(agents[1:]['rotation'].any())
+            self.assertFalse(agents['extent'].any())
+            self.assertFalse(agents['forward_speed'].any())
+
+    def test_parser_with_agents_array(self):
+        measurements = make_measurements(1)
+        parser = measurements_parser.MeasurementsParser(agents_array=True)
+        parsed = parser.parse(measurements.SerializeToString())
+        self.assertIsInstance(parsed, measurements_parser.MeasurementsWithAgents)
+        self.assertAgentsEqual(measurements_parser.agents_to_array(parsed),
+                               measurements_parser.agents_to_array(measurements))
+        self.assertEqual(measurements_parser.count_agents(parsed),
+                         len(measurements.non_player_agents))
+        self.assertEqual(parsed.game_timestamp, 12345)
+        self.assertEqual(len(parsed.non_player_agents), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,180 @@
+import unittest
+
+import numpy as np
+
+from carla.planner.multi_agent_planner import MultiAgentPlanner
+from carla.planner.planner import Planner, LANE_FOLLOW, REACH_GOAL
+
+from tests.route_walks import route_walks
+
+
+def _standalone_commands(walk, follow_route):
+    """ The commands a Planner of its own gives along a walk """
+    poses, target = walk
+    planner = Planner('Town01', follow_route=follow_route)
+    return [planner.get_next_command(position, orientation, target, (1, 0, 0))
+            for position, orientation in poses]
+
+
+def _plannable_walks(count, seed, follow_route=False):
+    """
+    Walks along which a Planner of their own never raises, with its
+    commands, so the LANE_FOLLOW the MultiAgentPlanner gives instead of
+    raising is never expected.
+    """
+    walks = []
+    for walk in route_walks('Town01', 6 * count, seed):
+        try:
+            walks.append((walk, _standalone_commands(walk, follow_route)))
+        except RuntimeError:
+            continue
+    assert len(walks) >= count
+    return walks[:count]
+
+
+def _ego_commands(walk):
+    """
+    The commands a Planner of its own gives along a walk, None on the poses
+    where it raises because it has no route yet.
+    """
+    poses, target = walk
+    planner = Planner('Town01')
+    commands = []
+    for position, orientation in poses:
+        try:
+            commands.append(planner.get_next_command(position, orientation,
+                                                     target, (1, 0, 0)))
+        except RuntimeError:
+            commands.append(None)
+    return commands
+
+
+def _run_agents(multi_agent_planner, walks, stagger):
+    """
+    Run the walks on the planner, agent i joining on step i * stagger and
+    leaving after its last pose. Returns the commands of every agent.
+    """
+    starts = [agent * stagger for agent in range(len(walks))]
+    ends = [start + len(poses) for start, ((poses, _), _) in zip(starts, walks)]
+    commands = [[] for _ in walks]
+    for step in range(max(ends)):
+        agents = [agent for agent in range(len(walks)) if starts[agent] <= step < ends[agent]]
+        for agent in range(len(walks)):
+            if ends[agent] == step:
+                multi_agent_planner.remove_agent(agent)
+        if not agents:
+            continue
+
+        poses = [walks[agent][0][0][step - starts[agent]] for agent in agents]
+        targets = [walks[agent][0][1] for agent in agents]
+        agent_commands = multi_agent_planner.get_next_commands(
+            agents,
+            np.array([position for position, _ in poses]),
+            np.array([orientation for _, orientation in poses]),
+            np.array(targets),
+            np.array([(1, 0, 0)] * len(agents)))
+        assert len(multi_agent_planner) == len(agents)
+        for agent, command in zip(agents, agent_commands.tolist()):
+            commands[agent].append(command)
+    return commands
+
+
+class TestMultiAgentPlanner(unittest.TestCase):
+
+    def _check_agents(self, follow_route):
+        walks = _plannable_walks(24, 0, follow_route)
+        multi_agent_planner = MultiAgentPlanner('Town01', follow_route=follow_route)
+        # The agents overlap, the slots of the agents that left are reused
+        # by the ones that join.
+        commands = _run_agents(multi_agent_planner, walks, 7)
+
+        for agent, (_, expected) in enumerate(walks):
+            self.assertEqual(commands[agent], expected, 'agent %d' % agent)
+        self.assertLess(len(multi_agent_planner._plans), len(walks))
+        self.assertTrue(any(set(expected) - set([LANE_FOLLOW, REACH_GOAL])
+                            for _, expected in walks))
+
+    def test_agents_get_the_commands_of_their_own_planner(self):
+        self._check_agents(False)
+
+    def test_following_agents_get_the_commands_of_their_own_planner(self):
+        self._check_agents(True)
+
+    def test_shared_planner_keeps_its_route(self):
+        walks = _plannable_walks(24, 1)
+        agent_walks = [walk for walk in walks
+                       if not set(walk[1]) - set([LANE_FOLLOW, REACH_GOAL])]
+        agent_poses = [poses for (poses, _), _ in agent_walks]
+        targets = np.array([target for (_, target), _ in agent_walks])
+
+        # The ego walks with turns, and walks starting next to an
+        # intersection, where the ego planner has no route of its own and
+        # must raise whatever the routes of the agents.
+        ego_walks = [walk for walk, commands in walks
+                     if set(commands) - set([LANE_FOLLOW, REACH_GOAL])][:2]
+        ego_walks += [walk for walk in route_walks('Town01', 20, 2)
+                      if _ego_commands(walk)[0] is None][:2]
+        self.assertEqual(len(ego_walks), 4)
+
+        for ego_walk in ego_walks:
+            (ego_poses, ego_target), ego_expected = ego_walk, _ego_commands(ego_walk)
+            shared_planner = Planner('Town01')
+            multi_agent_planner = MultiAgentPlanner(planner=shared_planner)
+            for step, (position, orientation) in enumerate(ego_poses):
+                # The ego planner is queried between the batches of the agents.
+                if ego_expected[step] is None:
+                    with self.assertRaises(RuntimeError):
+                        shared_planner.get_next_command(position, orientation,
+                                                        ego_target, (1, 0, 0))
+                else:
+                    self.assertEqual(
+                        shared_planner.get_next_command(position, orientation,
+                                                        ego_target, (1, 0, 0)),
+                        ego_expected[step], 'step %d' % step)
+
+                # The agents walk again from the start once at their end, as
+                # new agents with the same ids.
+                agents = range(len(agent_walks))
+                poses = []
+                for agent in agents:
+                    if step and step % len(agent_poses[agent]) == 0:
+                        multi_agent_planner.remove_agent(agent)
+                    poses.append(agent_poses[agent][step % len(agent_poses[agent])])
+                commands = multi_agent_planner.get_next_commands(
+                    agents,
+                    np.array([pose_position for pose_position, _ in poses]),
+                    np.array([pose_orientation for _, pose_orientation in poses]),
+                    targets,
+                    np.array([(1, 0, 0)] * len(agents)))
+                self.assertEqual(commands.tolist(),
+                                 [agent_walks[agent][1][step % len(agent_poses[agent])]
+                                  for agent in agents])
+
+    def test_removed_agent_forgets_its_route(self):
+        (poses, target), expected = next(
+            walk for walk in _plannable_walks(24, 0)
+            if set(walk[1]) - set([LANE_FOLLOW, REACH_GOAL]))
+        # A pose next to an intersection with a turn ahead, where a planner
+        # without the route of the walk has none.
+        step = next(step for step, command in enumerate(expected)
+                    if command not in (LANE_FOLLOW, REACH_GOAL)
+                    and _ego_commands(([poses[step]], target))[0] is None)
+
+        def command(planner):
+            position, orientation = poses[step]
+            return planner.get_next_commands(
+                [0], np.array([position]), np.array([orientation]),
+                np.array([target]), np.array([(1, 0, 0)]))[0]
+
+        multi_agent_planner = MultiAgentPlanner('Town01')
+        _run_agents(multi_agent_planner, [((poses[:step], target), None)], 0)
+        self.assertEqual(command(multi_agent_planner), expected[step])
+
+        # Added again, the agent has no route: it gets LANE_FOLLOW where its
+        # own planner raises.
+        multi_agent_planner.remove_agent(0)
+        self.assertEqual(command(multi_agent_planner), LANE_FOLLOW)
+
+
+if __name__ == '__main__':
+    unittest.main()
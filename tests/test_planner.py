@@ -0,0 +1,63 @@
+import unittest
+
+from carla.planner.map import CarlaMap
+from carla.planner.multi_agent_planner import MultiAgentPlanner
+from carla.planner.planner import Planner, UnroutableError
+
+from tests.route_walks import route_walks
+
+
+def _walk_commands(planner, poses, target):
+    commands = []
+    for position, orientation in poses:
+        try:
+            commands.append(planner.get_next_command(position, orientation,
+                                                     target, (1, 0, 0)))
+        except RuntimeError as error:
+            commands.append(type(error).__name__)
+    return commands
+
+
+class TestPlanner(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.walks = route_walks('Town01', 40, 0)
+
+    def test_routes_are_computed_again_by_default(self):
+        self.assertFalse(Planner('Town01').is_following_route())
+        self.assertFalse(MultiAgentPlanner('Town01').get_planner().is_following_route())
+
+    def test_following_gives_the_commands_of_recomputing(self):
+        following_planner = Planner('Town01', follow_route=True)
+        planner = Planner('Town01')
+        for poses, target in self.walks:
+            # Every walk starts on a new route.
+            following_planner.get_city_track().set_route([], None)
+            planner.get_city_track().set_route([], None)
+            self.assertEqual(_walk_commands(following_planner, poses, target),
+                             _walk_commands(planner, poses, target))
+
+        # Followed routes are looked up once per walk, not on every new node.
+        following_cache = following_planner.get_route_cache()
+        cache = planner.get_route_cache()
+        self.assertLess(following_cache.hits + following_cache.misses,
+                        (cache.hits + cache.misses) // 2)
+
+    def test_route_ending_at_an_intersection_has_no_commands(self):
+        planner = Planner('Town01')
+        city_track = planner.get_city_track()
+        carla_map = CarlaMap('Town01', 0.1643, 50.0)
+        intersection = sorted(carla_map.get_intersection_nodes())[0]
+        source = next(node for node, _ in sorted(carla_map.get_graph().get_distances())
+                      if not carla_map.is_intersection(node))
+        route = city_track.find_route(source, (1, 0, 0), intersection, (1, 0, 0))
+        self.assertIsNotNone(route)
+
+        with self.assertRaises(UnroutableError) as context:
+            planner.find_route_plan(source, (1, 0, 0), intersection, (1, 0, 0))
+        self.assertEqual(context.exception.route, route)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import random
+import unittest
+
+from carla.planner.map import CarlaMap
+from carla.planner.planner import Planner, RouteCache, UnroutableError
+
+
+# The axis orientations the planner queries are made with.
+_ORIENTATIONS = [(1.0, 0.0, 0.0), (0.0, 1.0, 0.0), (-1.0, 0.0, 0.0), (0.0, -1.0, 0.0)]
+
+
+def _random_queries(city_name, count, seed):
+    """
+    Random (source, source_ori, target, target_ori) on the road nodes away
+    from the intersections, the routes ending at one have no plan.
+    """
+    carla_map = CarlaMap(city_name, 0.1643, 50.0)
+    nodes = sorted(set(node for edge in carla_map.get_graph().get_distances()
+                       for node in edge if not carla_map.is_intersection(node)))
+    rng = random.Random(seed)
+    return [(rng.choice(nodes), rng.choice(_ORIENTATIONS),
+             rng.choice(nodes), rng.choice(_ORIENTATIONS)) for _ in range(count)]
+
+
+def _find_route_plan(planner, query):
+    try:
+        plan = planner.find_route_plan(*query)
+        return plan.route, plan.commands
+    except UnroutableError as error:
+        return error.route, None
+
+
+class TestRouteCache(unittest.TestCase):
+
+    def test_evicts_least_recently_used(self):
+        cache = RouteCache(3)
+        for key in 'abc':
+            cache.put(key, key.upper())
+        # Using a refreshes it, b is now the oldest entry.
+        self.assertEqual(cache.get('a'), 'A')
+        cache.put('d', 'D')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual([cache.get(key) for key in 'acd'], ['A', 'C', 'D'])
+
+        # Putting an existing key refreshes it as well.
+        cache.put('a', 'A2')
+        cache.put('e', 'E')
+        self.assertIsNone(cache.get('c'))
+        self.assertEqual(cache.get('a'), 'A2')
+
+    def test_counts_hits_and_misses(self):
+        cache = RouteCache(2)
+        cache.put('a', 1)
+        cache.get('a')
+        cache.get('b')
+        cache.get('a')
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+        cache.clear()
+        self.assertEqual((len(cache), cache.hits, cache.misses), (0, 0, 0))
+
+    def test_size_is_bounded(self):
+        cache = RouteCache(5)
+        for key in range(100):
+            cache.put(key, key)
+            self.assertLessEqual(len(cache), 5)
+        self.assertEqual([cache.get(key) for key in range(95, 100)], list(range(95, 100)))
+
+    def test_planner_cache_is_bounded(self):
+        planner = Planner('Town01', route_cache_size=8)
+        for query in _random_queries('Town01', 50, 0):
+            _find_route_plan(planner, query)
+            self.assertLessEqual(len(planner.get_route_cache()), 8)
+
+    def test_hit_returns_the_computed_route(self):
+        queries = _random_queries('Town01', 40, 1)
+        # Repeat the queries, the second time they are served by the cache.
+        queries = queries + queries[::-1]
+
+        planner = Planner('Town01')
+        uncached_planner = Planner('Town01', route_cache_size=0)
+        for query in queries:
+            self.assertEqual(_find_route_plan(planner, query),
+                             _find_route_plan(uncached_planner, query))
+        self.assertGreater(planner.get_route_cache().hits, 0)
+        self.assertEqual(uncached_planner.get_route_cache().hits, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
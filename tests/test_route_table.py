@@ -0,0 +1,56 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from carla.driving_benchmark.route_table import build_route_table, load_route_table
+
+from tests.benchmark_fakes import road_positions
+
+
+class TestLoadRouteTable(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.positions = road_positions('Town01')[:6]
+        cls.table = build_route_table('Town01', cls.positions)
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+        self.table_file = os.path.join(self._directory, 'table.npz')
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def test_round_trip(self):
+        self.table.save(self.table_file)
+        table = load_route_table('Town01', self.table_file)
+        self.assertTrue(table.matches(self.positions))
+        self.assertEqual(table.get_path(0, 5), self.table.get_path(0, 5))
+        self.assertEqual(table.get_commands(0, 5), self.table.get_commands(0, 5))
+
+    def test_missing_file(self):
+        self.assertIsNone(load_route_table('Town01', self.table_file))
+
+    def test_truncated_file(self):
+        self.table.save(self.table_file)
+        with open(self.table_file, 'rb') as f:
+            data = f.read()
+        with open(self.table_file, 'wb') as f:
+            f.write(data[:len(data) // 2])
+        self.assertIsNone(load_route_table('Town01', self.table_file))
+
+    def test_not_an_archive(self):
+        with open(self.table_file, 'wb') as f:
+            f.write(b'not a route table')
+        self.assertIsNone(load_route_table('Town01', self.table_file))
+
+    def test_missing_keys(self):
+        np.savez(self.table_file, city_name=np.array('Town01'))
+        self.assertIsNone(load_route_table('Town01', self.table_file))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from carla.driving_benchmark.shortest_path_cache import ShortestPathCache, shortest_path_query
+from carla.planner.planner import Planner
+
+from tests.benchmark_fakes import road_positions
+
+
+class TestShortestPathCache(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self._directory, 'Town01ShortestPaths.json')
+        positions = road_positions('Town01')
+        self.pairs = [(positions[index], positions[(index * 7 + 3) % len(positions)])
+                      for index in range(0, len(positions), 5)]
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def test_fill_computes_the_planner_distances(self):
+        cache = ShortestPathCache('Town01', self.cache_file)
+        self.assertIsNone(cache.get(*self.pairs[0]))
+
+        cache.fill(self.pairs)
+        planner = Planner('Town01')
+        for start_point, end_point in self.pairs:
+            self.assertEqual(cache.get(start_point, end_point),
+                             planner.get_shortest_path_distance(
+                                 *shortest_path_query(start_point, end_point)))
+
+    def test_distances_persist(self):
+        ShortestPathCache('Town01', self.cache_file).fill(self.pairs)
+        cache = ShortestPathCache('Town01', self.cache_file)
+        for start_point, end_point in self.pairs:
+            self.assertIsNotNone(cache.get(start_point, end_point))
+
+        # Nothing is missing, nothing is computed.
+        cache.fill(self.pairs, planner=object())
+
+    def test_other_versions_are_ignored(self):
+        ShortestPathCache('Town01', self.cache_file).fill(self.pairs)
+        with open(self.cache_file, 'r') as f:
+            distances = json.load(f)
+        # The keys of the caches before the version was added.
+        with open(self.cache_file, 'w') as f:
+            json.dump(dict((key.split('|', 1)[1], distance)
+                           for key, distance in distances.items()), f)
+
+        cache = ShortestPathCache('Town01', self.cache_file)
+        for start_point, end_point in self.pairs:
+            self.assertIsNone(cache.get(start_point, end_point))
+
+    def test_corrupted_cache_is_empty(self):
+        with open(self.cache_file, 'w') as f:
+            f.write('{"v2|truncated')
+        cache = ShortestPathCache('Town01', self.cache_file)
+        self.assertIsNone(cache.get(*self.pairs[0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
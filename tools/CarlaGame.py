@@ -8,8 +8,10 @@ import random
 import time
 
 from carla import image_converter
+from carla import instrumentation
 from carla import sensor
 from carla.client import make_carla_client, VehicleControl
+from carla.frame_reader import LatestFrameReader
 from carla.planner.map import CarlaMap
 from carla.settings import CarlaSettings
 from carla.tcp import TCPConnectionError
@@ -49,7 +51,7 @@ def make_carla_settings(args, vehicle_tot):
     # want for the new episode.
     settings = CarlaSettings()
     settings.set(
-        SynchronousMode=False,
+        SynchronousMode=args.lockstep,
         SendNonPlayerAgentsInfo=True,
         NumberOfVehicles=vehicle_tot,
         NumberOfPedestrians=0,
@@ -93,6 +95,11 @@ class CarlaGame(object):
         self._is_on_reverse = False
         self._enable_autopilot = False
         self._position = None
+        # In lockstep the control is sent by send_control, once SUMO is synced.
+        self._lockstep = args.lockstep
+        self._control = None
+        # Read the frames on a background thread keeping only the newest.
+        self._frame_reader = LatestFrameReader(carla_client) if args.latest_frame else None
 
     # INIT
     def initialize(self):
@@ -109,6 +116,8 @@ class CarlaGame(object):
         self._on_new_episode()
 
     def _on_new_episode(self):
+        if self._frame_reader is not None:
+            self._frame_reader.stop()
         self._carla_settings.randomize_seeds()
         #self._carla_settings.randomize_weather()
         scene = self.client.load_settings(self._carla_settings)
@@ -117,6 +126,8 @@ class CarlaGame(object):
         print('Starting new episode...')
         self.client.start_episode(player_start)
         self._is_on_reverse = False
+        if self._frame_reader is not None:
+            self._frame_reader.start()
 
     # EXECUTING
     def execution_step(self):
@@ -130,7 +141,10 @@ class CarlaGame(object):
 
     def _on_loop(self):
 
-        measurements, sensor_data = self.client.read_data()
+        if self._frame_reader is not None:
+            measurements, sensor_data = self._frame_reader.read_data()
+        else:
+            measurements, sensor_data = self.client.read_data()
 
         self._main_image = sensor_data.get('CameraRGB', None)
 
@@ -139,13 +153,20 @@ class CarlaGame(object):
         #if control is None:
         #    self._on_new_episode()
         if self._enable_autopilot:
-            self.client.send_control(
-                measurements.player_measurements.autopilot_control)
+            self._control = measurements.player_measurements.autopilot_control
         else:
-            self.client.send_control(control)
+            self._control = control
+        if not self._lockstep:
+            self.send_control()
 
         return measurements
 
+    def send_control(self):
+        """Send the control of the last frame, letting a synchronous server run the next one."""
+        if self._control is not None:
+            self.client.send_control(self._control)
+            self._control = None
+
     def _get_keyboard_control(self, keys):
         """
         Return a VehicleControl message based on the pressed keys. Return None
@@ -172,13 +193,22 @@ class CarlaGame(object):
         return control
 
     def _on_render(self):
-        if self._main_image is not None:
-            array = image_converter.to_rgb_array(self._main_image)
-            surface = pygame.surfarray.make_surface(array.swapaxes(0, 1))
-            self._display.blit(surface, (0, 0))
+        with instrumentation.span('game.render'):
+            if self._main_image is not None:
+                array = image_converter.to_rgb_array(self._main_image)
+                surface = pygame.surfarray.make_surface(array.swapaxes(0, 1))
+                self._display.blit(surface, (0, 0))
+
+            pygame.display.flip()
 
-        pygame.display.flip()
+    def get_skipped_frames(self):
+        """The frames skipped for a newer one, with latest_frame."""
+        if self._frame_reader is None:
+            return 0
+        return self._frame_reader.get_skipped_frames()
 
     # FINISH
     def finish(self):
+        if self._frame_reader is not None:
+            self._frame_reader.stop()
         pygame.quit
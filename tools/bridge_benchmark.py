@@ -0,0 +1,400 @@
+#!/usr/bin/env python
+
+"""
+Throughput benchmark of the Carla - SUMO interface.
+
+Drives the frame loop of interface.run, reading the frames of a fake CARLA
+server and moving the vehicles of a fake SUMO, for several numbers of
+agents. Reports the frames per second, the step latency percentiles and
+the time of each stage of a step, and writes them to a JSON file to track
+regressions between versions.
+
+Run it from the repository root:
+
+    python -m tools.bridge_benchmark --agents 10 100 1000 --sumo-latency 0.0001
+"""
+
+from __future__ import print_function
+
+import argparse
+import datetime
+import json
+import logging
+import platform
+import subprocess
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    raise RuntimeError('cannot import numpy, make sure numpy package is installed')
+
+import google.protobuf
+
+import interface
+from carla import image_converter
+from carla import instrumentation
+from carla import measurements_parser
+from carla import sensor
+from carla.client import make_carla_client, VehicleControl
+from carla.frame_reader import LatestFrameReader
+from carla.settings import CarlaSettings
+from tools.sumo_backend import get_sumo_backend
+
+
+_timer = getattr(time, 'perf_counter', time.time)
+
+STAGES = ['carla_read', 'protobuf_parse', 'control', 'render', 'transform', 'traci']
+
+# The spans of the TraCI calls of the interface.
+TRACI_SPANS = ['traci.add_vehicle', 'traci.moveToXY', 'traci.setSpeed', 'traci.simulationStep']
+
+
+class BenchmarkGame(object):
+    """
+    Stands in for CarlaGame: reads the frames and sends the controls as it
+    does, and converts the camera image as it does before drawing it, but
+    without a window.
+    """
+
+    def __init__(self, client, settings, render=True, latest_frame=False, lockstep=False):
+        self.client = client
+        self._carla_settings = settings
+        self._render = render
+        self._lockstep = lockstep
+        self.frame_reader = LatestFrameReader(client) if latest_frame else None
+
+    def initialize(self):
+        self.client.load_settings(self._carla_settings)
+        self.client.start_episode(0)
+        if self.frame_reader is not None:
+            self.frame_reader.start()
+
+    def finish(self):
+        if self.frame_reader is not None:
+            self.frame_reader.stop()
+
+    def execution_step(self):
+        if self.frame_reader is not None:
+            measurements, sensor_data = self.frame_reader.read_data()
+        else:
+            measurements, sensor_data = self.client.read_data()
+        if not self._lockstep:
+            self.send_control()
+
+        with instrumentation.span('game.render'):
+            image = sensor_data.get('CameraRGB', None)
+            if self._render and image is not None:
+                array = image_converter.to_rgb_array(image)
+                np.ascontiguousarray(array.swapaxes(0, 1))
+
+        return measurements
+
+    def send_control(self):
+        self.client.send_control(VehicleControl())
+
+
+def make_settings(number_of_vehicles, image_size, synchronous_mode):
+    settings = CarlaSettings()
+    settings.set(
+        SynchronousMode=synchronous_mode,
+        SendNonPlayerAgentsInfo=True,
+        NumberOfVehicles=number_of_vehicles,
+        NumberOfPedestrians=0,
+        WeatherId=1,
+        SeedVehicles=123456789)
+    if image_size is not None:
+        camera = sensor.Camera('CameraRGB')
+        camera.set_image_size(*image_size)
+        settings.add_sensor(camera)
+    return settings
+
+
+def run_benchmark(client, args, number_of_agents):
+    """Benchmark the frame loop with number_of_agents non-player vehicles."""
+    settings = make_settings(number_of_agents, args.image_size, not args.asynchronous)
+    game = BenchmarkGame(client, settings, render=not args.no_render,
+                         latest_frame=args.latest_frame, lockstep=args.lockstep)
+    game.initialize()
+
+    # A fresh interface and SUMO for every run.
+    traci = get_sumo_backend('fake', latency=args.sumo_latency,
+                             step_latency=args.sumo_step_latency)
+    sumo_clock = interface.SumoClock(args.sumo_step_length) if args.lockstep else None
+    interface.traci = traci
+    interface.vehicle_tot = number_of_agents
+    interface.spawned_tot = 0
+    interface.id_list = []
+    interface.move_filter = interface.MoveFilter(
+        args.move_tolerance, args.angle_tolerance,
+        args.move_refresh) if args.move_tolerance is not None else None
+    interface.start_simulation('benchmark', False, 0, args.sumo_step_length)
+    params = interface.Parameters(1, 0, 1, 0, 0)
+
+    # The age of a frame once SUMO is synced with it, from the platform
+    # timestamps of the server, taking the first frame as fresh.
+    first_frame = None
+    recorder = instrumentation.enable()
+    try:
+        for frame in range(args.warmup + args.frames):
+            if frame == args.warmup:
+                recorder.reset()
+                traci.reset_counters()
+                skipped_frames = game.frame_reader.get_skipped_frames() if args.latest_frame else 0
+                skipped_moves = recorder.get_counter('interface.moves_skipped')
+            with instrumentation.span('interface.step'):
+                measurements = game.execution_step()
+                with instrumentation.span('interface.sync'):
+                    interface.sync_measurements(measurements, params, sumo_clock)
+                if args.lockstep:
+                    game.send_control()
+            now = _timer()
+            if first_frame is None:
+                first_frame = (now, measurements.platform_timestamp)
+            recorder.record('bridge.frame_age', max(0.0, (now - first_frame[0]) - (
+                measurements.platform_timestamp - first_frame[1]) / 1000.0))
+    finally:
+        instrumentation.disable()
+        game.finish()
+
+    traci.close()
+    skipped_moves = recorder.get_counter('interface.moves_skipped')
+    if args.latest_frame:
+        skipped_frames = game.frame_reader.get_skipped_frames() - skipped_frames
+
+    total = recorder.get_span_total
+    traci_time = sum(total(name) for name in TRACI_SPANS)
+    stage_totals = {
+        'carla_read': total('tcp.read'),
+        'protobuf_parse': total('client.read_data') - total('tcp.read'),
+        'control': total('client.send_control'),
+        'render': total('game.render'),
+        'transform': total('interface.sync') - traci_time,
+        'traci': traci_time}
+
+    step = recorder.get_span_stats('interface.step')
+    frame_age = recorder.get_span_stats('bridge.frame_age')
+    return {
+        'agents': number_of_agents,
+        'frames': step.count,
+        'fps': step.count / step.total,
+        'step_ms': {
+            'mean': 1000.0 * step.mean(),
+            'p50': 1000.0 * step.percentile(50),
+            'p99': 1000.0 * step.percentile(99),
+            'max': 1000.0 * step.max},
+        'frame_age_ms': {
+            'p50': 1000.0 * frame_age.percentile(50),
+            'p99': 1000.0 * frame_age.percentile(99),
+            'max': 1000.0 * frame_age.max},
+        'skipped_frames': skipped_frames,
+        'skipped_moves': skipped_moves,
+        'stages_ms': dict((stage, 1000.0 * stage_totals[stage] / step.count)
+                          for stage in STAGES),
+        'spans': recorder.snapshot()['spans'],
+        'traci_commands': traci.get_command_counts(),
+        'sumo_steps': traci.get_simulation_steps()}
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.STDOUT).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _start_fake_server(args):
+    """The fake CARLA server, in its own process to not share the GIL."""
+    command = [sys.executable, '-m', 'tools.fake_carla_server',
+               '--host', args.host, '-p', str(args.port), '--seed', '0']
+    if args.server_fps:
+        command.extend(['--fps', str(args.server_fps)])
+    if args.stopped_fraction:
+        command.extend(['--stopped', str(args.stopped_fraction)])
+    if args.debug:
+        command.append('-v')
+    return subprocess.Popen(command)
+
+
+def print_results(results):
+    header = '%7s %8s %9s %9s %9s %8s %8s' % (
+        'agents', 'fps', 'p50 ms', 'p99 ms', 'age ms', 'skipped', 'no move')
+    header += ''.join(' %14s' % stage for stage in STAGES)
+    print(header)
+    for result in results:
+        line = '%7d %8.1f %9.2f %9.2f %9.1f %8d %8d' % (
+            result['agents'], result['fps'], result['step_ms']['p50'],
+            result['step_ms']['p99'], result['frame_age_ms']['p99'], result['skipped_frames'],
+            result['skipped_moves'])
+        line += ''.join(' %14.3f' % result['stages_ms'][stage] for stage in STAGES)
+        print(line)
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__,
+                                        formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument(
+        '-v', '--verbose',
+        action='store_true',
+        dest='debug',
+        help='print debug information')
+    argparser.add_argument(
+        '--host',
+        metavar='H',
+        default='localhost',
+        help='IP of the host server (default: localhost)')
+    argparser.add_argument(
+        '-p', '--port',
+        metavar='P',
+        default=2000,
+        type=int,
+        help='TCP port to listen to (default: 2000)')
+    argparser.add_argument(
+        '--external-server',
+        action='store_true',
+        help='use the CARLA server running at host:port instead of starting a fake one')
+    argparser.add_argument(
+        '--agents',
+        nargs='+',
+        type=int,
+        default=[10, 100, 500, 1000, 2000],
+        help='numbers of non-player vehicles to benchmark (default: 10 100 500 1000 2000)')
+    argparser.add_argument(
+        '--frames',
+        default=200,
+        type=int,
+        help='frames measured per number of agents (default: 200)')
+    argparser.add_argument(
+        '--warmup',
+        default=20,
+        type=int,
+        help='frames run before measuring, the vehicles are added to SUMO on the first one (default: 20)')
+    argparser.add_argument(
+        '--sumo-latency',
+        default=0.0,
+        type=float,
+        help='seconds each fake TraCI command takes (default: 0)')
+    argparser.add_argument(
+        '--sumo-step-latency',
+        default=0.0,
+        type=float,
+        help='seconds a fake SUMO simulation step takes on top of the command latency (default: 0)')
+    argparser.add_argument(
+        '--image-size',
+        metavar='WxH',
+        default='800x600',
+        type=lambda s: None if s == 'none' else tuple(int(x) for x in s.lower().split('x')),
+        help='size of the camera image, none for no camera (default: 800x600)')
+    argparser.add_argument(
+        '--no-render',
+        action='store_true',
+        help='do not convert the camera image as the game does before drawing it')
+    argparser.add_argument(
+        '--asynchronous',
+        action='store_true',
+        help='run the episodes in asynchronous mode, as the game does')
+    argparser.add_argument(
+        '--latest-frame',
+        action='store_true',
+        help='read the frames on a background thread keeping only the newest, asynchronous mode only')
+    argparser.add_argument(
+        '--lockstep',
+        action='store_true',
+        help='run SUMO in lockstep with the game time of the frames, sending the control once SUMO is synced')
+    argparser.add_argument(
+        '--sumo-step-length',
+        type=float,
+        help='seconds of a fake SUMO step, 1 if not given')
+    argparser.add_argument(
+        '--server-fps',
+        type=float,
+        help='frames per second of the fake server, as fast as possible if not given')
+    argparser.add_argument(
+        '--agents-array',
+        action='store_true',
+        help='decode the agents straight into an array instead of one protobuf message each')
+    argparser.add_argument(
+        '--stopped-fraction',
+        default=0.0,
+        type=float,
+        help='fraction of the agents of the fake server standing still (default: 0)')
+    argparser.add_argument(
+        '--move-tolerance',
+        type=float,
+        help='skip the SUMO moves of the vehicles that moved less than this many meters, every move is sent if not given')
+    argparser.add_argument(
+        '--angle-tolerance',
+        default=0.5,
+        type=float,
+        help='degrees a vehicle must turn to be moved, with --move-tolerance (default: 0.5)')
+    argparser.add_argument(
+        '--move-refresh',
+        default=10,
+        type=int,
+        help='frames after which a vehicle is moved anyway, with --move-tolerance (default: 10)')
+    argparser.add_argument(
+        '-o', '--output',
+        default='bridge_benchmark.json',
+        help='JSON file the results are written to (default: bridge_benchmark.json)')
+    args = argparser.parse_args()
+    if args.latest_frame and not args.asynchronous:
+        argparser.error('--latest-frame needs --asynchronous')
+    if args.lockstep and args.asynchronous:
+        argparser.error('--lockstep needs the synchronous mode')
+
+    log_level = logging.DEBUG if args.debug else logging.INFO
+    logging.basicConfig(format='%(levelname)s: %(message)s', level=log_level)
+
+    server = None if args.external_server else _start_fake_server(args)
+    results = []
+    try:
+        with make_carla_client(args.host, args.port, agents_array=args.agents_array) as client:
+            for number_of_agents in args.agents:
+                logging.info('benchmarking %d agents', number_of_agents)
+                results.append(run_benchmark(client, args, number_of_agents))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print_results(results)
+
+    report = {
+        'date': datetime.datetime.now().isoformat(),
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'protobuf': google.protobuf.__version__,
+        'protobuf_backend': measurements_parser.get_protobuf_backend(),
+        'parameters': {
+            'frames': args.frames,
+            'warmup': args.warmup,
+            'sumo_latency': args.sumo_latency,
+            'sumo_step_latency': args.sumo_step_latency,
+            'image_size': args.image_size,
+            'render': not args.no_render,
+            'synchronous_mode': not args.asynchronous,
+            'latest_frame': args.latest_frame,
+            'lockstep': args.lockstep,
+            'sumo_step_length': args.sumo_step_length,
+            'server_fps': args.server_fps,
+            'agents_array': args.agents_array,
+            'stopped_fraction': args.stopped_fraction,
+            'move_tolerance': args.move_tolerance,
+            'angle_tolerance': args.angle_tolerance,
+            'move_refresh': args.move_refresh,
+            'external_server': args.external_server},
+        'results': results}
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    logging.info('wrote %s', args.output)
+
+
+if __name__ == '__main__':
+
+    try:
+        main()
+    except KeyboardInterrupt:
+        print('\nCancelled by user. Bye!')
@@ -0,0 +1,98 @@
+"""
+Headless CARLA client sessions, the servers the interface reads besides the
+one of the game window when several CARLA servers feed the same SUMO.
+"""
+
+import logging
+import random
+
+from carla.client import CarlaClient, VehicleControl
+from carla.frame_reader import LatestFrameReader
+from carla.settings import CarlaSettings
+from carla.tcp import TCPConnectionError
+
+
+def make_session_settings(args, vehicle_tot):
+    """The settings of the game, without its camera."""
+    settings = CarlaSettings()
+    settings.set(
+        SynchronousMode=args.lockstep,
+        SendNonPlayerAgentsInfo=True,
+        NumberOfVehicles=vehicle_tot,
+        NumberOfPedestrians=0,
+        WeatherId=1,
+        QualityLevel=args.quality_level)
+    settings.randomize_seeds()
+    return settings
+
+
+def parse_server(server):
+    """A (host, port) pair from host:port."""
+    host, _, port = server.rpartition(':')
+    return host or 'localhost', int(port)
+
+
+class CarlaSession(object):
+    """
+    A client session of one CARLA server, with its player on autopilot.
+
+    The frames are read on a background thread, keeping only the newest
+    one, so the sessions of several servers read concurrently and the
+    interface always syncs SUMO with their freshest state. In synchronous
+    mode the server waits for the control of every frame and no frame is
+    skipped.
+    """
+
+    def __init__(self, host, port, namespace, settings, timeout=15, agents_array=False):
+        self._host = host
+        self._port = port
+        self._namespace = namespace
+        self._settings = settings
+        self._synchronous_mode = settings.SynchronousMode
+        self._client = CarlaClient(host, port, timeout, agents_array=agents_array)
+        self._frame_reader = LatestFrameReader(self._client)
+        self._control = None
+
+    def get_namespace(self):
+        return self._namespace
+
+    def get_skipped_frames(self):
+        return self._frame_reader.get_skipped_frames()
+
+    def start(self, player_start=None):
+        """Connect and start an episode, at a random player start if None."""
+        self._client.connect()
+        scene = self._client.load_settings(self._settings)
+        if player_start is None:
+            player_start = random.randint(0, max(0, len(scene.player_start_spots) - 1))
+        self._client.start_episode(player_start)
+        self._frame_reader.start()
+        logging.info('session %s:%d started, vehicles as %s*',
+                     self._host, self._port, self._namespace)
+
+    def read_measurements(self):
+        """The newest measurements of the server not read yet, waiting for them."""
+        measurements, _ = self._frame_reader.read_data()
+        self._control = measurements.player_measurements.autopilot_control
+        if not self._synchronous_mode:
+            self.send_control()
+        return measurements
+
+    def send_control(self):
+        """Send the autopilot control of the last frame read."""
+        if self._control is not None:
+            self._client.send_control(self._control)
+            self._control = None
+
+    def stop(self):
+        self._frame_reader.stop(wait=False)
+        if self._synchronous_mode:
+            # The server waits for a control to send the frame the reader
+            # thread is waiting for.
+            try:
+                control = self._control if self._control is not None else VehicleControl()
+                self._client.send_control(control)
+            except TCPConnectionError as error:
+                logging.debug('session %s:%d: %s', self._host, self._port, error)
+        self._frame_reader.stop()
+        self._client.disconnect()
@@ -0,0 +1,613 @@
+#!/usr/bin/env python
+
+"""
+A fake CARLA 0.8 server, speaking the client protocol without a simulator.
+
+It listens on the world port P and, once an episode starts, streams the
+measurements and the sensor data on P + 1 and reads the controls on P + 2,
+as the real server does. The player and the non-player agents follow simple
+synthetic motions, the camera and lidar payloads have the sizes requested
+in the CarlaSettings.ini of the episode, or the ones forced on the command
+line. Both the synchronous and the asynchronous modes are supported.
+
+Run it from the repository root:
+
+    python -m tools.fake_carla_server -p 2000 --vehicles 50
+"""
+
+from __future__ import print_function
+
+import argparse
+import io
+import logging
+import math
+import random
+import select
+import socket
+import struct
+import sys
+import threading
+import time
+
+if sys.version_info >= (3, 0):
+
+    from configparser import ConfigParser
+
+else:
+
+    from ConfigParser import RawConfigParser as ConfigParser
+
+from carla import carla_server_pb2 as carla_protocol
+
+
+IMAGE_TYPES = {'None': 0, 'SceneFinal': 1, 'Depth': 2, 'SemanticSegmentation': 3}
+
+
+def write_message(sock, message):
+    """Send a message prepended by its int32 size."""
+    sock.sendall(struct.pack('<L', len(message)) + message)
+
+
+def read_message(sock):
+    """Read a message prepended by its int32 size, None if the peer closed."""
+    header = _read_n(sock, 4)
+    if header is None:
+        return None
+    return _read_n(sock, struct.unpack('<L', header)[0])
+
+
+def _read_n(sock, length):
+    buf = bytes()
+    while length > 0:
+        data = sock.recv(length)
+        if not data:
+            return None
+        buf += data
+        length -= len(data)
+    return buf
+
+
+class EpisodeSettings(object):
+    """The settings of an episode, parsed from its CarlaSettings.ini."""
+
+    def __init__(self, ini_file):
+        ini = ConfigParser()
+        ini.optionxform = str
+        if sys.version_info >= (3, 0):
+            ini.read_string(ini_file)
+        else:
+            ini.readfp(io.BytesIO(ini_file))
+
+        def get(section, key, default, getter=ini.get):
+            if ini.has_option(section, key):
+                return getter(section, key)
+            return default
+
+        self.synchronous_mode = get('CARLA/Server', 'SynchronousMode', True, ini.getboolean)
+        self.send_non_player_agents_info = get(
+            'CARLA/Server', 'SendNonPlayerAgentsInfo', False, ini.getboolean)
+        self.number_of_vehicles = get('CARLA/LevelSettings', 'NumberOfVehicles', 20, ini.getint)
+        self.number_of_pedestrians = get(
+            'CARLA/LevelSettings', 'NumberOfPedestrians', 30, ini.getint)
+        self.seed = get('CARLA/LevelSettings', 'SeedVehicles', None, ini.getint)
+
+        self.sensors = []
+        names = get('CARLA/Sensor', 'Sensors', '')
+        for name in [name for name in names.split(',') if name]:
+            section = 'CARLA/Sensor/' + name
+            sensor_type = get(section, 'SensorType', 'CAMERA')
+            if sensor_type == 'CAMERA':
+                self.sensors.append({
+                    'name': name,
+                    'type': carla_protocol.Sensor.CAMERA,
+                    'width': get(section, 'ImageSizeX', 720, ini.getint),
+                    'height': get(section, 'ImageSizeY', 512, ini.getint),
+                    'image_type': IMAGE_TYPES.get(get(section, 'PostProcessing', 'SceneFinal'), 0),
+                    'fov': get(section, 'FOV', 90.0, ini.getfloat)})
+            elif sensor_type == 'LIDAR_RAY_CAST':
+                self.sensors.append({
+                    'name': name,
+                    'type': carla_protocol.Sensor.LIDAR_RAY_CAST,
+                    'channels': get(section, 'Channels', 32, ini.getint),
+                    'points_per_second': get(section, 'PointsPerSecond', 56000, ini.getint),
+                    'rotation_frequency': get(section, 'RotationFrequency', 10.0, ini.getfloat)})
+            else:
+                logging.warning('ignoring sensor %s of unknown type %s', name, sensor_type)
+
+
+class SyntheticWorld(object):
+    """
+    The player and the non-player agents. Every agent drives a circle of its
+    own radius and speed around a random centre, but the stopped_fraction
+    of them that stand still, the player integrates the controls it
+    receives with a kinematic bicycle model.
+    """
+
+    def __init__(self, number_of_vehicles, number_of_pedestrians, seed=None,
+                 stopped_fraction=0.0):
+        rng = random.Random(seed)
+        self.agents = []
+        for index in range(number_of_vehicles + number_of_pedestrians):
+            is_vehicle = index < number_of_vehicles
+            speed = rng.uniform(5.0, 15.0) if is_vehicle else rng.uniform(0.5, 2.0)
+            if rng.random() < stopped_fraction:
+                speed = 0.0
+            self.agents.append({
+                'id': 1000 + index,
+                'vehicle': is_vehicle,
+                'centre': (rng.uniform(0.0, 400.0), rng.uniform(0.0, 330.0)),
+                'radius': rng.uniform(10.0, 80.0),
+                'phase': rng.uniform(0.0, 2.0 * math.pi),
+                'speed': speed,
+                'extent': (2.34, 0.94, 0.75) if is_vehicle else (0.3, 0.3, 0.9)})
+        self.player = {'x': 100.0, 'y': 2.0, 'yaw': 0.0, 'speed': 0.0, 'acceleration': 0.0}
+        self.game_time = 0.0
+
+    def reset_player(self, start_spot):
+        self.player.update(x=start_spot.location.x, y=start_spot.location.y,
+                           yaw=start_spot.rotation.yaw, speed=0.0, acceleration=0.0)
+
+    def step(self, delta_seconds, control):
+        self.game_time += delta_seconds
+        player = self.player
+        speed = player['speed']
+        if control is not None:
+            acceleration = 4.0 * control.throttle - 8.0 * control.brake
+            if control.hand_brake:
+                acceleration = -8.0
+            if control.reverse:
+                acceleration = -acceleration
+            yaw_rate = 60.0 * control.steer * min(1.0, abs(speed) / 5.0)
+        else:
+            acceleration = -0.5 if speed > 0.0 else 0.0
+            yaw_rate = 0.0
+        player['speed'] = max(-5.0, speed + acceleration * delta_seconds)
+        player['acceleration'] = acceleration
+        player['yaw'] = (player['yaw'] + yaw_rate * delta_seconds) % 360.0
+        radians = math.radians(player['yaw'])
+        player['x'] += player['speed'] * math.cos(radians) * delta_seconds
+        player['y'] += player['speed'] * math.sin(radians) * delta_seconds
+
+    def agent_pose(self, agent):
+        """Position and yaw, in degrees, of an agent at the current game time."""
+        angle = agent['phase'] + agent['speed'] * self.game_time / agent['radius']
+        x = agent['centre'][0] + agent['radius'] * math.cos(angle)
+        y = agent['centre'][1] + agent['radius'] * math.sin(angle)
+        return x, y, math.degrees(angle + math.pi / 2.0) % 360.0
+
+
+def _set_transform(transform, x, y, z, yaw):
+    transform.location.x = x
+    transform.location.y = y
+    transform.location.z = z
+    radians = math.radians(yaw)
+    transform.orientation.x = math.cos(radians)
+    transform.orientation.y = math.sin(radians)
+    transform.orientation.z = 0.0
+    transform.rotation.pitch = 0.0
+    transform.rotation.yaw = yaw
+    transform.rotation.roll = 0.0
+
+
+class FakeCarlaServer(object):
+    """
+    Serves the CARLA client protocol on the ports port, port + 1 and
+    port + 2. One client is served at a time, as by the real server.
+
+    Args:
+        host, port: address of the world port.
+        map_name: the map name of the scene descriptions.
+        number_of_start_spots: number of player start spots of the scene.
+        number_of_vehicles, number_of_pedestrians: override the numbers of
+            agents of the episode settings if not None.
+        frame_rate: frames per second of the simulation, the server sends
+            the frames as fast as it can if None. The game time always
+            advances 1 / frame_rate seconds per frame, 1 / 15 if None.
+        image_size: (width, height) overriding the size of every camera.
+        lidar_points: points per frame overriding the size of every lidar.
+        sensor_tick: the sensor data is sent every sensor_tick frames.
+        seed: seed of the synthetic agents, the one of the episode
+            settings if None.
+        stopped_fraction: fraction of the agents standing still.
+    """
+
+    def __init__(self, host='localhost', port=2000, map_name='Town01',
+                 number_of_start_spots=80, number_of_vehicles=None,
+                 number_of_pedestrians=None, frame_rate=None, image_size=None,
+                 lidar_points=None, sensor_tick=1, seed=None, stopped_fraction=0.0):
+        self._host = host
+        self._port = port
+        self._map_name = map_name
+        self._number_of_start_spots = number_of_start_spots
+        self._number_of_vehicles = number_of_vehicles
+        self._number_of_pedestrians = number_of_pedestrians
+        self._frame_rate = frame_rate
+        self._image_size = image_size
+        self._lidar_points = lidar_points
+        self._sensor_tick = max(1, sensor_tick)
+        self._seed = seed
+        self._stopped_fraction = stopped_fraction
+
+        self._listeners = []
+        self._stop_event = threading.Event()
+        self._server_thread = None
+        self._episode_thread = None
+        self._episode_stop = None
+        self._agent_sockets = []
+        # Payloads of the sensors, built once per size.
+        self._payloads = {}
+
+        self.frames_sent = 0
+        self.controls_received = 0
+
+    def start(self):
+        """Listen on the three ports and serve on a background thread."""
+        self._listen()
+        self._server_thread = threading.Thread(target=self._serve, name='fake-carla-server')
+        self._server_thread.daemon = True
+        self._server_thread.start()
+
+    def serve_forever(self):
+        """Listen on the three ports and serve until stopped."""
+        self._listen()
+        self._serve()
+
+    def stop(self):
+        self._stop_event.set()
+        self._stop_episode()
+        if self._server_thread is not None:
+            self._server_thread.join()
+            self._server_thread = None
+
+    def _listen(self):
+        for port in (self._port, self._port + 1, self._port + 2):
+            listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            listener.bind((self._host, port))
+            listener.listen(1)
+            listener.settimeout(0.2)
+            self._listeners.append(listener)
+        logging.info('fake CARLA server listening on %s:%d', self._host, self._port)
+
+    def _accept(self, listener):
+        """Accept a connection, None if the server stopped meanwhile."""
+        while not self._stop_event.is_set():
+            try:
+                connection, _ = listener.accept()
+            except socket.timeout:
+                continue
+            connection.settimeout(None)
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            return connection
+        return None
+
+    def _serve(self):
+        try:
+            while not self._stop_event.is_set():
+                world = self._accept(self._listeners[0])
+                if world is None:
+                    break
+                logging.info('client connected')
+                try:
+                    self._serve_world(world)
+                except socket.error as error:
+                    logging.info('client connection lost: %s', error)
+                finally:
+                    self._stop_episode()
+                    world.close()
+        finally:
+            for listener in self._listeners:
+                listener.close()
+            self._listeners = []
+
+    def _serve_world(self, world):
+        settings = None
+        scene = None
+        world.settimeout(0.2)
+        while not self._stop_event.is_set():
+            ready, _, _ = select.select([world], [], [], 0.2)
+            if not ready:
+                continue
+            world.settimeout(None)
+            data = read_message(world)
+            world.settimeout(0.2)
+            if data is None:
+                logging.info('client disconnected')
+                return
+
+            if settings is None or scene is None:
+                # Only a new episode can be requested.
+                request = carla_protocol.RequestNewEpisode()
+                request.ParseFromString(data)
+                settings, scene = self._new_episode(world, request)
+                continue
+
+            # Either the start of the requested episode or a new request. The
+            # first field of both messages is told apart by its wire type, a
+            # varint on EpisodeStart and a string on RequestNewEpisode.
+            if not data or data[:1] == b'\x08':
+                start = carla_protocol.EpisodeStart()
+                start.ParseFromString(data)
+                self._start_episode(world, settings, scene, start.player_start_spot_index)
+                settings, scene = None, None
+            else:
+                request = carla_protocol.RequestNewEpisode()
+                request.ParseFromString(data)
+                settings, scene = self._new_episode(world, request)
+
+    def _new_episode(self, world, request):
+        self._stop_episode()
+        settings = EpisodeSettings(request.ini_file)
+        scene = carla_protocol.SceneDescription()
+        scene.map_name = self._map_name
+        for index in range(self._number_of_start_spots):
+            _set_transform(scene.player_start_spots.add(),
+                           10.0 + 40.0 * (index % 10), 2.0 + 40.0 * (index // 10), 0.22,
+                           90.0 * (index % 4))
+        for sensor_id, sensor in enumerate(settings.sensors):
+            sensor['id'] = sensor_id
+            pb_sensor = scene.sensors.add()
+            pb_sensor.id = sensor_id
+            pb_sensor.type = sensor['type']
+            pb_sensor.name = sensor['name']
+        write_message(world, scene.SerializeToString())
+        logging.info('new episode requested, %s mode, %d sensors',
+                     'synchronous' if settings.synchronous_mode else 'asynchronous',
+                     len(settings.sensors))
+        return settings, scene
+
+    def _start_episode(self, world, settings, scene, player_start_spot_index):
+        ready = carla_protocol.EpisodeReady()
+        ready.ready = player_start_spot_index < len(scene.player_start_spots)
+        write_message(world, ready.SerializeToString())
+        if not ready.ready:
+            return
+
+        stream = self._accept(self._listeners[1])
+        control = self._accept(self._listeners[2])
+        if stream is None or control is None:
+            return
+        self._agent_sockets = [stream, control]
+
+        number_of_vehicles = self._number_of_vehicles
+        if number_of_vehicles is None:
+            number_of_vehicles = settings.number_of_vehicles
+        number_of_pedestrians = self._number_of_pedestrians
+        if number_of_pedestrians is None:
+            number_of_pedestrians = settings.number_of_pedestrians
+        synthetic_world = SyntheticWorld(
+            number_of_vehicles, number_of_pedestrians,
+            self._seed if self._seed is not None else settings.seed,
+            self._stopped_fraction)
+        synthetic_world.reset_player(scene.player_start_spots[player_start_spot_index])
+
+        self._episode_stop = threading.Event()
+        self._episode_thread = threading.Thread(
+            target=self._run_episode,
+            args=(settings, synthetic_world, stream, control, self._episode_stop),
+            name='fake-carla-episode')
+        self._episode_thread.daemon = True
+        self._episode_thread.start()
+        logging.info('episode started at player start %d', player_start_spot_index)
+
+    def _stop_episode(self):
+        if self._episode_stop is not None:
+            self._episode_stop.set()
+        # Shutting the sockets down wakes the episode thread up, they are
+        # closed once it is done with them.
+        for agent_socket in self._agent_sockets:
+            try:
+                agent_socket.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+        if self._episode_thread is not None:
+            self._episode_thread.join()
+        for agent_socket in self._agent_sockets:
+            agent_socket.close()
+        self._agent_sockets = []
+        self._episode_thread = None
+        self._episode_stop = None
+
+    def _run_episode(self, settings, synthetic_world, stream, control_socket, stop):
+        delta_seconds = 1.0 / (self._frame_rate or 15.0)
+        start_time = time.time()
+        frame_number = 0
+        control = None
+        next_frame_time = start_time
+        try:
+            while not stop.is_set():
+                frame_number += 1
+                self._send_frame(stream, settings, synthetic_world, frame_number,
+                                 control, start_time, delta_seconds)
+                self.frames_sent += 1
+
+                if settings.synchronous_mode:
+                    # The simulation waits for the control of this frame.
+                    data = read_message(control_socket)
+                    if data is None:
+                        break
+                    control = self._parse_control(data)
+                else:
+                    # Apply the last control received, if any.
+                    while select.select([control_socket], [], [], 0.0)[0]:
+                        data = read_message(control_socket)
+                        if data is None:
+                            return
+                        control = self._parse_control(data)
+
+                synthetic_world.step(delta_seconds, control)
+
+                if self._frame_rate:
+                    next_frame_time += delta_seconds
+                    time.sleep(max(0.0, next_frame_time - time.time()))
+        except socket.error as error:
+            if not stop.is_set():
+                logging.info('episode connection lost: %s', error)
+
+    def _parse_control(self, data):
+        control = carla_protocol.Control()
+        control.ParseFromString(data)
+        self.controls_received += 1
+        return control
+
+    def _send_frame(self, stream, settings, synthetic_world, frame_number, control,
+                    start_time, delta_seconds):
+        measurements = carla_protocol.Measurements()
+        measurements.frame_number = frame_number
+        measurements.platform_timestamp = int(1000.0 * (time.time() - start_time)) & 0xffffffff
+        measurements.game_timestamp = int(1000.0 * synthetic_world.game_time) & 0xffffffff
+
+        player = synthetic_world.player
+        player_measurements = measurements.player_measurements
+        _set_transform(player_measurements.transform, player['x'], player['y'], 0.22,
+                       player['yaw'])
+        player_measurements.bounding_box.extent.x = 2.34
+        player_measurements.bounding_box.extent.y = 0.94
+        player_measurements.bounding_box.extent.z = 0.75
+        player_measurements.acceleration.x = player['acceleration']
+        player_measurements.forward_speed = player['speed']
+        if control is not None:
+            player_measurements.autopilot_control.CopyFrom(control)
+
+        if settings.send_non_player_agents_info:
+            for agent in synthetic_world.agents:
+                x, y, yaw = synthetic_world.agent_pose(agent)
+                pb_agent = measurements.non_player_agents.add()
+                pb_agent.id = agent['id']
+                body = pb_agent.vehicle if agent['vehicle'] else pb_agent.pedestrian
+                _set_transform(body.transform, x, y, 0.22, yaw)
+                body.bounding_box.extent.x = agent['extent'][0]
+                body.bounding_box.extent.y = agent['extent'][1]
+                body.bounding_box.extent.z = agent['extent'][2]
+                body.forward_speed = agent['speed']
+
+        write_message(stream, measurements.SerializeToString())
+
+        if frame_number % self._sensor_tick == 0:
+            for sensor in settings.sensors:
+                write_message(stream, self._sensor_message(sensor, frame_number, delta_seconds))
+        # An empty message closes the sensor data of the frame.
+        write_message(stream, b'')
+
+    def _sensor_message(self, sensor, frame_number, delta_seconds):
+        if sensor['type'] == carla_protocol.Sensor.CAMERA:
+            width, height = self._image_size or (sensor['width'], sensor['height'])
+            header = struct.pack('<LQLLLf', sensor['id'], frame_number, width, height,
+                                 sensor['image_type'], sensor['fov'])
+            return header + self._get_payload(('image', width, height))
+
+        channels = sensor['channels']
+        points = self._lidar_points
+        if points is None:
+            points = int(sensor['points_per_second'] * delta_seconds)
+        points -= points % channels
+        horizontal_angle = (360.0 * sensor['rotation_frequency'] * frame_number
+                            * delta_seconds) % 360.0
+        header = struct.pack('<LQfL', sensor['id'], frame_number, horizontal_angle, channels)
+        return header + self._get_payload(('lidar', channels, points))
+
+    def _get_payload(self, key):
+        payload = self._payloads.get(key)
+        if payload is None:
+            rng = random.Random(0)
+            if key[0] == 'image':
+                _, width, height = key
+                # A BGRA gradient.
+                row = bytearray()
+                for x in range(width):
+                    row += bytearray((x % 256, (x // 4) % 256, 128, 255))
+                payload = bytes(row) * height
+            else:
+                _, channels, points = key
+                counts = struct.pack('<%dL' % channels, *([points // channels] * channels))
+                coordinates = [rng.uniform(-50.0, 50.0) for _ in range(3 * points)]
+                payload = counts + struct.pack('<%df' % (3 * points), *coordinates)
+            self._payloads[key] = payload
+        return payload
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__,
+                                        formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument(
+        '-v', '--verbose',
+        action='store_true',
+        dest='debug',
+        help='print debug information')
+    argparser.add_argument(
+        '--host',
+        metavar='H',
+        default='localhost',
+        help='IP of the host to listen on (default: localhost)')
+    argparser.add_argument(
+        '-p', '--port',
+        metavar='P',
+        default=2000,
+        type=int,
+        help='world port, the ports P+1 and P+2 are used too (default: 2000)')
+    argparser.add_argument(
+        '--map-name',
+        default='Town01',
+        help='map name of the scene (default: Town01)')
+    argparser.add_argument(
+        '--vehicles',
+        type=int,
+        help='number of non-player vehicles, overriding the episode settings')
+    argparser.add_argument(
+        '--pedestrians',
+        type=int,
+        help='number of pedestrians, overriding the episode settings')
+    argparser.add_argument(
+        '--fps',
+        type=float,
+        help='frames per second, as fast as possible if not given')
+    argparser.add_argument(
+        '--image-size',
+        metavar='WxH',
+        type=lambda s: tuple(int(x) for x in s.lower().split('x')),
+        help='size of every camera image, overriding the episode settings')
+    argparser.add_argument(
+        '--lidar-points',
+        type=int,
+        help='points per frame of every lidar, overriding the episode settings')
+    argparser.add_argument(
+        '--sensor-tick',
+        type=int,
+        default=1,
+        help='send the sensor data every N frames (default: 1)')
+    argparser.add_argument(
+        '--seed',
+        type=int,
+        help='seed of the synthetic agents')
+    argparser.add_argument(
+        '--stopped',
+        metavar='FRACTION',
+        type=float,
+        default=0.0,
+        help='fraction of the agents standing still (default: 0)')
+    args = argparser.parse_args()
+
+    log_level = logging.DEBUG if args.debug else logging.INFO
+    logging.basicConfig(format='%(levelname)s: %(message)s', level=log_level)
+
+    server = FakeCarlaServer(
+        host=args.host,
+        port=args.port,
+        map_name=args.map_name,
+        number_of_vehicles=args.vehicles,
+        number_of_pedestrians=args.pedestrians,
+        frame_rate=args.fps,
+        image_size=args.image_size,
+        lidar_points=args.lidar_points,
+        sensor_tick=args.sensor_tick,
+        seed=args.seed,
+        stopped_fraction=args.stopped)
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+
+    try:
+        main()
+    except KeyboardInterrupt:
+        print('\nCancelled by user. Bye!')
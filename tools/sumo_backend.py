@@ -0,0 +1,254 @@
+"""
+SUMO backends of the Carla - SUMO interface.
+
+The interface drives SUMO through the traci module. A backend is either the
+real traci module or a FakeTraCI, an in-process stand-in with the same calls
+that keeps a minimal vehicle state, records the commands it receives and
+can simulate the round-trip latency of each of them, to measure the TraCI
+cost of the interface without SUMO installed.
+"""
+
+import collections
+import math
+import os
+import sys
+import time
+
+
+BACKENDS = ['traci', 'fake']
+
+_timer = getattr(time, 'perf_counter', time.time)
+
+
+def get_sumo_backend(name='traci', latency=0.0, step_latency=0.0, record=False,
+                     step_length=1.0):
+    """
+    Returns the SUMO backend called name. The latency arguments, record and
+    step_length only apply to the fake backend, see FakeTraCI.
+    """
+    if name == 'traci':
+        if 'SUMO_HOME' in os.environ:
+            tools = os.path.join(os.environ['SUMO_HOME'], 'tools')
+            if tools not in sys.path:
+                sys.path.append(tools)
+        try:
+            import traci
+        except ImportError:
+            raise RuntimeError(
+                "cannot import traci, please declare environment variable 'SUMO_HOME'")
+        return traci
+    if name == 'fake':
+        return FakeTraCI(latency, step_latency, record, step_length)
+    raise ValueError('unknown SUMO backend %r, choose one of %s' % (name, ', '.join(BACKENDS)))
+
+
+class FakeTraCIException(Exception):
+    """Raised by the fake backend where traci raises TraCIException."""
+    pass
+
+
+class _Domain(object):
+    """A command domain, as traci.vehicle or traci.gui."""
+
+    def __init__(self, connection, name):
+        self._connection = connection
+        self._name = name
+
+
+class _VehicleDomain(_Domain):
+
+    def add(self, vehID, routeID, typeID='DEFAULT_VEHTYPE', depart=None,
+            departLane='first', departPos='base', departSpeed='0', **kwargs):
+        self._connection._command('vehicle.add')
+        vehicles = self._connection._vehicles
+        if vehID in vehicles:
+            raise FakeTraCIException('Invalid vehicle id %s, it is already in use' % vehID)
+        vehicles[vehID] = {
+            'route': routeID,
+            'type': typeID,
+            'position': (0.0, 0.0),
+            'angle': 0.0,
+            'color': (255, 255, 0, 255),
+            'length': 5.0,
+            'width': 1.8,
+            'speed': -1.0}
+
+    def moveToXY(self, vehID, edgeID, lane, x, y, angle=-1073741824.0, keepRoute=1):
+        vehicle = self._get(vehID, 'vehicle.moveToXY')
+        vehicle['position'] = (x, y)
+        vehicle['angle'] = angle
+
+    def setColor(self, vehID, color):
+        self._get(vehID, 'vehicle.setColor')['color'] = tuple(color)
+
+    def setLength(self, vehID, length):
+        self._get(vehID, 'vehicle.setLength')['length'] = length
+
+    def setWidth(self, vehID, width):
+        self._get(vehID, 'vehicle.setWidth')['width'] = width
+
+    def setSpeed(self, vehID, speed):
+        # -1 gives the speed back to the car-following model.
+        self._get(vehID, 'vehicle.setSpeed')['speed'] = speed
+
+    def getSpeed(self, vehID):
+        return self._get(vehID, 'vehicle.getSpeed')['speed']
+
+    def remove(self, vehID, reason=3):
+        self._get(vehID, 'vehicle.remove')
+        del self._connection._vehicles[vehID]
+
+    def getIDList(self):
+        self._connection._command('vehicle.getIDList')
+        return tuple(self._connection._vehicles)
+
+    def getIDCount(self):
+        self._connection._command('vehicle.getIDCount')
+        return len(self._connection._vehicles)
+
+    def getPosition(self, vehID):
+        return self._get(vehID, 'vehicle.getPosition')['position']
+
+    def getAngle(self, vehID):
+        return self._get(vehID, 'vehicle.getAngle')['angle']
+
+    def _get(self, vehID, command):
+        self._connection._command(command)
+        try:
+            return self._connection._vehicles[vehID]
+        except KeyError:
+            raise FakeTraCIException('Vehicle \'%s\' is not known' % vehID)
+
+
+class _GUIDomain(_Domain):
+
+    def trackVehicle(self, viewID, vehID):
+        self._connection._command('gui.trackVehicle')
+        if vehID not in self._connection._vehicles:
+            raise FakeTraCIException('Vehicle \'%s\' is not known' % vehID)
+
+    def setZoom(self, viewID, zoom):
+        self._connection._command('gui.setZoom')
+
+
+class _SimulationDomain(_Domain):
+
+    def getTime(self):
+        self._connection._command('simulation.getTime')
+        return self._connection._time
+
+    def getDeltaT(self):
+        self._connection._command('simulation.getDeltaT')
+        return self._connection._step_length
+
+
+class FakeTraCI(object):
+    """
+    An in-process stand-in of the traci module, for the calls of the
+    interface.
+
+    Args:
+        latency: seconds every command waits, the round trip of a TraCI
+            command to a local SUMO.
+        step_latency: seconds simulationStep waits on top of latency for
+            every step it simulates, the time SUMO takes to simulate one.
+        record: keep the list of the commands received, see get_commands.
+        step_length: seconds of a simulation step, unless the start
+            command sets --step-length.
+    """
+
+    TraCIException = FakeTraCIException
+
+    def __init__(self, latency=0.0, step_latency=0.0, record=False, step_length=1.0):
+        self._latency = latency
+        self._step_latency = step_latency
+        self._record = record
+        self._step_length = step_length
+        self._steps = 0
+        self._commands = []
+        self._command_counts = collections.Counter()
+        self._command_times = collections.defaultdict(float)
+        self._vehicles = collections.OrderedDict()
+        self._connected = False
+        self._time = 0.0
+        self.vehicle = _VehicleDomain(self, 'vehicle')
+        self.gui = _GUIDomain(self, 'gui')
+        self.simulation = _SimulationDomain(self, 'simulation')
+
+    def _command(self, command, latency=0.0):
+        """Account a command, waiting its simulated latency."""
+        if not self._connected:
+            raise FakeTraCIException('Not connected.')
+        latency += self._latency
+        if latency > 0.0:
+            start = _timer()
+            time.sleep(latency)
+            self._command_times[command] += _timer() - start
+        self._command_counts[command] += 1
+        if self._record:
+            self._commands.append(command)
+
+    def init(self, port=8813, numRetries=10, host='localhost', label='default'):
+        self._connect()
+
+    def start(self, cmd, port=None, numRetries=10, label='default'):
+        if '--step-length' in cmd:
+            self._step_length = float(cmd[cmd.index('--step-length') + 1])
+        self._connect()
+
+    def load(self, args):
+        self._command('load')
+        self._vehicles.clear()
+        self._time = 0.0
+
+    def _connect(self):
+        if self._connected:
+            raise FakeTraCIException('Connection \'default\' is already active.')
+        self._connected = True
+        self._vehicles.clear()
+        self._time = 0.0
+
+    def simulationStep(self, step=0.0):
+        """
+        Simulate one step, or as many as needed to reach the time step, in
+        seconds, if given.
+        """
+        if step > 0.0:
+            # Up to the first step reaching the time, as SUMO does.
+            steps = max(0, int(math.ceil((step - self._time) / self._step_length - 1e-9)))
+        else:
+            steps = 1
+        self._command('simulationStep', steps * self._step_latency)
+        self._time += steps * self._step_length
+        self._steps += steps
+        return []
+
+    def close(self, wait=True):
+        self._command('close')
+        self._connected = False
+
+    def get_command_counts(self):
+        """The number of commands received, by command name."""
+        return dict(self._command_counts)
+
+    def get_command_times(self):
+        """The time waited for the simulated latency, in seconds, by command name."""
+        return dict(self._command_times)
+
+    def get_simulation_steps(self):
+        """The number of simulation steps run, over all the simulationStep calls."""
+        return self._steps
+
+    def get_commands(self):
+        """The names of the commands received in order, if recording."""
+        return list(self._commands)
+
+    def get_total_time(self):
+        """The time waited for the simulated latency by all the commands."""
+        return sum(self._command_times.values())
+
+    def reset_counters(self):
+        self._steps = 0
+        self._commands = []
+        self._command_counts.clear()
+        self._command_times.clear()
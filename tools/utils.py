@@ -22,11 +22,14 @@ import math
 if 'SUMO_HOME' in os.environ:
     tools = os.path.join(os.environ['SUMO_HOME'], 'tools')
     sys.path.append(tools)
-else:
-    sys.exit("please declare environment variable 'SUMO_HOME'")
 
-import sumolib
-import traci
+# SUMO is only needed to start it, a fake backend can run without it.
+try:
+    import sumolib
+    import traci
+except ImportError:
+    sumolib = None
+    traci = None
 
 
 # lane change state bits
@@ -56,22 +59,33 @@ bits = {
 }
 
 
-def start_sumo(config_file, already_running, gui=True):
+def start_sumo(config_file, already_running, gui=True, backend=None, step_length=None):
     """
     Starts or restarts sumo with the given configuration file
     :param config_file: sumo configuration file
     :param already_running: if set to true then the command simply reloads
     the given config file, otherwise sumo is started from scratch
     :param gui: start GUI or not
+    :param backend: the SUMO backend to start, the traci module by default
+    :param step_length: length of the simulation steps in seconds, the one of
+    the configuration file if None
     """
+    if backend is None:
+        if traci is None:
+            raise RuntimeError(
+                "cannot import traci, please declare environment variable 'SUMO_HOME'")
+        backend = traci
+    binary = 'sumo-gui' if gui else 'sumo'
     arguments = ["--lanechange.duration", "3", "-c"]
-    sumo_cmd = [sumolib.checkBinary('sumo-gui' if gui else 'sumo')]
+    sumo_cmd = [sumolib.checkBinary(binary) if sumolib is not None else binary]
     arguments.append(config_file)
+    if step_length is not None:
+        arguments.extend(["--step-length", str(step_length)])
     if already_running:
-        traci.load(arguments)
+        backend.load(arguments)
     else:
         sumo_cmd.extend(arguments)
-        traci.start(sumo_cmd)
+        backend.start(sumo_cmd)
 
 
 def running(demo_mode, step, max_step):